@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import EmailStr
 from typing import Optional
+from datetime import time
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Tek School"
     API_V1_STR: str = "/api/v1"
@@ -32,6 +33,69 @@ class Settings(BaseSettings):
     RAZORPAY_KEY_ID: Optional[str] = None
     RAZORPAY_KEY_SECRET: Optional[str] = None
     
+    # Reports
+    REPORT_STATEMENT_TIMEOUT_MS: int = 5000
+    CHRONIC_ABSENCE_THRESHOLD: float = 0.1
+    
+    # Partitioning (attendances, student_exam_data)
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETENTION_MONTHS: Optional[int] = None
+    # Serializes partition DDL across workers booting at the same time
+    PARTITION_LOCK_KEY: int = 7340002
+    
+    # Background scheduler
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LOCK_KEY: int = 7340001
+    
+    # Missing attendance alerts
+    ATTENDANCE_CUTOFF_TIME: time = time(10, 30)
+    MISSING_ATTENDANCE_CHECK_INTERVAL_SECONDS: int = 600
+    MISSING_ATTENDANCE_JOB_BUDGET_SECONDS: int = 60
+    # Closed-period attendance reports; the TTL bounds staleness after back-dated
+    # edits made by other workers or scripts
+    ATTENDANCE_REPORT_CACHE_TTL_SECONDS: int = 300
+    
+    # Exam caches
+    ANSWER_KEY_CACHE_SIZE: int = 2048
+    PAPER_CACHE_SIZE: int = 512
+    MCQ_IMPORT_BATCH_SIZE: int = 500
+    # Near-duplicate question detection; changing the signature shape requires re-indexing
+    DEDUPE_NUM_PERM: int = 64
+    DEDUPE_BANDS: int = 16
+    DEDUPE_SHINGLE_SIZE: int = 5
+    DEDUPE_SIMILARITY_THRESHOLD: float = 0.8
+    SHUFFLE_EXAM_PAPERS: bool = True
+    LEADERBOARD_REFRESH_SECONDS: int = 60
+    ITEM_ANALYSIS_INTERVAL_SECONDS: int = 60 * 60
+    ITEM_ANALYSIS_STATEMENT_TIMEOUT_MS: int = 120000
+    # Rank-exam answer similarity: flag pairs sharing at least MIN_SHARED_WRONG
+    # identical wrong answers with a wrong-answer Jaccard of at least THRESHOLD
+    ANSWER_SIMILARITY_INTERVAL_SECONDS: int = 60 * 60
+    ANSWER_SIMILARITY_THRESHOLD: float = 0.75
+    ANSWER_SIMILARITY_MIN_SHARED_WRONG: int = 5
+    EXAM_LIFECYCLE_INTERVAL_SECONDS: int = 30
+    EXAM_LIFECYCLE_BATCH_SIZE: int = 500
+    EXAM_COUNTER_RECONCILE_INTERVAL_SECONDS: int = 6 * 60 * 60
+    EXAM_COUNTER_RECONCILE_TIMEOUT_MS: int = 30000
+    # Generated papers: share of easy / medium / hard questions, students drawn per batch
+    PAPER_DIFFICULTY_MIX: list = [30, 50, 20]
+    PAPER_GENERATION_BATCH_SIZE: int = 500
+    # Gradebook terms are academic years starting in this month
+    ACADEMIC_YEAR_START_MONTH: int = 4
+    
+    # Exam submission write-behind pipeline
+    SUBMISSION_WRITE_BEHIND: bool = True
+    SUBMISSION_WAL_DIR: str = "var/submission_wal"
+    SUBMISSION_WAL_FSYNC: bool = True
+    SUBMISSION_BATCH_SIZE: int = 500
+    SUBMISSION_FLUSH_INTERVAL_SECONDS: float = 0.5
+    SUBMISSION_MAX_PENDING: int = 20000
+    SUBMISSION_ENQUEUE_TIMEOUT_SECONDS: float = 2.0
+    
+    # Exam session autosave: buffered per worker, flushed in batches
+    EXAM_AUTOSAVE_FLUSH_INTERVAL_SECONDS: float = 2.0
+    EXAM_AUTOSAVE_BATCH_SIZE: int = 1000
+    
     # CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000","http://localhost:3001","http://localhost:3002",]
 
@@ -0,0 +1,218 @@
+"""
+Monthly range partitioning for the append-heavy `attendances` and
+`student_exam_data` tables.
+
+Each table is a Postgres declarative partitioned parent with one child per
+calendar month (`attendances_y2025m06`) plus a DEFAULT partition that catches
+rows outside the created range. Indexes and unique constraints are declared on
+the parent, so Postgres creates matching local indexes on every partition.
+
+Every worker runs this at startup, so each DDL transaction first takes the
+PARTITION_LOCK_KEY transaction-level advisory lock and only then inspects the
+catalog: a worker that waited on the lock sees the layout the previous holder
+left behind instead of repeating its migration.
+"""
+import re
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import Base, engine
+
+# table name -> range partition key
+PARTITIONED_TABLES = {
+    "attendances": "date",
+    "student_exam_data": "submitted_at",
+}
+ARCHIVE_SCHEMA = "archive"
+_PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month `offset` months away from `day`."""
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, start: date) -> str:
+    return f"{table_name}_y{start.year}m{start.month:02d}"
+
+
+def lock_partitions(conn):
+    """Hold the partition DDL lock until the surrounding transaction ends."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": settings.PARTITION_LOCK_KEY})
+
+
+def table_kind(conn, table_name: str) -> Optional[str]:
+    """pg_class.relkind of `table_name`: 'r' plain table, 'p' partitioned, None if missing."""
+    return conn.execute(
+        text(
+            "SELECT c.relkind FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = current_schema()"
+        ),
+        {"name": table_name},
+    ).scalar()
+
+
+def list_partitions(conn, table_name: str):
+    """Names of the partitions currently attached to `table_name`."""
+    return conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :name"
+        ),
+        {"name": table_name},
+    ).scalars().all()
+
+
+def create_partition(conn, table_name: str, start: date) -> bool:
+    """
+    Create and attach the monthly partition starting at `start`.
+
+    Rows for that month which already landed in the DEFAULT partition are moved
+    into the new partition first, otherwise ATTACH would fail. Returns False if
+    the partition already exists.
+    """
+    name = partition_name(table_name, start)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    key = PARTITIONED_TABLES[table_name]
+    end = month_start(start, 1)
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table_name}" INCLUDING DEFAULTS)'))
+    conn.execute(
+        text(
+            f'WITH moved AS (DELETE FROM "{table_name}_default" '
+            f'WHERE "{key}" >= :start AND "{key}" < :end RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        ),
+        {"start": start, "end": end},
+    )
+    conn.execute(
+        text(
+            f'ALTER TABLE "{table_name}" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    return True
+
+
+def create_default_partition(conn, table_name: str):
+    conn.execute(
+        text(f'CREATE TABLE IF NOT EXISTS "{table_name}_default" PARTITION OF "{table_name}" DEFAULT')
+    )
+
+
+def migrate_to_partitioned(conn, table_name: str):
+    """
+    Convert an existing plain table into the partitioned layout in one transaction.
+
+    The old table, its indexes and its id sequence are renamed out of the way,
+    the partitioned parent is created from the model definition, partitions are
+    created for every month that holds data, rows are copied across and the id
+    sequence is carried forward.
+    """
+    key = PARTITIONED_TABLES[table_name]
+    legacy = f"{table_name}_legacy"
+
+    conn.execute(text(f'ALTER TABLE "{table_name}" RENAME TO "{legacy}"'))
+    index_names = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :name AND schemaname = current_schema()"),
+        {"name": legacy},
+    ).scalars().all()
+    for index_name in index_names:
+        conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"'))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": legacy}).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO \"{legacy}_id_seq\""))
+
+    table = Base.metadata.tables[table_name]
+    table.create(bind=conn, checkfirst=True)
+    create_default_partition(conn, table_name)
+
+    conn.execute(text(f'UPDATE "{legacy}" SET "{key}" = now() WHERE "{key}" IS NULL'))
+    first, last = conn.execute(text(f'SELECT min("{key}")::date, max("{key}")::date FROM "{legacy}"')).one()
+    if first is not None:
+        current = month_start(first)
+        while current <= last:
+            create_partition(conn, table_name, current)
+            current = month_start(current, 1)
+
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    conn.execute(text(f'INSERT INTO "{table_name}" ({columns}) SELECT {columns} FROM "{legacy}"'))
+    conn.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+            f'COALESCE(MAX(id), 0) + 1, false) FROM "{table_name}"'
+        )
+    )
+    conn.execute(text(f'DROP TABLE "{legacy}"'))
+
+
+def ensure_partitioned_tables():
+    """Migrate plain tables to the partitioned layout and create any missing parent indexes."""
+    for table_name in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            # Checked under the lock: another worker may have just migrated it
+            lock_partitions(conn)
+            kind = table_kind(conn, table_name)
+            if kind is None:
+                continue
+            if kind == "r":
+                migrate_to_partitioned(conn, table_name)
+            create_default_partition(conn, table_name)
+            for index in Base.metadata.tables[table_name].indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def create_future_partitions(months_ahead: Optional[int] = None, today: Optional[date] = None) -> int:
+    """Create partitions from the current month up to `months_ahead` months out."""
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    today = today or date.today()
+    created = 0
+    for table_name in PARTITIONED_TABLES:
+        for offset in range(months_ahead + 1):
+            with engine.begin() as conn:
+                lock_partitions(conn)
+                created += create_partition(conn, table_name, month_start(today, offset))
+    return created
+
+
+def archive_old_partitions(retention_months: Optional[int] = None, today: Optional[date] = None):
+    """
+    Detach partitions that ended more than `retention_months` ago and move them
+    to the `archive` schema, where they can be dumped or dropped independently.
+    """
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    if not retention_months:
+        return []
+
+    cutoff = month_start(today or date.today(), -retention_months)
+    archived = []
+    with engine.begin() as conn:
+        lock_partitions(conn)
+        conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"'))
+        for table_name in PARTITIONED_TABLES:
+            for name in list_partitions(conn, table_name):
+                match = _PARTITION_NAME.search(name)
+                if not match:
+                    continue
+                start = date(int(match.group(1)), int(match.group(2)), 1)
+                if month_start(start, 1) > cutoff:
+                    continue
+                conn.execute(text(f'ALTER TABLE "{table_name}" DETACH PARTITION "{name}"'))
+                conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"'))
+                archived.append(name)
+    return archived
+
+
+def maintain_partitions():
+    """Periodic housekeeping: create upcoming partitions and archive expired ones."""
+    created = create_future_partitions()
+    archived = archive_old_partitions()
+    return {"created": created, "archived": archived}
@@ -23,6 +23,15 @@ from app.models.teachers import *
 from app.models.students import *
 from app.models.admin import *
 
+# Postgres extensions the models rely on (pg_trgm: trigram indexes for question search)
+REQUIRED_EXTENSIONS = ("pg_trgm",)
+
+def create_extensions():
+    """Create required Postgres extensions if they are missing"""
+    with engine.begin() as conn:
+        for extension in REQUIRED_EXTENSIONS:
+            conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{extension}"'))
+
 def create_tables():
     """Create all tables that don't exist yet"""
     Base.metadata.create_all(bind=engine)
@@ -52,6 +61,12 @@ def add_missing_columns():
                     with engine.begin() as conn:
                         alter_stmt = f'ALTER TABLE "{table_name}" ADD COLUMN "{column.name}" {column_type}'
                         
+                        # Generated columns carry their expression and take no default
+                        if column.computed is not None:
+                            alter_stmt += f" GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+                            conn.execute(text(alter_stmt))
+                            continue
+                        
                         # Add NULL/NOT NULL constraint
                         if not column.nullable:
                             alter_stmt += " NOT NULL"
@@ -65,6 +80,37 @@ def add_missing_columns():
                             alter_stmt += f" DEFAULT '{default_value}'"
                         
                         conn.execute(text(alter_stmt))
+# In-place column type upgrades that are safe to apply with a USING cast
+TYPE_UPGRADES = {("json", "jsonb")}
+
+def upgrade_column_types():
+    """Convert existing columns whose model type was upgraded (e.g. JSON -> JSONB)"""
+    inspector = inspect(engine)
+
+    for table_name, table in Base.metadata.tables.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing_types = {col['name']: str(col['type']).lower() for col in inspector.get_columns(table_name)}
+        for column in table.columns:
+            current = existing_types.get(column.name)
+            target = column.type.compile(engine.dialect).lower()
+            if current and (current, target) in TYPE_UPGRADES:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f'ALTER TABLE "{table_name}" ALTER COLUMN "{column.name}" '
+                        f'TYPE {target} USING "{column.name}"::{target}'
+                    ))
+                print(f"Converted {table_name}.{column.name} from {current} to {target}")
+
+def create_missing_indexes():
+    """Create indexes declared on models whose tables already existed"""
+    inspector = inspect(engine)
+
+    for table_name, table in Base.metadata.tables.items():
+        if inspector.has_table(table_name):
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+
 def drop_extra_columns():
     inspector = inspect(engine)
     
@@ -85,4 +131,11 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def set_statement_timeout(db, timeout_ms: int):
+    """Bound every statement in the current transaction to `timeout_ms` milliseconds."""
+    db.execute(
+        text("SELECT set_config('statement_timeout', :timeout, true)"),
+        {"timeout": str(int(timeout_ms))},
+    )
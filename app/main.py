@@ -2,7 +2,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import users, auth, school, teachers, students, admin
 from app.core.config import settings
-from app.db.session import create_tables, add_missing_columns
+from app.db.session import SessionLocal, create_extensions, create_tables, add_missing_columns, upgrade_column_types, create_missing_indexes
+from app.db.partitions import ensure_partitioned_tables, maintain_partitions
+from app.utils.scheduler import scheduler
+from app.utils.submission_pipeline import submission_pipeline
+from app.utils.exam_sessions import autosave_buffer
+from app.utils.attendance_alerts import check_missing_attendance
+from app.utils.leaderboard import leaderboards
+from app.utils.item_analysis import run_item_analysis
+from app.utils.answer_similarity import run_answer_similarity
+from app.utils.exam_counters import run_counter_reconciliation
+from app.utils.exam_lifecycle import run_exam_lifecycle
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -25,15 +35,75 @@ app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 @app.on_event("startup")
 def on_startup():
     """Called when FastAPI starts - creates tables and adds missing columns"""
+    schema_steps = [
+        create_extensions,  # Postgres extensions used by indexes (pg_trgm)
+        create_tables,  # This creates any missing tables
+        add_missing_columns,  # This adds any missing columns to existing tables
+        upgrade_column_types,  # e.g. student_exam_data.answers JSON -> JSONB (one-time rewrite)
+        create_missing_indexes,  # Indexes added to models after their table was created
+        ensure_partitioned_tables,  # Converts attendances/student_exam_data to partitioned tables
+        maintain_partitions,  # Creates upcoming monthly partitions, archives expired ones
+    ]
+    # Each step is reported on its own so one failure does not silently skip the rest
+    for step in schema_steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Error setting up database schema ({step.__name__}): {str(e)}")
+
+    # Every worker buffers its own exam submissions (replays WALs of dead workers first)
+    if settings.SUBMISSION_WRITE_BEHIND:
+        submission_pipeline.start()
+
+    # Exam session autosaves are coalesced per worker and flushed in batches
+    autosave_buffer.start()
+
+    # Rank-exam leaderboards are per worker; build them for active rank exams up front
+    db = SessionLocal()
     try:
-        create_tables()  # This creates any missing tables
-        
-        add_missing_columns()  # This adds any missing columns to existing tables
-        
+        warmed = leaderboards.warm(db)
+        print(f"Leaderboards warmed with {warmed} student results")
     except Exception as e:
-        print(f"Error setting up database schema: {str(e)}")
-        # In production, you might want to handle this differently
-        # For development, we'll just log the error and continue
+        print(f"Error warming leaderboards: {str(e)}")
+    finally:
+        db.close()
+
+    # Background jobs run only in the worker holding the scheduler leader lock
+    if settings.SCHEDULER_ENABLED:
+        scheduler.add_job(maintain_partitions, interval_seconds=24 * 60 * 60, name="maintain_partitions")
+        scheduler.add_job(
+            run_exam_lifecycle,
+            interval_seconds=settings.EXAM_LIFECYCLE_INTERVAL_SECONDS,
+            name="run_exam_lifecycle",
+            run_immediately=True,
+        )
+        scheduler.add_job(
+            check_missing_attendance,
+            interval_seconds=settings.MISSING_ATTENDANCE_CHECK_INTERVAL_SECONDS,
+            name="check_missing_attendance",
+        )
+        scheduler.add_job(
+            run_item_analysis,
+            interval_seconds=settings.ITEM_ANALYSIS_INTERVAL_SECONDS,
+            name="run_item_analysis",
+        )
+        scheduler.add_job(
+            run_answer_similarity,
+            interval_seconds=settings.ANSWER_SIMILARITY_INTERVAL_SECONDS,
+            name="run_answer_similarity",
+        )
+        scheduler.add_job(
+            run_counter_reconciliation,
+            interval_seconds=settings.EXAM_COUNTER_RECONCILE_INTERVAL_SECONDS,
+            name="run_counter_reconciliation",
+        )
+        scheduler.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    scheduler.shutdown()
+    submission_pipeline.shutdown()
+    autosave_buffer.shutdown()
 
 @app.get("/")
 def root():
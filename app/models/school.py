@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey,Table,Time,UniqueConstraint,Date,Boolean,DateTime,Float,ARRAY,Text,JSON
+from sqlalchemy import Column, Integer, String, ForeignKey,Table,Time,UniqueConstraint,Date,Boolean,DateTime,Float,ARRAY,Text,Index,Computed,LargeBinary,SmallInteger,BigInteger
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 import uuid
@@ -239,11 +240,12 @@ class DropStop(Base):
 
 class Attendance(Base):
     __tablename__ = "attendances"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
 
     student_id = Column(Integer, ForeignKey("students.id"), nullable=True)
     teachers_id = Column(String, ForeignKey("teachers.id"), nullable=True)
-    date = Column(Date, nullable=False)
+    # Partition key (monthly range partitions, see app/db/partitions.py)
+    date = Column(Date, primary_key=True, nullable=False)
     status = Column(String(1), nullable=False)
     is_verified = Column(Boolean, nullable=True)
     student = relationship("Student", back_populates="attendances")
@@ -252,6 +254,51 @@ class Attendance(Base):
     __table_args__ = (
         UniqueConstraint('student_id','date', name='uq_student_attendance'),
         UniqueConstraint('teachers_id','date', name='uq_teacher_attendance'),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+
+class PeriodAttendance(Base):
+    """
+    Attendance for one timetable period of one section on one day.
+
+    Instead of a row per student, `statuses` holds one status character per roll
+    number (position i is roll number i + 1, "-" when unmarked), so a period for
+    a 40-student section is a single ~40 byte row. A student's status can be read
+    in SQL with substr(statuses, roll_no, 1); see app/utils/period_attendance.py.
+    """
+    __tablename__ = "period_attendances"
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(String, ForeignKey("schools.id"), nullable=False)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    section_id = Column(Integer, ForeignKey("sections.id"), nullable=False)
+    period_id = Column(Integer, ForeignKey("timetable_periods.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    statuses = Column(Text, nullable=False)
+    marked_by = Column(String, ForeignKey("teachers.id"), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    period = relationship("TimetablePeriod")
+
+    __table_args__ = (
+        UniqueConstraint("section_id", "date", "period_id", name="uq_period_attendance"),
+    )
+
+class AttendanceAlert(Base):
+    """A section that had no attendance by the daily cutoff; one row per section per day."""
+    __tablename__ = "attendance_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(String, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
+    class_id = Column(Integer, ForeignKey("classes.id", ondelete="CASCADE"), nullable=False)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    student_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    notified_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("school_id", "class_id", "section_id", "date", name="uq_attendance_alert"),
     )
 
 class WeekDay(Enum):
@@ -339,11 +386,28 @@ class Exam(Base):
     exam_activation_date = Column(DateTime, nullable=False)
     inactive_date = Column(DateTime, nullable=True)
     max_repeat = Column(Integer, nullable=False, default=1)
+    # Scoring policy (see app/utils/exam_scoring.py)
+    partial_marking = Column(Boolean, default=False)
+    negative_marking = Column(Float, default=0)
     status = Column(SQLEnum(ExamStatusEnum), nullable=False, default=ExamStatusEnum.PENDING)
+    # Participation counters, incremented in the submission insert transaction
+    # (app/utils/exam_counters.py) and periodically reconciled from student_exam_data
     no_students_appeared = Column(Integer, default=0)
+    total_attempts = Column(Integer, nullable=False, default=0)
+    pass_count = Column(Integer, nullable=False, default=0)
+    fail_count = Column(Integer, nullable=False, default=0)
+    score_total = Column(Integer, nullable=False, default=0)  # sum of result percentages
     created_by = Column(String, ForeignKey("teachers.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     is_published = Column(Boolean, default=False)
+    # Set when the school approves; the lifecycle job activates it at exam_activation_date
+    is_approved = Column(Boolean, default=False)
+    # Bumped on every MCQ or exam edit; versions the compiled answer-key cache
+    content_version = Column(Integer, nullable=False, default=1)
+    # Generated papers: each student gets no_of_questions sampled from the school's
+    # (subject, chapter)-tagged question pool (see app/utils/question_pool.py)
+    is_generated = Column(Boolean, nullable=False, default=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True)
 
     # Relationships
     school = relationship("School", back_populates="exams")
@@ -354,6 +418,12 @@ class Exam(Base):
     student_exam_data = relationship("StudentExamData", back_populates="exam")
 
 
+    __table_args__ = (
+        # list_exams: newest first per school / per creator
+        Index("ix_exams_school_created", "school_id", "created_at"),
+        Index("ix_exams_creator_created", "created_by", "created_at"),
+    )
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.id:
@@ -392,9 +462,34 @@ class McqBank(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Full-text search over the question and its options (see search_question_bank)
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple', coalesce(question, '') || ' ' || coalesce(option_a, '') || ' ' || "
+            "coalesce(option_b, '') || ' ' || coalesce(option_c, '') || ' ' || coalesce(option_d, ''))",
+            persisted=True,
+        ),
+    )
+
+    # MinHash signature of question + options (see app/utils/question_dedupe.py)
+    minhash = Column(LargeBinary, nullable=True)
+
+    # Pool tags for generated papers; difficulty 1 = easy, 2 = medium, 3 = hard
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True)
+    chapter = Column(Integer, nullable=True)
+    difficulty = Column(SmallInteger, nullable=True)
+
     # Relationship with Exam
     exam = relationship("Exam", back_populates="mcqs")
 
+    __table_args__ = (
+        Index("ix_mcq_bank_exam", "exam_id"),
+        Index("ix_mcq_bank_search", "search_vector", postgresql_using="gin"),
+        Index("ix_mcq_bank_question_trgm", "question", postgresql_using="gin", postgresql_ops={"question": "gin_trgm_ops"}),
+        Index("ix_mcq_bank_pool", "subject_id", "chapter"),
+    )
+
 class ExamStatus(str,Enum):
     pass_ = "pass"
     fail = "fail"
@@ -403,20 +498,184 @@ class ExamStatus(str,Enum):
 class StudentExamData(Base):
     __tablename__ = "student_exam_data"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     school_id = Column(String, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
     exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
 
     attempt_no = Column(Integer, default=1)
-    answers = Column(JSON, nullable=False)
+    # [{question_id, selected_option}] as JSONB; GIN-indexed for containment queries
+    # (see app/utils/answer_queries.py)
+    answers = Column(JSONB, nullable=False)
 
     result = Column(Integer, nullable=True)
     status = Column(SQLEnum(ExamStatus), nullable=True)
 
-    submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Client-side id from the write-behind pipeline; makes WAL replays idempotent
+    submission_uid = Column(String(36), nullable=True)
+
+    # Partition key (monthly range partitions, see app/db/partitions.py)
+    submitted_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
     # Relationships (optional, if you want ORM navigation)
     student = relationship("Student", back_populates="exam_data")
     school = relationship("School", back_populates="exam_data")
-    exam = relationship("Exam", back_populates="student_exam_data")
\ No newline at end of file
+    exam = relationship("Exam", back_populates="student_exam_data")
+
+    __table_args__ = (
+        Index("ix_student_exam_data_student_exam", "student_id", "exam_id"),
+        Index("ix_student_exam_data_exam", "exam_id"),
+        Index("uq_student_exam_data_submission", "submission_uid", "submitted_at", unique=True),
+        Index("ix_student_exam_data_answers", "answers", postgresql_using="gin", postgresql_ops={"answers": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (submitted_at)"},
+    )
+
+
+class McqLshBucket(Base):
+    """One LSH band bucket per question; questions sharing a bucket are near-duplicate candidates."""
+    __tablename__ = "mcq_lsh_buckets"
+
+    question_id = Column(Integer, ForeignKey("mcq_bank.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    school_id = Column(String, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_mcq_lsh_buckets_lookup", "school_id", "band", "bucket"),
+    )
+
+
+class ExamAttemptCounter(Base):
+    """
+    Attempts allocated per (student, exam). Unique by primary key, so it is the
+    authority for attempt numbers and max_repeat (see app/utils/exam_attempts.py);
+    student_exam_data cannot hold that constraint because it is partitioned by time.
+    """
+    __tablename__ = "exam_attempt_counters"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+
+class ExamPaperAssignment(Base):
+    """The questions drawn for one student in a generated exam, fixed once drawn."""
+    __tablename__ = "exam_paper_assignments"
+
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    question_ids = Column(ARRAY(Integer), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ExamSession(Base):
+    """
+    A student's in-progress exam: started/last-seen times and autosaved answers
+    ({question_id: selected_option}). Autosaves are buffered per worker and
+    flushed in batches (see app/utils/exam_sessions.py); `seq` is the client's
+    autosave counter and keeps an older flush from overwriting newer answers.
+    """
+    __tablename__ = "exam_sessions"
+
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    school_id = Column(String, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(16), nullable=False, default="active")  # active | submitted
+    answers = Column(JSONB, nullable=False, default=dict)
+    seq = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    submitted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StudentGradebook(Base):
+    """
+    Per-student results by subject and academic year, maintained incrementally
+    with each stored submission (see app/utils/gradebook.py). subject_id 0
+    collects exams without a subject.
+    """
+    __tablename__ = "student_gradebook"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    subject_id = Column(Integer, primary_key=True, default=0)
+    academic_year = Column(SmallInteger, primary_key=True)  # 2026 = the year starting in ACADEMIC_YEAR_START_MONTH 2026
+    school_id = Column(String, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
+    exams_taken = Column(Integer, nullable=False, default=0)  # distinct exams (first attempts)
+    attempts = Column(Integer, nullable=False, default=0)
+    pass_count = Column(Integer, nullable=False, default=0)
+    fail_count = Column(Integer, nullable=False, default=0)
+    score_total = Column(Integer, nullable=False, default=0)
+    best_score = Column(Integer, nullable=True)
+    last_score = Column(Integer, nullable=True)
+    last_exam_id = Column(String, ForeignKey("exams.id", ondelete="SET NULL"), nullable=True)
+    last_submitted_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_student_gradebook_school_year", "school_id", "academic_year"),
+    )
+
+
+class SimilarAnswerPair(Base):
+    """Two students in a section whose rank-exam sheets share unusually many wrong answers."""
+    __tablename__ = "similar_answer_pairs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="SET NULL"), nullable=True)
+    student_a = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    student_b = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    shared_wrong = Column(Integer, nullable=False)   # questions with an identical wrong answer
+    wrong_a = Column(Integer, nullable=False)
+    wrong_b = Column(Integer, nullable=False)
+    similarity = Column(Float, nullable=False)       # Jaccard of the two wrong-answer sets
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("exam_id", "student_a", "student_b", name="uq_similar_answer_pairs"),
+        Index("ix_similar_answer_pairs_exam", "exam_id", "similarity"),
+    )
+
+
+class AnswerSimilarityRun(Base):
+    """Last answer-similarity run per rank exam; lets the batch job skip unchanged exams."""
+    __tablename__ = "answer_similarity_runs"
+
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    content_version = Column(Integer, nullable=False)
+    exam_status = Column(SQLEnum(ExamStatusEnum), nullable=False)
+    submissions = Column(Integer, nullable=False, default=0)
+    flagged = Column(Integer, nullable=False, default=0)
+    analyzed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ItemAnalysisRun(Base):
+    """Last item-analysis run per exam; lets the batch job skip exams with nothing new."""
+    __tablename__ = "item_analysis_runs"
+
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    content_version = Column(Integer, nullable=False)
+    exam_status = Column(SQLEnum(ExamStatusEnum), nullable=False)
+    submissions = Column(Integer, nullable=False, default=0)
+    analyzed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class QuestionStats(Base):
+    """Item statistics for one question, computed by app/utils/item_analysis.py."""
+    __tablename__ = "question_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(String, ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
+    question_id = Column(Integer, ForeignKey("mcq_bank.id", ondelete="CASCADE"), nullable=False)
+    responses = Column(Integer, nullable=False, default=0)
+    difficulty = Column(Float, nullable=True)       # share of students answering exactly right
+    discrimination = Column(Float, nullable=True)   # upper 27% minus lower 27% difficulty
+    count_a = Column(Integer, nullable=False, default=0)
+    count_b = Column(Integer, nullable=False, default=0)
+    count_c = Column(Integer, nullable=False, default=0)
+    count_d = Column(Integer, nullable=False, default=0)
+    count_blank = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("exam_id", "question_id", name="uq_question_stats"),
+    )
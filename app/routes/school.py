@@ -1,27 +1,46 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException,status,UploadFile,File,Query,Form
+from datetime import datetime, date, timezone
+from fastapi import APIRouter, Depends, HTTPException,status,UploadFile,File,Query,Form,Response
+from fastapi.responses import StreamingResponse
 from app.models.users import User
 from app.models.teachers import Teacher,TeacherClassSectionSubject
 from app.models.students import Student
-from app.models.school import School,Class,Section,Subject,ExtraCurricularActivity,class_extra_curricular,class_section,class_subjects,class_optional_subjects,Transport,PickupStop,DropStop,Attendance,TimetableDay,TimetablePeriod,SchoolMarginConfiguration,TransactionHistory,Exam,McqBank,ExamStatusEnum,ExamStatus,StudentExamData
+from app.models.school import School,Class,Section,Subject,ExtraCurricularActivity,class_extra_curricular,class_section,class_subjects,class_optional_subjects,Transport,PickupStop,DropStop,Attendance,TimetableDay,TimetablePeriod,SchoolMarginConfiguration,TransactionHistory,Exam,McqBank,ExamStatusEnum,ExamTypeEnum,ExamStatus,StudentExamData,PeriodAttendance,ItemAnalysisRun,QuestionStats,AnswerSimilarityRun,SimilarAnswerPair
 from app.models.admin import AccountConfiguration, CreditConfiguration, CreditMaster
 from app.schemas.users import UserRole
-from app.schemas.school import ClassWithSubjectCreate,ClassInput,TransportCreate,TransportResponse,StopResponse,AttendanceCreate,PeriodCreate,TimetableCreate,CreateSchoolCredit,TransferSchoolCredit,CreatePaymentRequest,PaymentVerificationRequest,ExamCreateRequest,ExamUpdateRequest,ExamListResponse,McqCreate,McqBulkCreate,McqResponse,ExamPublishResponse,ExamStatusUpdateRequest,StudentExamSubmitRequest
-from sqlalchemy.orm import Session,joinedload
+from app.schemas.school import ClassWithSubjectCreate,ClassInput,TransportCreate,TransportResponse,StopResponse,AttendanceCreate,PeriodCreate,TimetableCreate,CreateSchoolCredit,TransferSchoolCredit,CreatePaymentRequest,PaymentVerificationRequest,ExamCreateRequest,ExamUpdateRequest,ExamListResponse,McqCreate,McqBulkCreate,McqResponse,ExamPublishResponse,ExamStatusUpdateRequest,StudentExamSubmitRequest,ExamAutosaveRequest,PeriodAttendanceCreate
+from sqlalchemy.orm import Session,joinedload,selectinload
 from sqlalchemy import delete, insert,extract
-from app.db.session import get_db
+from app.db.session import get_db, set_statement_timeout
 from app.core.dependencies import get_current_user
 from app.utils.permission import require_roles
 from typing import List,Optional
 from app.utils.s3 import upload_to_s3
 from calendar import month_name
 from sqlalchemy import func
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from app.utils.razorpay_client import razorpay_client
 import hmac
 import hashlib
 import time
-from app.utils.services import is_time_overlap, create_mcq,get_mcqs_by_exam,delete_mcq,evaluate_exam    
+import uuid
+from app.utils.services import is_time_overlap, create_mcq,get_mcqs_by_exam,delete_mcq,evaluate_exam,upsert_attendance
+from app.utils.attendance_analytics import get_attendance_report, invalidate_attendance_reports
+from app.utils.exam_scoring import score_submission, rescore_exam
+from app.utils.exam_cache import get_answer_key, get_paper, get_pool, touch_exam, invalidate_exam_caches
+from app.utils.question_pool import assigned_question_ids, exam_student_ids, generate_papers
+from app.utils.gradebook import rebuild_gradebook, exam_student_ids as exam_submitter_ids
+from app.utils.exam_sessions import autosave_buffer, start_session, load_session, close_session, answers_map, answers_list
+from app.utils.submission_pipeline import submission_pipeline, persist_submissions, PipelineFull
+from app.utils.mcq_import import import_mcqs, iter_rows as iter_mcq_rows, validate_mcq_type
+from app.utils.item_analysis import analyze_exam
+from app.utils.answer_similarity import analyze_exam_similarity
+from app.utils.result_export import export_results, MEDIA_TYPES as EXPORT_MEDIA_TYPES
+from app.utils.answer_queries import count_choice, normalize_answers, option_distribution, OPTIONS as ANSWER_OPTIONS
+from app.utils.exam_attempts import allocate_attempt, release_attempt
+from app.utils.question_search import search_question_bank
+from app.utils.question_dedupe import index_question_ids, backfill_signatures, find_duplicates, cluster_pairs
+from app.utils.leaderboard import leaderboards, SCOPES as LEADERBOARD_SCOPES
+from app.utils.period_attendance import save_period_attendance, decode_roster, get_student_period_attendance
 from app.core.config import settings
 router = APIRouter()
 
@@ -905,14 +924,8 @@ def create_attendance(
                 if current_user.teacher_profile.id != data.teachers_id:
                     raise HTTPException(status_code=403, detail="Teachers can only mark their own attendance.")
 
-            existing = db.query(Attendance).filter_by(
-                teachers_id=data.teachers_id,
-                date=data.date
-            ).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Attendance already recorded for this teacher on this date.")
-
             is_verified = False  # must be verified later by school
+            conflict_detail = "Attendance already recorded for this teacher on this date."
 
         # Student Attendance
         elif data.student_id:
@@ -931,35 +944,41 @@ def create_attendance(
             if not student:
                 raise HTTPException(status_code=404, detail="Student not found or not in your school.")
 
-            existing = db.query(Attendance).filter_by(
-                student_id=data.student_id,
-                date=data.date
-            ).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Attendance already recorded for this student on this date.")
-
             is_verified = True  # student attendance does not need verification
+            conflict_detail = "Attendance already recorded for this student on this date."
 
-        attendance = Attendance(
-            student_id=data.student_id,
-            teachers_id=data.teachers_id,
-            date=data.date,
+        else:
+            raise HTTPException(status_code=400, detail="Either student_id or teachers_id is required.")
+
+        # Single INSERT ... ON CONFLICT: no check-then-insert race between school and teacher submits
+        attendance_id = upsert_attendance(
+            db,
+            attendance_date=data.date,
             status=data.status,
-            is_verified=is_verified
+            is_verified=is_verified,
+            student_id=None if data.teachers_id else data.student_id,
+            teachers_id=data.teachers_id,
+            overwrite=data.overwrite,
         )
-        db.add(attendance)
+        if attendance_id is None:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=conflict_detail)
         db.commit()
-        db.refresh(attendance)
+        if not data.teachers_id:
+            invalidate_attendance_reports(school_id, data.date)
 
         end = timer()
         return {
-            "detail": "Attendance recorded successfully",
-            "id": attendance.id,
+            "detail": "Attendance updated successfully" if data.overwrite else "Attendance recorded successfully",
+            "id": attendance_id,
             "time_taken": round(end - start, 4)
         }
 
     except HTTPException:
         raise
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Attendance conflicts with an existing record.")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -1017,6 +1036,145 @@ def get_student_attendance_monthwise(student_id: int, year: int, month: int, db:
         "month": f"{year}-{month:02}",
         "attendance": status_list
     }
+@router.post("/attendance/period/", status_code=201)
+def create_period_attendance(
+    data: PeriodAttendanceCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+        marked_by = None
+    else:
+        school_id = current_user.teacher_profile.school_id
+        marked_by = current_user.teacher_profile.id
+
+    period = (
+        db.query(TimetablePeriod)
+        .join(TimetableDay, TimetablePeriod.day_id == TimetableDay.id)
+        .filter(
+            TimetablePeriod.id == data.period_id,
+            TimetablePeriod.school_id == school_id,
+            TimetableDay.class_id == data.class_id,
+            (TimetableDay.section_id == data.section_id) | (TimetableDay.section_id.is_(None)),
+        )
+        .first()
+    )
+    if not period:
+        raise HTTPException(status_code=404, detail="Period not found in this class/section timetable.")
+
+    if not data.marks:
+        raise HTTPException(status_code=400, detail="At least one mark is required.")
+    max_roll_no = db.query(func.max(Student.roll_no)).filter(
+        Student.section_id == data.section_id,
+        Student.class_id == data.class_id,
+        Student.school_id == school_id
+    ).scalar()
+    if not max_roll_no or max(mark.roll_no for mark in data.marks) > max_roll_no:
+        raise HTTPException(status_code=400, detail="Roll number out of range for this section.")
+
+    try:
+        attendance_id = save_period_attendance(
+            db, school_id, data.class_id, data.section_id, data.period_id,
+            data.date, data.marks, marked_by=marked_by
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    return {"detail": "Period attendance recorded successfully", "id": attendance_id}
+
+@router.get("/attendance/period/section/{section_id}")
+def get_section_period_attendance(
+    section_id: int,
+    on_date: date = Query(..., alias="date"),
+    class_id: int = Query(...),  # sections are shared across classes
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    records = (
+        db.query(PeriodAttendance)
+        .filter(
+            PeriodAttendance.school_id == school_id,
+            PeriodAttendance.class_id == class_id,
+            PeriodAttendance.section_id == section_id,
+            PeriodAttendance.date == on_date
+        )
+        .order_by(PeriodAttendance.period_id)
+        .all()
+    )
+    return {
+        "class_id": class_id,
+        "section_id": section_id,
+        "date": on_date,
+        "periods": [
+            {"period_id": record.period_id, "marked_by": record.marked_by, "marks": decode_roster(record.statuses)}
+            for record in records
+        ]
+    }
+
+@router.get("/attendance/period/student/{student_id}")
+def get_student_period_attendance_view(
+    student_id: int,
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    student = db.query(Student).filter(Student.id == student_id, Student.school_id == school_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found or not in your school.")
+
+    return {
+        "student_id": student.id,
+        "roll_no": student.roll_no,
+        "attendance": get_student_period_attendance(db, student, start_date, end_date)
+    }
+
+@router.get("/attendance/report/")
+def attendance_report(
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    class_id: Optional[int] = Query(None),
+    section_id: Optional[int] = Query(None),
+    student_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date.")
+
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    start = timer()
+    try:
+        report = get_attendance_report(
+            db, school_id, start_date, end_date,
+            class_id=class_id, section_id=section_id, student_id=student_id
+        )
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Attendance report exceeded its time budget. Narrow the filters or date range."
+        )
+
+    return {**report, "time_taken": round(timer() - start, 4)}
+
 @router.get("/teacher/{teacher_id}/month/{year}/{month}")
 def get_teacher_attendance_monthwise(
     teacher_id: str,  # string to allow codes like "TCH-116102"
@@ -1412,7 +1570,11 @@ def create_exam(
             exam_activation_date=data.exam_activation_date,
             inactive_date=data.inactive_date,
             max_repeat=max_repeat,
+            partial_marking=data.partial_marking,
+            negative_marking=data.negative_marking,
             status=data.status,
+            is_generated=data.is_generated,
+            subject_id=data.subject_id,
             created_by=teacher.id,
             sections=section_objs
         )
@@ -1432,48 +1594,66 @@ def create_exam(
     
 @router.get("/exams/", response_model=List[ExamListResponse])
 def list_exams(
+    status_filter: Optional[ExamStatusEnum] = Query(None, alias="status"),
+    exam_type: Optional[ExamTypeEnum] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Class and creator are joined into the page query; sections come from one
+    # extra SELECT ... IN for the whole page, so serializing never lazy-loads
+    query = db.query(Exam).options(
+        joinedload(Exam.class_obj),
+        joinedload(Exam.teacher),
+        selectinload(Exam.sections),
+    )
+
     if current_user.role == UserRole.SCHOOL:
         school = db.query(School).filter(School.user_id == current_user.id).first()
         if not school:
             raise HTTPException(status_code=404, detail="School not found")
-        
-        exams = (
-            db.query(Exam)
-            .filter(
-                Exam.school_id == school.id,
-                Exam.is_published == True
-            )
-            .all()
+
+        query = query.filter(
+            Exam.school_id == school.id,
+            Exam.is_published == True
         )
 
     elif current_user.role == UserRole.TEACHER:
         teacher = db.query(Teacher).filter(Teacher.user_id == current_user.id).first()
-        exams = db.query(Exam).filter(Exam.created_by == teacher.id).all()
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Teacher profile not found")
+        query = query.filter(Exam.created_by == teacher.id)
 
     elif current_user.role == UserRole.STUDENT:
         student = db.query(Student).filter(Student.user_id == current_user.id).first()
         if not student:
             raise HTTPException(status_code=404, detail="Student profile not found")
-    
-        exams = (
-            db.query(Exam)
-            .join(Exam.sections)
-            .filter(
-                Exam.school_id == student.school_id,
-                Exam.class_id == student.class_id,
-                Section.id == student.section_id,
-                Exam.status == ExamStatusEnum.ACTIVE,
-                Exam.is_published == True
-            )
-            .all()
+
+        query = query.filter(
+            Exam.school_id == student.school_id,
+            Exam.class_id == student.class_id,
+            Exam.sections.any(Section.id == student.section_id),
+            Exam.status == ExamStatusEnum.ACTIVE,
+            Exam.is_published == True
         )
 
     else:
         raise HTTPException(status_code=403, detail="Invalid role for viewing exams.")
 
+    if status_filter is not None:
+        query = query.filter(Exam.status == status_filter)
+    if exam_type is not None:
+        query = query.filter(Exam.exam_type == exam_type)
+
+    exams = (
+        query
+        .order_by(Exam.created_at.desc(), Exam.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
     # Serialize response
     response = [
         ExamListResponse(
@@ -1492,7 +1672,11 @@ def list_exams(
             inactive_date=exam.inactive_date,
             max_repeat=exam.max_repeat,
             status=exam.status,
-            no_students_appeared=exam.no_students_appeared,
+            no_students_appeared=exam.no_students_appeared or 0,
+            total_attempts=exam.total_attempts or 0,
+            pass_count=exam.pass_count or 0,
+            fail_count=exam.fail_count or 0,
+            average_score=round(exam.score_total / exam.total_attempts, 2) if exam.total_attempts else None,
             created_by=f"{exam.teacher.first_name} {exam.teacher.last_name}" if exam.teacher else "",
             created_at=exam.created_at
         )
@@ -1524,6 +1708,7 @@ def update_exam(
     if data.exam_type == "rank":
         exam.max_repeat = 1
 
+    touch_exam(db, exam.id)
     db.commit()
     db.refresh(exam)
     return exam
@@ -1553,8 +1738,15 @@ def delete_exam(
         raise HTTPException(status_code=403, detail="Only teachers or admins can delete exams.")
 
     try:
+        student_ids = exam_submitter_ids(db, exam_id)
         db.delete(exam)
+        db.flush()
+        # The exam's results are gone; recount the affected students' gradebooks
+        # in the same transaction, so the delete never commits without it
+        rebuild_gradebook(db, student_ids)
         db.commit()
+        invalidate_exam_caches(exam_id)
+        leaderboards.invalidate(exam_id)
         return {"detail": "Exam deleted successfully."}
     except SQLAlchemyError as e:
         db.rollback()
@@ -1622,12 +1814,18 @@ def update_exam_status(
             detail="Status can only be set to ACTIVE or DECLINED"
         )
 
-    exam.status = data.status
-    
-    # Optional: set activation date when activating
-    if data.status == ExamStatusEnum.ACTIVE:
-        exam.exam_activation_date = datetime.utcnow()
-    
+    # Approving an exam scheduled for later leaves it PENDING; the lifecycle job
+    # (app/utils/exam_lifecycle.py) activates it at exam_activation_date
+    now = datetime.utcnow()
+    exam.is_approved = data.status == ExamStatusEnum.ACTIVE
+    if data.status == ExamStatusEnum.ACTIVE and exam.exam_activation_date and exam.exam_activation_date > now:
+        exam.status = ExamStatusEnum.PENDING
+    else:
+        exam.status = data.status
+        if data.status == ExamStatusEnum.ACTIVE:
+            exam.exam_activation_date = now
+
+    touch_exam(db, exam.id)
     db.commit()
     db.refresh(exam)
 
@@ -1653,6 +1851,39 @@ def add_mcqs(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/exam/{exam_id}/mcqs/import")
+def import_mcqs_file(
+    exam_id: str,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in [UserRole.SCHOOL, UserRole.TEACHER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only school or teacher can import MCQs"
+        )
+    if not db.query(Exam.id).filter(Exam.id == exam_id).first():
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    start = timer()
+    try:
+        report = import_mcqs(db, exam_id, iter_mcq_rows(file.filename, file.file))
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "detail": f"Imported {report['imported']} MCQs" + (f", {report['failed']} rows failed" if report["failed"] else ""),
+        "exam_id": exam_id,
+        **report,
+        "time_taken": round(timer() - start, 4)
+    }
+
     
 @router.put("/exam/{mcq_id}", response_model=McqResponse)
 def update_mcq(
@@ -1668,6 +1899,10 @@ def update_mcq(
     mcq = db.query(McqBank).filter(McqBank.id == mcq_id).first()
     if not mcq:
         raise HTTPException(status_code=404, detail="MCQ not found")
+    try:
+        validate_mcq_type(mcq_update.mcq_type, mcq_update.correct_option)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     mcq.question = mcq_update.question
     mcq.mcq_type = mcq_update.mcq_type
@@ -1677,8 +1912,14 @@ def update_mcq(
     mcq.option_c = mcq_update.option_c
     mcq.option_d = mcq_update.option_d
     mcq.correct_option = mcq_update.correct_option
+    mcq.subject_id = mcq_update.subject_id
+    mcq.chapter = mcq_update.chapter
+    mcq.difficulty = mcq_update.difficulty
     mcq.updated_at = datetime.utcnow()
 
+    db.flush()
+    index_question_ids(db, [mcq.id])
+    touch_exam(db, mcq.exam_id)
     db.commit()
     db.refresh(mcq)
     return mcq
@@ -1699,6 +1940,450 @@ def delete_mcq_endpoint(
     if not success:
         raise HTTPException(status_code=404, detail="MCQ not found")
     return {"detail": "MCQ deleted successfully"}
+@router.post("/exams/{exam_id}/rescore")
+def rescore_exam_submissions(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    start = timer()
+    try:
+        rescored = rescore_exam(db, exam)
+        rebuild_gradebook(db, exam_submitter_ids(db, exam_id))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    leaderboards.rebuild(db, exam_id)
+
+    return {
+        "detail": "Exam submissions re-scored successfully",
+        "exam_id": exam_id,
+        "submissions": rescored,
+        "time_taken": round(timer() - start, 4)
+    }
+
+@router.get("/exams/{exam_id}/leaderboard")
+def get_exam_leaderboard(
+    exam_id: str,
+    scope: str = Query("exam", description="exam, school or section"),
+    section_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if scope not in LEADERBOARD_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(LEADERBOARD_SCOPES)}")
+
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    elif current_user.role == UserRole.TEACHER:
+        school_id = current_user.teacher_profile.school_id
+    elif current_user.role == UserRole.STUDENT:
+        school_id = current_user.student_profile.school_id
+    else:
+        raise HTTPException(status_code=403, detail="Invalid role for viewing leaderboards.")
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if exam.exam_type != ExamTypeEnum.RANK:
+        raise HTTPException(status_code=400, detail="Leaderboards are only available for rank exams")
+
+    # Students default to their own section; staff must name one
+    if scope == "section" and section_id is None:
+        if current_user.role != UserRole.STUDENT:
+            raise HTTPException(status_code=400, detail="section_id is required for the section scope")
+        section_id = current_user.student_profile.section_id
+    scope_id = {"exam": None, "school": school_id, "section": section_id}[scope]
+
+    response = {
+        "exam_id": exam_id,
+        "scope": scope,
+        "scope_id": scope_id,
+        "participants": len(leaderboards.board(db, exam_id, scope, scope_id)),
+        "top": leaderboards.top(db, exam_id, limit, scope, scope_id),
+    }
+    if current_user.role == UserRole.STUDENT:
+        response["me"] = leaderboards.rank(db, exam_id, current_user.student_profile.id, scope, scope_id)
+    return response
+
+@router.post("/exams/{exam_id}/leaderboard/rebuild")
+def rebuild_exam_leaderboard(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    start = timer()
+    students = leaderboards.rebuild(db, exam_id)
+    return {
+        "detail": "Leaderboard rebuilt successfully",
+        "exam_id": exam_id,
+        "students": students,
+        "time_taken": round(timer() - start, 4)
+    }
+
+@router.get("/exams/{exam_id}/item-analysis")
+def get_item_analysis(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    run = db.query(ItemAnalysisRun).filter(ItemAnalysisRun.exam_id == exam_id).first()
+    rows = (
+        db.query(QuestionStats, McqBank.question, McqBank.correct_option)
+        .join(McqBank, McqBank.id == QuestionStats.question_id)
+        .filter(QuestionStats.exam_id == exam_id)
+        .order_by(QuestionStats.question_id)
+        .all()
+    )
+    return {
+        "exam_id": exam_id,
+        "analyzed_at": run.analyzed_at if run else None,
+        "submissions": run.submissions if run else 0,
+        "is_stale": run is None or run.content_version != exam.content_version,
+        "questions": [
+            {
+                "question_id": stats.question_id,
+                "question": question,
+                "correct_option": correct_option,
+                "responses": stats.responses,
+                "difficulty": stats.difficulty,
+                "discrimination": stats.discrimination,
+                "distractors": {
+                    "A": stats.count_a,
+                    "B": stats.count_b,
+                    "C": stats.count_c,
+                    "D": stats.count_d,
+                    "blank": stats.count_blank,
+                },
+            }
+            for stats, question, correct_option in rows
+        ],
+    }
+
+@router.post("/exams/{exam_id}/item-analysis/run")
+def run_exam_item_analysis(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    start = timer()
+    try:
+        set_statement_timeout(db, settings.ITEM_ANALYSIS_STATEMENT_TIMEOUT_MS)
+        questions = analyze_exam(db, exam)
+        db.commit()
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=504, detail="Item analysis took too long; it will be completed by the scheduled job")
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "detail": "Item analysis completed",
+        "exam_id": exam_id,
+        "questions": questions,
+        "time_taken": round(timer() - start, 4)
+    }
+
+@router.post("/exams/{exam_id}/papers/generate")
+def generate_exam_papers(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    """Draw papers for every student of a generated exam up front (e.g. just before it starts)"""
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if not exam.is_generated:
+        raise HTTPException(status_code=400, detail="Exam does not use generated papers")
+
+    start = timer()
+    pool = get_pool(db, exam)
+    if not len(pool):
+        raise HTTPException(status_code=400, detail="No questions in the pool for this exam's chapters")
+    student_ids = exam_student_ids(db, exam)
+    try:
+        created = generate_papers(db, exam, pool, student_ids)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "detail": "Papers generated",
+        "exam_id": exam_id,
+        "pool_size": len(pool),
+        "questions_per_paper": min(exam.no_of_questions, len(pool)),
+        "students": len(student_ids),
+        "created": created,
+        "time_taken": round(timer() - start, 4)
+    }
+
+@router.get("/exams/{exam_id}/answer-similarity")
+def get_answer_similarity(
+    exam_id: str,
+    section_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    run = db.query(AnswerSimilarityRun).filter(AnswerSimilarityRun.exam_id == exam_id).first()
+    query = db.query(SimilarAnswerPair).filter(SimilarAnswerPair.exam_id == exam_id)
+    if section_id is not None:
+        query = query.filter(SimilarAnswerPair.section_id == section_id)
+    pairs = query.order_by(SimilarAnswerPair.similarity.desc(), SimilarAnswerPair.shared_wrong.desc()).all()
+
+    student_ids = {pair.student_a for pair in pairs} | {pair.student_b for pair in pairs}
+    names = {
+        student.id: f"{student.first_name} {student.last_name}"
+        for student in db.query(Student.id, Student.first_name, Student.last_name).filter(Student.id.in_(student_ids))
+    } if student_ids else {}
+    return {
+        "exam_id": exam_id,
+        "analyzed_at": run.analyzed_at if run else None,
+        "submissions": run.submissions if run else 0,
+        "is_stale": run is None or run.content_version != exam.content_version,
+        "pairs": [
+            {
+                "section_id": pair.section_id,
+                "student_a": {"id": pair.student_a, "name": names.get(pair.student_a), "wrong": pair.wrong_a},
+                "student_b": {"id": pair.student_b, "name": names.get(pair.student_b), "wrong": pair.wrong_b},
+                "shared_wrong": pair.shared_wrong,
+                "similarity": pair.similarity,
+            }
+            for pair in pairs
+        ],
+    }
+
+@router.post("/exams/{exam_id}/answer-similarity/run")
+def run_exam_answer_similarity(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exam = db.query(Exam).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if exam.exam_type != ExamTypeEnum.RANK:
+        raise HTTPException(status_code=400, detail="Answer similarity is only checked for rank exams")
+
+    start = timer()
+    try:
+        set_statement_timeout(db, settings.ITEM_ANALYSIS_STATEMENT_TIMEOUT_MS)
+        flagged = analyze_exam_similarity(db, exam)
+        db.commit()
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=504, detail="Similarity check took too long; it will be completed by the scheduled job")
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "detail": "Answer similarity check completed",
+        "exam_id": exam_id,
+        "flagged": flagged,
+        "time_taken": round(timer() - start, 4)
+    }
+
+@router.get("/exams/{exam_id}/answers/distribution")
+def get_answer_distribution(
+    exam_id: str,
+    question_id: Optional[int] = None,
+    option: Optional[str] = Query(None, max_length=1),
+    first_attempt_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    """Live per-question option counts straight from the stored answers (e.g. how many chose B on Q17)"""
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exists = db.query(Exam.id).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    if option is not None:
+        option = option.upper()
+        if option not in ANSWER_OPTIONS:
+            raise HTTPException(status_code=400, detail="option must be one of A, B, C, D")
+        if question_id is None:
+            raise HTTPException(status_code=400, detail="question_id is required with option")
+        return {
+            "exam_id": exam_id,
+            "question_id": question_id,
+            "option": option,
+            "count": count_choice(db, exam_id, question_id, option, first_attempt_only),
+        }
+
+    distribution = option_distribution(db, exam_id, question_id, first_attempt_only)
+    return {
+        "exam_id": exam_id,
+        "questions": [
+            {"question_id": qid, "options": counts}
+            for qid, counts in sorted(distribution.items())
+        ],
+    }
+
+@router.get("/exam-results/export")
+def export_exam_results(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    exam_id: Optional[str] = None,
+    class_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    """Download results for one exam or a term (date range) as CSV/XLSX, streamed row by row"""
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    if not exam_id and not (start_date and end_date):
+        raise HTTPException(status_code=400, detail="Provide exam_id or a start_date/end_date term")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date.")
+    if exam_id:
+        exists = db.query(Exam.id).filter(Exam.id == exam_id, Exam.school_id == school_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Exam not found")
+
+    try:
+        content = export_results(
+            format, school_id,
+            exam_id=exam_id, class_id=class_id, start_date=start_date, end_date=end_date,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"results_{exam_id or f'{start_date}_{end_date}'}.{format}"
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/question-bank/search")
+def search_questions(
+    q: Optional[str] = Query(None, max_length=200),
+    class_id: Optional[int] = None,
+    chapter: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    try:
+        return search_question_bank(db, school_id, q, class_id, chapter, limit, cursor, subject_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/question-bank/duplicates")
+def list_duplicate_questions(
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER)),
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    start = timer()
+    # Questions added before signatures existed are indexed on first use
+    backfilled = backfill_signatures(db, school_id)
+    if backfilled:
+        db.commit()
+
+    pairs = find_duplicates(db, school_id, threshold=threshold)
+    clusters = cluster_pairs(pairs)
+    question_ids = sorted({question_id for cluster in clusters for question_id in cluster})
+    questions = {
+        row.id: row
+        for row in db.query(McqBank.id, McqBank.exam_id, McqBank.question).filter(McqBank.id.in_(question_ids)).all()
+    } if question_ids else {}
+
+    return {
+        "threshold": threshold if threshold is not None else settings.DEDUPE_SIMILARITY_THRESHOLD,
+        "pairs": len(pairs),
+        "groups": [
+            [
+                {"id": question_id, "exam_id": questions[question_id].exam_id, "question": questions[question_id].question}
+                for question_id in cluster if question_id in questions
+            ]
+            for cluster in clusters
+        ],
+        "backfilled": backfilled,
+        "time_taken": round(timer() - start, 4)
+    }
+
 @router.get("/exam/{exam_id}")
 def fetch_mcqs(exam_id: str, db: Session = Depends(get_db),current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.SCHOOL, UserRole.TEACHER,UserRole.STUDENT]:
@@ -1706,25 +2391,32 @@ def fetch_mcqs(exam_id: str, db: Session = Depends(get_db),current_user: User =
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only school or teacher can fetch MCQs"
         )
-    mcqs = get_mcqs_by_exam(db, exam_id)
     if current_user.role == UserRole.STUDENT:
-        return [
-            {
-                "id": mcq.id,
-                "exam_id": mcq.exam_id,
-                "question": mcq.question,
-                "mcq_type": mcq.mcq_type,
-                "image": mcq.image,
-                "option_a": mcq.option_a,
-                "option_b": mcq.option_b,
-                "option_c": mcq.option_c,
-                "option_d": mcq.option_d,
-            }
-            for mcq in mcqs
-        ]
+        if not current_user.student_profile:
+            raise HTTPException(status_code=400, detail="Student profile not found")
+        # Serve the cached pre-serialized paper, shuffled per student
+        exam = db.query(Exam).filter(Exam.id == exam_id).first()
+        if not exam:
+            return Response(content=b"[]", media_type="application/json")
+        if exam.status != ExamStatusEnum.ACTIVE:
+            raise HTTPException(status_code=400, detail="Exam is not active")
+        paper = get_paper(db, exam)
+        question_ids = None
+        if exam.is_generated:
+            # Only the questions drawn for this student (drawn now on first fetch)
+            question_ids = assigned_question_ids(db, exam, get_pool(db, exam), current_user.student_profile.id)
+            db.commit()
+        return Response(
+            content=paper.render(
+                current_user.student_profile.id,
+                shuffle=settings.SHUFFLE_EXAM_PAPERS,
+                question_ids=question_ids,
+            ),
+            media_type="application/json"
+        )
 
     # For school and teacher, return full rows from DB
-    return mcqs
+    return get_mcqs_by_exam(db, exam_id)
 
 @router.post("/{exam_id}/submit")
 def submit_exam(
@@ -1741,52 +2433,157 @@ def submit_exam(
     if not student_profile:
         raise HTTPException(status_code=400, detail="Student profile not found")
 
-    # Find last attempt for this student & exam
-    last_attempt = (
-        db.query(StudentExamData)
-        .filter(
-            StudentExamData.student_id == student_profile.id,
-            StudentExamData.exam_id == exam_id
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if exam.status != ExamStatusEnum.ACTIVE:
+        raise HTTPException(status_code=400, detail="Exam is not active")
+
+    # Reserve the next attempt number atomically; None once max_repeat is used up
+    next_attempt_no = allocate_attempt(db, student_profile.id, exam_id, exam.max_repeat)
+    if next_attempt_no is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Maximum number of attempts reached for this exam")
+
+    # Final answers: the client's full answer set over the autosaved session (if any).
+    # The client wins: autosaves still unflushed on another worker are not in the row
+    session = load_session(db, exam_id, student_profile.id, for_update=True)
+    final_answers = dict(session["answers"]) if session and session["status"] == "active" else {}
+    final_answers.update(answers_map(submission.answers))
+    # Stored in the shapes the containment queries in app/utils/answer_queries.py match
+    answers = normalize_answers(answers_list(final_answers))
+    paper_size = None
+    if exam.is_generated:
+        # Only answers to the student's own drawn questions count, out of the questions drawn
+        assigned = set(assigned_question_ids(db, exam, get_pool(db, exam), student_profile.id))
+        answers = [ans for ans in answers if ans["question_id"] in assigned]
+        paper_size = len(assigned)
+
+    # Score against the cached compiled answer key (bitmask per question)
+    answer_key = get_answer_key(db, exam)
+    scored = score_submission(answer_key, answers, exam, paper_size=paper_size)
+    result_percentage = scored["percentage"]
+    status_result = scored["status"]
+
+    record = {
+        "submission_uid": str(uuid.uuid4()),
+        "student_id": student_profile.id,               # ✅ from student profile
+        "school_id": student_profile.school_id,         # ✅ school comes from student profile
+        "exam_id": exam_id,
+        "attempt_no": next_attempt_no,
+        "answers": answers,
+        "result": round(result_percentage),
+        "status": status_result,
+        "submitted_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    # Save result: acknowledged once durable in the WAL, flushed to the DB in batches
+    if settings.SUBMISSION_WRITE_BEHIND:
+        # The attempt reservation commits first: a record in the WAL is persisted no
+        # matter what, so it must never outlive a rolled-back reservation (a retry
+        # would then reuse its attempt number)
+        db.commit()
+        try:
+            submission_pipeline.submit(record)
+        except Exception as e:
+            # Not accepted: give the attempt back
+            release_attempt(db, student_profile.id, exam_id, next_attempt_no)
+            db.commit()
+            if isinstance(e, PipelineFull):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many submissions in flight, please retry.",
+                    headers={"Retry-After": "2"}
+                )
+            raise
+        # The submission is accepted; a failure to close the session must not fail it
+        try:
+            close_session(db, exam_id, student_profile.id, final_answers)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Closing exam session {exam_id}/{student_profile.id} failed: {str(e)}")
+    else:
+        persist_submissions(db, [record])
+        # Closes the session if there is one; later autosave flushes for it are dropped
+        close_session(db, exam_id, student_profile.id, final_answers)
+        db.commit()
+
+    if exam.exam_type == ExamTypeEnum.RANK:
+        leaderboards.record(
+            exam_id, student_profile.id, student_profile.school_id, student_profile.section_id,
+            record["result"], datetime.fromisoformat(record["submitted_at"])
         )
-        .order_by(StudentExamData.attempt_no.desc())
-        .first()
-    )
-    next_attempt_no = last_attempt.attempt_no + 1 if last_attempt else 1
-
-    # Fetch exam questions
-    mcqs = db.query(McqBank).filter(McqBank.exam_id == exam_id).all()
-    mcq_map = {mcq.id: mcq for mcq in mcqs}
-
-    correct_count = 0
-    total = len(submission.answers)
-
-    for ans in submission.answers:
-        mcq = mcq_map.get(ans.question_id)
-        if mcq and mcq.correct_option == ans.selected_option:
-            correct_count += 1
-
-    result_percentage = (correct_count / total * 100) if total > 0 else 0
-    status_result = "pass" if result_percentage >= 40 else "fail"  # threshold
-
-    # Save result
-    student_exam_data = StudentExamData(
-        student_id=student_profile.id,               # ✅ from student profile
-        school_id=student_profile.school_id,         # ✅ school comes from student profile
-        exam_id=exam_id,
-        attempt_no=next_attempt_no,
-        answers=[ans.dict() for ans in submission.answers],
-        result=result_percentage,
-        status=status_result,
-        submitted_at=datetime.utcnow()
-    )
-    db.add(student_exam_data)
-    db.commit()
-    db.refresh(student_exam_data)
 
     return {
         "detail": "Exam submitted successfully",
+        "submission_id": record["submission_uid"],
         "exam_id": exam_id,
         "attempt_no": next_attempt_no,
         "result": result_percentage,
+        "correct": scored["correct"],
+        "total": scored["total"],
         "status": status_result
-    }
\ No newline at end of file
+    }
+
+def _student_exam(db: Session, current_user, exam_id: str):
+    """Student profile and ACTIVE exam for the session endpoints."""
+    if current_user.role != UserRole.STUDENT:
+        raise HTTPException(status_code=403, detail="Only students can take exams")
+    student_profile = current_user.student_profile
+    if not student_profile:
+        raise HTTPException(status_code=400, detail="Student profile not found")
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if exam.status != ExamStatusEnum.ACTIVE:
+        raise HTTPException(status_code=400, detail="Exam is not active")
+    return student_profile, exam
+
+@router.post("/{exam_id}/session/start")
+def start_exam_session(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Start the exam, or resume the active session with its autosaved answers"""
+    student_profile, exam = _student_exam(db, current_user, exam_id)
+    start_session(db, exam_id, student_profile.id, student_profile.school_id)
+    db.commit()
+    session = load_session(db, exam_id, student_profile.id)
+    return {**session, "answers": answers_list(session["answers"])}
+
+@router.get("/{exam_id}/session")
+def get_exam_session(
+    exam_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.STUDENT or not current_user.student_profile:
+        raise HTTPException(status_code=403, detail="Only students can take exams")
+    session = load_session(db, exam_id, current_user.student_profile.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="No session for this exam")
+    return {**session, "answers": answers_list(session["answers"])}
+
+@router.post("/{exam_id}/session/autosave", status_code=202)
+def autosave_exam_session(
+    exam_id: str,
+    data: ExamAutosaveRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Buffer changed answers in this worker; they reach the database with the next batched flush"""
+    if current_user.role != UserRole.STUDENT or not current_user.student_profile:
+        raise HTTPException(status_code=403, detail="Only students can take exams")
+    autosave_buffer.save(exam_id, current_user.student_profile.id, data.seq, answers_map(data.answers))
+    return {"detail": "Saved", "seq": data.seq}
+
+@router.post("/{exam_id}/session/heartbeat", status_code=202)
+def heartbeat_exam_session(
+    exam_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.STUDENT or not current_user.student_profile:
+        raise HTTPException(status_code=403, detail="Only students can take exams")
+    autosave_buffer.heartbeat(exam_id, current_user.student_profile.id)
+    return {"detail": "OK"}
\ No newline at end of file
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException,status
 from app.models.users import User,Otp
 from app.models.students import Student,Parent,PresentAddress,PermanentAddress
-from app.models.school import School,Class,Section,Attendance,Transport,StudentExamData
+from app.models.school import School,Class,Section,Attendance,Transport,StudentGradebook
 from app.schemas.users import UserRole
 from app.schemas.students import StudentCreateRequest,ParentWithAddressCreate
 from sqlalchemy.orm import Session,joinedload
@@ -12,6 +12,8 @@ from app.core.dependencies import get_current_user
 from app.utils.permission import require_roles
 from app.core.security import create_verification_token
 from app.utils.email_utility import send_dynamic_email
+from app.utils.gradebook import gradebook_rows, gradebook_entry, summarize
+from typing import Optional
 router = APIRouter()
 @router.post("/students/create")
 def create_student(
@@ -214,6 +216,81 @@ def get_students(
         for index, (student, attendance_count) in enumerate(students_query)
     ]
 
+@router.get("/students/profile/gradebook")
+def get_own_gradebook(
+    academic_year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(UserRole.STUDENT))
+):
+    student = current_user.student_profile
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not found.")
+    gradebook = gradebook_rows(db, student.id, academic_year)
+    return {
+        "student_id": student.id,
+        **summarize(gradebook),
+        "gradebook": [gradebook_entry(book, subject_name) for book, subject_name, _ in gradebook],
+    }
+
+@router.get("/students/{student_id}/gradebook")
+def get_student_gradebook(
+    student_id: int,
+    academic_year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER))
+):
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    exists = db.query(Student.id).filter(Student.id == student_id, Student.school_id == school_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Student not found.")
+    gradebook = gradebook_rows(db, student_id, academic_year)
+    return {
+        "student_id": student_id,
+        **summarize(gradebook),
+        "gradebook": [gradebook_entry(book, subject_name) for book, subject_name, _ in gradebook],
+    }
+
+@router.get("/gradebook/report")
+def gradebook_report(
+    academic_year: int,
+    class_id: Optional[int] = None,
+    section_id: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(UserRole.SCHOOL, UserRole.TEACHER))
+):
+    """Class/section results for an academic year, one row per student and subject"""
+    if current_user.role == UserRole.SCHOOL:
+        school_id = current_user.school_profile.id
+    else:
+        school_id = current_user.teacher_profile.school_id
+
+    query = (
+        db.query(StudentGradebook, Student.first_name, Student.last_name, Student.roll_no)
+        .join(Student, Student.id == StudentGradebook.student_id)
+        .filter(StudentGradebook.school_id == school_id, StudentGradebook.academic_year == academic_year)
+    )
+    if class_id is not None:
+        query = query.filter(Student.class_id == class_id)
+    if section_id is not None:
+        query = query.filter(Student.section_id == section_id)
+    if subject_id is not None:
+        query = query.filter(StudentGradebook.subject_id == subject_id)
+
+    return [
+        {
+            "student_id": book.student_id,
+            "student_name": f"{first_name} {last_name}",
+            "roll_no": roll_no,
+            **gradebook_entry(book),
+        }
+        for book, first_name, last_name, roll_no in query.order_by(Student.roll_no, StudentGradebook.subject_id)
+    ]
+
 @router.get("/students/{student_id}")
 def get_student(
     student_id: int,
@@ -233,20 +310,16 @@ def get_student(
             joinedload(Student.section),
             joinedload(Student.parent),
             joinedload(Student.present_address),
-            joinedload(Student.permanent_address),
-            joinedload(Student.exam_data)
+            joinedload(Student.permanent_address)
         )
         .first()
     )
 
     if not student:
         raise HTTPException(status_code=404, detail="Student not found.")
-    last_exam = (
-    db.query(StudentExamData)
-    .filter(StudentExamData.student_id == student.id)
-    .order_by(StudentExamData.submitted_at.desc())
-    .first()
-       )
+    # Cross-exam results come from the incrementally maintained gradebook
+    gradebook = gradebook_rows(db, student.id)
+    summary = summarize(gradebook)
 
     return {
         "student_id": student.id,
@@ -255,9 +328,12 @@ def get_student(
         "class_name": student.classes.name,
         "section_name": student.section.name if student.section else None,
         "created_at": student.created_at,
-        "last_appeared_exam":last_exam.submitted_at if last_exam else None,
-        "exam_type":last_exam.exam.exam_type if last_exam and last_exam.exam else None,
-        "exam_result":last_exam.result if last_exam else None,
+        "last_appeared_exam": summary["last_appeared_exam"],
+        "exam_type": summary["exam_type"],
+        "exam_result": summary["exam_result"],
+        "total_exams": summary["total_exams"],
+        "average_score": summary["average_score"],
+        "gradebook": [gradebook_entry(book, subject_name) for book, subject_name, _ in gradebook],
         "parent": {
             "parent_name": student.parent.parent_name,
             "relation": student.parent.relation,
@@ -301,20 +377,15 @@ def get_own_student_profile(
             joinedload(Student.section),
             joinedload(Student.parent),
             joinedload(Student.present_address),
-            joinedload(Student.permanent_address),
-            joinedload(Student.exam_data)
+            joinedload(Student.permanent_address)
         )
         .first()
     )
 
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found.")
-    last_exam = (
-    db.query(StudentExamData)
-    .filter(StudentExamData.student_id == student.id)
-    .order_by(StudentExamData.submitted_at.desc())
-    .first()
-       )
+    gradebook = gradebook_rows(db, student.id)
+    summary = summarize(gradebook)
 
     return {
         "student_id": student.id,
@@ -324,8 +395,11 @@ def get_own_student_profile(
         "section_name": student.section.name if student.section else None,
         "created_at": student.created_at,
         "total_attendance": len(student.attendances) if student.attendances else 0,
-        "total_exams": len(student.exam_data) if student.exam_data else 0,
-        "last_appeared_exam":last_exam.submitted_at if last_exam else None,
+        "total_exams": summary["total_exams"],
+        "last_appeared_exam": summary["last_appeared_exam"],
+        "average_score": summary["average_score"],
+        "best_score": summary["best_score"],
+        "gradebook": [gradebook_entry(book, subject_name) for book, subject_name, _ in gradebook],
         # "exam_given": sum(1 for exam in student.exam_data if exam.is_exam_given) if student.exam_data else 0,
         "parent": {
             "parent_name": student.parent.parent_name,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, HttpUrl,Field
-from typing import Optional,List,Dict
+from typing import Optional,List,Dict,Union
 from datetime import time
 from datetime import date,datetime
 from enum import Enum
@@ -125,11 +125,23 @@ class AttendanceCreate(BaseModel):
     date: date
     status: str = Field(..., max_length=1)
     is_verified:bool =Field(default=True)
+    overwrite: bool = Field(default=False)  # replace an existing record for the same day instead of 409
 
     model_config = {
         "from_attributes": True
     } 
     
+class PeriodMark(BaseModel):
+    roll_no: int = Field(..., ge=1)
+    status: str = Field(..., min_length=1, max_length=1, pattern="^[A-Za-z]$")
+
+class PeriodAttendanceCreate(BaseModel):
+    class_id: int
+    section_id: int
+    period_id: int
+    date: date
+    marks: List[PeriodMark]
+
 class WeekDay(str,Enum):
     MONDAY = "MONDAY"
     TUESDAY = "TUESDAY"
@@ -188,7 +200,12 @@ class ExamCreateRequest(BaseModel):
     exam_activation_date: datetime
     inactive_date: Optional[datetime] = None
     max_repeat: Optional[int] = 1
+    partial_marking: bool = False
+    negative_marking: float = Field(default=0, ge=0)
     status: Optional[ExamStatusEnum] = ExamStatusEnum.PENDING
+    # Draw each student's paper from the chapter-tagged question pool
+    is_generated: bool = False
+    subject_id: Optional[int] = None
 
 class ExamUpdateRequest(BaseModel):
     exam_type: Optional[str] = None
@@ -200,6 +217,8 @@ class ExamUpdateRequest(BaseModel):
     exam_activation_date: Optional[datetime] = None
     inactive_date: Optional[datetime] = None
     max_repeat: Optional[int] = None
+    partial_marking: Optional[bool] = None
+    negative_marking: Optional[float] = Field(default=None, ge=0)
     status: Optional[str] = None
 
 
@@ -220,6 +239,10 @@ class ExamListResponse(BaseModel):
     max_repeat: int
     status: ExamStatusEnum
     no_students_appeared: int
+    total_attempts: int = 0
+    pass_count: int = 0
+    fail_count: int = 0
+    average_score: Optional[float] = None
     created_by: str
     created_at: datetime
     model_config = {
@@ -235,11 +258,16 @@ class McqCreate(BaseModel):
     question: str
     mcq_type: str = Field(..., pattern="^(1|2)$") 
     image: Optional[str] = None
-    option_a: str
-    option_b: str
-    option_c: str
-    option_d: str
+    # mcq_bank.option_* are VARCHAR(100)
+    option_a: str = Field(..., max_length=100)
+    option_b: str = Field(..., max_length=100)
+    option_c: str = Field(..., max_length=100)
+    option_d: str = Field(..., max_length=100)
     correct_option: List[str]  # ["A"] or ["A","C"]
+    # Question pool tags (optional)
+    subject_id: Optional[int] = None
+    chapter: Optional[int] = None
+    difficulty: Optional[int] = Field(default=None, ge=1, le=3)  # 1 easy, 2 medium, 3 hard
 
 class McqBulkCreate(BaseModel):
     mcqs: List[McqCreate]
@@ -249,10 +277,19 @@ class ExamStatusUpdateRequest(BaseModel):
 
 class AnswerSchema(BaseModel):
     question_id: int
-    selected_option: str  
+    selected_option: Union[str, List[str]]  # "A", or ["A","C"] for multi-correct
 
 class StudentExamSubmitRequest(BaseModel):
+    # The complete final answer set; it overrides the autosaved session answers
     answers: List[AnswerSchema]
+
+class AutosaveAnswerSchema(BaseModel):
+    question_id: int
+    selected_option: Optional[Union[str, List[str]]] = None  # None clears the answer
+
+class ExamAutosaveRequest(BaseModel):
+    seq: int = Field(..., ge=0)  # client-side autosave counter, increasing per session
+    answers: List[AutosaveAnswerSchema]
 class McqResponse(McqCreate):
     id: int
     exam_id: str
@@ -0,0 +1,136 @@
+"""
+SQL-side queries over stored answers.
+
+StudentExamData.answers is JSONB (`[{question_id, selected_option}, ...]`,
+selected_option being "B" or ["A", "C"]) with a `jsonb_path_ops` GIN index, so
+"how many chose B on Q17" is a containment test the index answers directly:
+
+    answers @> '[{"question_id": 17, "selected_option": "B"}]'
+    OR answers @> '[{"question_id": 17, "selected_option": ["B"]}]'
+
+(the array form matches any multi-select that includes B). Submissions are
+written with selections normalized to those two shapes (normalize_answers:
+upper-case, trimmed, multi-selects sorted), so containment agrees with scoring
+and with the distribution query. Rows stored before that are rewritten once by
+normalize_stored_answers (scripts/normalize_answers.py). Whole-exam
+distributions unnest the answers with jsonb_array_elements in one grouped
+query instead of loading submissions into Python.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, or_, select, text, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.models.school import StudentExamData
+from app.utils.exam_scoring import mask_options, option_mask
+
+OPTIONS = ("A", "B", "C", "D")
+
+
+def normalize_selection(selected):
+    """Selection as scoring reads it: " b" -> "B", ["c", "a"] or "A,C" -> ["A", "C"], None if empty."""
+    options = mask_options(option_mask(selected))
+    if not options:
+        return None
+    return options[0] if len(options) == 1 else options
+
+
+def normalize_answers(answers: Iterable[dict]) -> List[dict]:
+    """Submission answers with every selection normalized, dropping those without a valid option."""
+    normalized = []
+    for answer in answers:
+        selected = normalize_selection(answer.get("selected_option"))
+        if selected is not None:
+            normalized.append({**answer, "selected_option": selected})
+    return normalized
+
+
+def normalize_stored_answers(db: Session, batch_size: int = 1000) -> Tuple[int, int]:
+    """Rewrite stored submissions whose answers are not normalized yet, one commit per batch.
+
+    Walks student_exam_data in (submitted_at, id) order so each batch is a short
+    transaction. Returns (rows scanned, rows rewritten).
+    """
+    scanned = rewritten = 0
+    last = None
+    while True:
+        stmt = (
+            select(StudentExamData.id, StudentExamData.submitted_at, StudentExamData.answers)
+            .order_by(StudentExamData.submitted_at, StudentExamData.id)
+            .limit(batch_size)
+        )
+        if last is not None:
+            stmt = stmt.where(tuple_(StudentExamData.submitted_at, StudentExamData.id) > last)
+        rows = db.execute(stmt).all()
+        if not rows:
+            break
+        for row in rows:
+            answers = normalize_answers(row.answers or [])
+            if answers != row.answers:
+                db.execute(
+                    update(StudentExamData)
+                    .where(StudentExamData.id == row.id, StudentExamData.submitted_at == row.submitted_at)
+                    .values(answers=answers)
+                )
+                rewritten += 1
+        db.commit()
+        scanned += len(rows)
+        last = (rows[-1].submitted_at, rows[-1].id)
+    return scanned, rewritten
+
+
+def chose_option(question_id: int, option: str):
+    """Filter clause: the submission selected `option` (alone or in a multi-select) on `question_id`."""
+    option = option.strip().upper()
+    return or_(
+        StudentExamData.answers.contains([{"question_id": question_id, "selected_option": option}]),
+        StudentExamData.answers.contains([{"question_id": question_id, "selected_option": [option]}]),
+    )
+
+
+def count_choice(db: Session, exam_id: str, question_id: int, option: str,
+                 first_attempt_only: bool = False) -> int:
+    """Number of submissions to `exam_id` that chose `option` on `question_id`."""
+    stmt = select(func.count()).select_from(StudentExamData).where(
+        StudentExamData.exam_id == exam_id, chose_option(question_id, option)
+    )
+    if first_attempt_only:
+        stmt = stmt.where(StudentExamData.attempt_no == 1)
+    return db.execute(stmt).scalar() or 0
+
+
+_DISTRIBUTION_SQL = text("""
+    SELECT (answer->>'question_id')::bigint AS question_id,
+           upper(choice) AS option,
+           count(*) AS responses
+    FROM student_exam_data sed
+    CROSS JOIN LATERAL jsonb_array_elements(sed.answers) AS answer
+    CROSS JOIN LATERAL jsonb_array_elements_text(
+        CASE jsonb_typeof(answer->'selected_option')
+            WHEN 'array' THEN answer->'selected_option'
+            WHEN 'string' THEN jsonb_build_array(answer->'selected_option')
+            ELSE '[]'::jsonb
+        END
+    ) AS choice
+    WHERE sed.exam_id = :exam_id
+      AND (:question_id IS NULL OR answer->>'question_id' = CAST(:question_id AS text))
+      AND (NOT :first_attempt_only OR sed.attempt_no = 1)
+    GROUP BY 1, 2
+""").bindparams(
+    bindparam("question_id", type_=StudentExamData.id.type),
+)
+
+
+def option_distribution(db: Session, exam_id: str, question_id: Optional[int] = None,
+                        first_attempt_only: bool = False) -> Dict[int, Dict[str, int]]:
+    """{question_id: {"A": n, "B": n, "C": n, "D": n}} for an exam, optionally one question."""
+    rows = db.execute(_DISTRIBUTION_SQL, {
+        "exam_id": exam_id,
+        "question_id": question_id,
+        "first_attempt_only": first_attempt_only,
+    }).all()
+    distribution: Dict[int, Dict[str, int]] = {}
+    for row in rows:
+        if row.option in OPTIONS:
+            distribution.setdefault(row.question_id, dict.fromkeys(OPTIONS, 0))[row.option] = row.responses
+    return distribution
@@ -0,0 +1,204 @@
+"""
+Answer-similarity detection for rank exams.
+
+Each student's first attempt is encoded into the option-mask matrix (see
+app/utils/exam_scoring.py). Only the wrong answers are kept, as 16 bits per
+question: a question answered wrongly sets the one bit indexed by its option
+mask (1-15), packed into uint64 words. Two students share a set bit only when
+they gave the identical wrong answer to a question (the same options, not just
+one of them), so for a pair:
+
+    shared_wrong = popcount(a & b)    similarity = shared / (|a| + |b| - shared)
+
+and |a| is the number of questions a answered wrongly.
+
+Students are compared only within their section. A block of rows is ANDed
+against the whole section at once and popcounted with np.bitwise_count, so the
+work is a few vectorized passes over (block x section x words) arrays. Blocks
+are sized to keep that intermediate bounded. Pairs that reach both
+ANSWER_SIMILARITY_MIN_SHARED_WRONG and ANSWER_SIMILARITY_THRESHOLD replace the
+exam's stored flags. Runs are tracked like item analysis, so the scheduled job
+skips exams with nothing new.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal, set_statement_timeout
+from app.models.school import (
+    AnswerSimilarityRun, Exam, ExamStatusEnum, ExamTypeEnum, SimilarAnswerPair, StudentExamData,
+)
+from app.models.students import Student
+from app.utils.exam_scoring import POPCOUNT, AnswerKey, load_answer_key
+
+STREAM_CHUNK_SIZE = 2000
+# Upper bound on block x section x words (uint64) held at once: 4M words = 32 MB
+MAX_BLOCK_WORDS = 4_000_000
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 element."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    as_bytes = POPCOUNT[words.view(np.uint8)]
+    return as_bytes.reshape(*words.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def wrong_answer_bits(key: AnswerKey, selections: np.ndarray) -> np.ndarray:
+    """(students x words) uint64 bit vectors of wrong answers, one-hot over the 16 masks per question."""
+    students = selections.shape[0]
+    correct = key.correct_masks[np.newaxis, :]
+    is_wrong = (selections != 0) & (selections != correct) & key.answerable[np.newaxis, :]
+    wrong = np.where(is_wrong, selections, 0)
+    bits = (wrong[:, :, np.newaxis] == np.arange(16, dtype=wrong.dtype)) & is_wrong[:, :, np.newaxis]
+    packed = np.packbits(bits.reshape(students, -1), axis=1)
+    padding = (-packed.shape[1]) % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def similar_pairs(vectors: np.ndarray, threshold: float, min_shared: int):
+    """
+    All pairs (i < j) of rows reaching `threshold` and `min_shared`; returns
+    arrays (i, j, shared, similarity) plus per-row wrong counts.
+    """
+    students, words = vectors.shape
+    wrong = popcount(vectors).sum(axis=1, dtype=np.int64)
+    found = [[], [], [], []]
+    if students < 2 or not words:
+        return tuple(np.asarray(part) for part in found), wrong
+
+    block = max(1, MAX_BLOCK_WORDS // max(students * words, 1))
+    for start in range(0, students, block):
+        rows = vectors[start:start + block]
+        shared = popcount(rows[:, np.newaxis, :] & vectors[np.newaxis, :, :]).sum(axis=2, dtype=np.int64)
+        union = wrong[start:start + block, np.newaxis] + wrong[np.newaxis, :] - shared
+        similarity = np.divide(shared, union, out=np.zeros(shared.shape), where=union > 0)
+        i, j = np.nonzero((shared >= min_shared) & (similarity >= threshold))
+        i += start
+        upper = j > i
+        found[0].append(i[upper])
+        found[1].append(j[upper])
+        found[2].append(shared[i[upper] - start, j[upper]])
+        found[3].append(similarity[i[upper] - start, j[upper]])
+    return tuple(np.concatenate(part) for part in found), wrong
+
+
+def load_sections(db: Session, key: AnswerKey, exam_id: str) -> dict:
+    """{section_id: (student_ids, selection matrix)} from first attempts, streamed."""
+    result = db.execute(
+        select(StudentExamData.student_id, Student.section_id, StudentExamData.answers)
+        .join(Student, Student.id == StudentExamData.student_id)
+        .where(StudentExamData.exam_id == exam_id, StudentExamData.attempt_no == 1)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    students, chunks = defaultdict(list), defaultdict(list)
+    for partition in result.partitions():
+        by_section = defaultdict(list)
+        for row in partition:
+            by_section[row.section_id].append(row)
+        for section_id, rows in by_section.items():
+            students[section_id].extend(row.student_id for row in rows)
+            chunks[section_id].append(key.encode_many(row.answers or [] for row in rows))
+    return {section_id: (students[section_id], np.vstack(chunks[section_id])) for section_id in students}
+
+
+def analyze_exam_similarity(db: Session, exam: Exam, threshold: Optional[float] = None,
+                            min_shared: Optional[int] = None) -> int:
+    """Recompute and store flagged pairs for one exam; returns the number of pairs flagged."""
+    threshold = settings.ANSWER_SIMILARITY_THRESHOLD if threshold is None else threshold
+    min_shared = settings.ANSWER_SIMILARITY_MIN_SHARED_WRONG if min_shared is None else min_shared
+
+    key = load_answer_key(db, exam)
+    sections = load_sections(db, key, exam.id)
+    now = datetime.now(timezone.utc)
+
+    rows, submissions = [], 0
+    for section_id, (student_ids, selections) in sections.items():
+        submissions += len(student_ids)
+        (i, j, shared, similarity), wrong = similar_pairs(wrong_answer_bits(key, selections), threshold, min_shared)
+        for a, b, count, score in zip(i.tolist(), j.tolist(), shared.tolist(), similarity.tolist()):
+            first, second = sorted((a, b), key=lambda index: student_ids[index])
+            rows.append({
+                "exam_id": exam.id,
+                "section_id": section_id,
+                "student_a": student_ids[first],
+                "student_b": student_ids[second],
+                "shared_wrong": int(count),
+                "wrong_a": int(wrong[first]),
+                "wrong_b": int(wrong[second]),
+                "similarity": round(float(score), 4),
+                "detected_at": now,
+            })
+
+    db.execute(delete(SimilarAnswerPair).where(SimilarAnswerPair.exam_id == exam.id))
+    if rows:
+        db.execute(insert(SimilarAnswerPair), rows)
+
+    run = {
+        "exam_id": exam.id,
+        "content_version": exam.content_version,
+        "exam_status": exam.status,
+        "submissions": submissions,
+        "flagged": len(rows),
+        "analyzed_at": now,
+    }
+    stmt = pg_insert(AnswerSimilarityRun).values(run)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["exam_id"],
+        set_={column: stmt.excluded[column] for column in run if column != "exam_id"},
+    ))
+    return len(rows)
+
+
+def stale_rank_exams(db: Session) -> List[Exam]:
+    """Active or closed rank exams whose similarity check is missing or out of date."""
+    first_attempts = (
+        select(func.count())
+        .where(StudentExamData.exam_id == Exam.id, StudentExamData.attempt_no == 1)
+        .correlate(Exam)
+        .scalar_subquery()
+    )
+    return (
+        db.query(Exam)
+        .outerjoin(AnswerSimilarityRun, AnswerSimilarityRun.exam_id == Exam.id)
+        .filter(
+            Exam.exam_type == ExamTypeEnum.RANK,
+            Exam.status.in_([ExamStatusEnum.ACTIVE, ExamStatusEnum.EXPIRED]),
+            or_(
+                AnswerSimilarityRun.exam_id.is_(None),
+                AnswerSimilarityRun.content_version != Exam.content_version,
+                AnswerSimilarityRun.exam_status != Exam.status,
+                and_(Exam.status == ExamStatusEnum.ACTIVE, first_attempts != AnswerSimilarityRun.submissions),
+            ),
+        )
+        .all()
+    )
+
+
+def run_answer_similarity():
+    """Scheduled job: re-check every stale rank exam, one commit per exam."""
+    db = SessionLocal()
+    analyzed = 0
+    try:
+        for exam_id in [exam.id for exam in stale_rank_exams(db)]:
+            try:
+                set_statement_timeout(db, settings.ITEM_ANALYSIS_STATEMENT_TIMEOUT_MS)
+                flagged = analyze_exam_similarity(db, db.get(Exam, exam_id))
+                db.commit()
+                analyzed += 1
+                if flagged:
+                    print(f"Answer similarity: {flagged} pairs flagged in exam {exam_id}")
+            except Exception as e:
+                db.rollback()
+                print(f"Answer similarity for exam {exam_id} failed: {str(e)}")
+        return {"analyzed": analyzed}
+    finally:
+        db.close()
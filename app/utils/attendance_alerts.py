@@ -0,0 +1,135 @@
+import time
+from datetime import date, datetime
+from itertools import groupby
+from typing import Optional
+
+from sqlalchemy import and_, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal, set_statement_timeout
+from app.models.school import Attendance, AttendanceAlert, Class, School, Section, class_section
+from app.models.students import Student
+from app.utils.email_utility import send_dynamic_email
+
+SUNDAY = 6
+
+
+def detect_missing_attendance(db: Session, on_date: date) -> int:
+    """
+    Record an alert for every (school, class, section) that has students but no
+    attendance row on `on_date`, across all schools, in one INSERT ... SELECT.
+
+    The SELECT is an anti-join: students LEFT JOIN that day's attendance, grouped
+    per section and kept only when no attendance matched. Existing alerts are left
+    untouched, so repeated runs are idempotent. Returns the number of new alerts.
+    """
+    missing = (
+        select(
+            class_section.c.school_id,
+            class_section.c.class_id,
+            class_section.c.section_id,
+            literal(on_date),
+            func.count(Student.id.distinct()),
+        )
+        .join(School, and_(School.id == class_section.c.school_id, School.is_active == True))
+        .join(
+            Student,
+            and_(
+                Student.school_id == class_section.c.school_id,
+                Student.class_id == class_section.c.class_id,
+                Student.section_id == class_section.c.section_id,
+            ),
+        )
+        .outerjoin(Attendance, and_(Attendance.student_id == Student.id, Attendance.date == on_date))
+        .group_by(class_section.c.school_id, class_section.c.class_id, class_section.c.section_id)
+        .having(func.count(Attendance.id) == 0)
+    )
+    stmt = (
+        pg_insert(AttendanceAlert)
+        .from_select(["school_id", "class_id", "section_id", "date", "student_count"], missing)
+        .on_conflict_do_nothing(index_elements=["school_id", "class_id", "section_id", "date"])
+        .returning(AttendanceAlert.id)
+    )
+    return len(db.execute(stmt).all())
+
+
+def notify_missing_attendance(db: Session, on_date: date, deadline: float) -> int:
+    """
+    Send one email per school listing all of its alerted sections. Stops when
+    `deadline` (time.monotonic()) passes; unsent alerts keep notified_at NULL
+    and are picked up by the next run. Returns the number of schools notified.
+    """
+    pending = (
+        db.query(
+            AttendanceAlert.id,
+            AttendanceAlert.school_id,
+            AttendanceAlert.student_count,
+            School.school_name,
+            School.school_email,
+            Class.name.label("class_name"),
+            Section.name.label("section_name"),
+        )
+        .join(School, School.id == AttendanceAlert.school_id)
+        .join(Class, Class.id == AttendanceAlert.class_id)
+        .join(Section, Section.id == AttendanceAlert.section_id)
+        .filter(AttendanceAlert.date == on_date, AttendanceAlert.notified_at.is_(None))
+        .order_by(AttendanceAlert.school_id, Class.name, Section.name)
+        .all()
+    )
+
+    notified = 0
+    for school_id, rows in groupby(pending, key=lambda row: row.school_id):
+        if time.monotonic() >= deadline:
+            break
+        rows = list(rows)
+        try:
+            send_dynamic_email(
+                context_key="missing_attendance.html",
+                subject=f"Attendance not recorded for {on_date.isoformat()}",
+                recipient_email=rows[0].school_email,
+                context_data={
+                    "school_name": rows[0].school_name,
+                    "date": on_date.isoformat(),
+                    "cutoff": settings.ATTENDANCE_CUTOFF_TIME.strftime("%H:%M"),
+                    "sections": [
+                        {"class_name": row.class_name, "section_name": row.section_name, "student_count": row.student_count}
+                        for row in rows
+                    ],
+                },
+                db=db,
+            )
+        except RuntimeError as e:
+            print(f"Missing attendance email to {school_id} failed: {str(e)}")
+            continue
+
+        db.execute(
+            update(AttendanceAlert)
+            .where(AttendanceAlert.id.in_([row.id for row in rows]))
+            .values(notified_at=func.now())
+        )
+        db.commit()
+        notified += 1
+    return notified
+
+
+def check_missing_attendance(now: Optional[datetime] = None):
+    """Scheduled job: after the daily cutoff, detect and notify sections missing attendance."""
+    now = now or datetime.now()
+    if now.weekday() == SUNDAY or now.time() < settings.ATTENDANCE_CUTOFF_TIME:
+        return {"detected": 0, "notified": 0}
+
+    deadline = time.monotonic() + settings.MISSING_ATTENDANCE_JOB_BUDGET_SECONDS
+    db = SessionLocal()
+    try:
+        set_statement_timeout(db, settings.MISSING_ATTENDANCE_JOB_BUDGET_SECONDS * 1000)
+        detected = detect_missing_attendance(db, now.date())
+        db.commit()
+        notified = notify_missing_attendance(db, now.date(), deadline)
+        return {"detected": detected, "notified": notified}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,182 @@
+from datetime import date
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Date, Integer, cast, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import set_statement_timeout
+from app.models.school import Attendance
+from app.models.students import Student
+from app.utils.cache import LRUCache
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+FETCH_BATCH_SIZE = 20000
+
+# Reports over closed periods (end_date before today) rarely change once
+# attendance for those days is in, so they are served from memory. Edits made
+# through this worker invalidate matching entries at once; back-dated edits from
+# other workers or scripts show up when the entry expires.
+_report_cache = LRUCache(maxsize=512, ttl=settings.ATTENDANCE_REPORT_CACHE_TTL_SECONDS)
+
+
+def fetch_attendance_arrays(
+    db: Session,
+    school_id: str,
+    start_date: date,
+    end_date: date,
+    class_id: Optional[int] = None,
+    section_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+):
+    """
+    Bulk-fetch student attendance as three parallel arrays sorted by (student, day):
+    student ids, day offsets from `start_date`, and a 0/1 present flag.
+    """
+    stmt = (
+        select(
+            Attendance.student_id,
+            cast(Attendance.date - literal(start_date, Date), Integer),
+            cast(Attendance.status == "P", Integer),
+        )
+        .join(Student, Student.id == Attendance.student_id)
+        .where(
+            Student.school_id == school_id,
+            Attendance.date.between(start_date, end_date),
+        )
+        .order_by(Attendance.student_id, Attendance.date)
+    )
+    if class_id is not None:
+        stmt = stmt.where(Student.class_id == class_id)
+    if section_id is not None:
+        stmt = stmt.where(Student.section_id == section_id)
+    if student_id is not None:
+        stmt = stmt.where(Attendance.student_id == student_id)
+
+    result = db.execute(stmt.execution_options(yield_per=FETCH_BATCH_SIZE))
+    flat = np.fromiter(chain.from_iterable(result), dtype=np.int64)
+    rows = flat.reshape(-1, 3)
+    return rows[:, 0], rows[:, 1], rows[:, 2]
+
+
+def compute_attendance_stats(
+    student_ids: np.ndarray,
+    day_offsets: np.ndarray,
+    present: np.ndarray,
+    start_date: date,
+    chronic_threshold: float = 0.1,
+) -> dict:
+    """
+    Vectorized attendance statistics over arrays sorted by (student, day).
+
+    A student is flagged chronically absent when the share of absent days is
+    at least `chronic_threshold`. Streaks are counted over recorded days.
+    """
+    total_records = int(present.size)
+    summary = {
+        "records": total_records,
+        "present": int(present.sum()) if total_records else 0,
+        "attendance_rate": round(float(present.mean()) * 100, 2) if total_records else 0.0,
+        "students": 0,
+        "chronic_absentees": 0,
+    }
+
+    weekday = (start_date.weekday() + day_offsets) % 7
+    day_totals = np.bincount(weekday, minlength=7)
+    day_present = np.bincount(weekday, weights=present, minlength=7)
+    weekdays = [
+        {
+            "day": WEEKDAY_NAMES[i],
+            "records": int(day_totals[i]),
+            "attendance_rate": round(float(day_present[i] / day_totals[i]) * 100, 2) if day_totals[i] else None,
+        }
+        for i in range(7)
+    ]
+
+    if not total_records:
+        return {"summary": summary, "weekdays": weekdays, "students": []}
+
+    ids, first_idx, inverse, counts = np.unique(
+        student_ids, return_index=True, return_inverse=True, return_counts=True
+    )
+    present_counts = np.bincount(inverse, weights=present, minlength=ids.size)
+    rates = present_counts / counts
+
+    # Run-length encode (student, status) so streaks fall out of one pass.
+    boundary = np.empty(total_records, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (student_ids[1:] != student_ids[:-1]) | (present[1:] != present[:-1])
+    run_starts = np.flatnonzero(boundary)
+    run_ids = np.cumsum(boundary) - 1
+    run_lengths = np.bincount(run_ids)
+    run_owner = inverse[run_starts]
+    run_present = present[run_starts].astype(bool)
+
+    longest_present = np.zeros(ids.size, dtype=np.int64)
+    longest_absent = np.zeros(ids.size, dtype=np.int64)
+    np.maximum.at(longest_present, run_owner[run_present], run_lengths[run_present])
+    np.maximum.at(longest_absent, run_owner[~run_present], run_lengths[~run_present])
+
+    last_runs = run_ids[first_idx + counts - 1]
+    current_lengths = run_lengths[last_runs]
+    current_present = run_present[last_runs]
+
+    chronic = (1 - rates) >= chronic_threshold
+    students = [
+        {
+            "student_id": int(ids[i]),
+            "records": int(counts[i]),
+            "present": int(present_counts[i]),
+            "attendance_rate": round(float(rates[i]) * 100, 2),
+            "longest_present_streak": int(longest_present[i]),
+            "longest_absent_streak": int(longest_absent[i]),
+            "current_streak": {
+                "status": "P" if current_present[i] else "A",
+                "length": int(current_lengths[i]),
+            },
+            "chronic_absence": bool(chronic[i]),
+        }
+        for i in range(ids.size)
+    ]
+    summary["students"] = int(ids.size)
+    summary["chronic_absentees"] = int(chronic.sum())
+
+    return {"summary": summary, "weekdays": weekdays, "students": students}
+
+
+def get_attendance_report(
+    db: Session,
+    school_id: str,
+    start_date: date,
+    end_date: date,
+    class_id: Optional[int] = None,
+    section_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+) -> dict:
+    """Attendance report for a school; closed periods are served from the cache."""
+    threshold = settings.CHRONIC_ABSENCE_THRESHOLD
+    key = (school_id, start_date, end_date, class_id, section_id, student_id, threshold)
+    is_closed = end_date < date.today()
+    if is_closed:
+        cached = _report_cache.get(key)
+        if cached is not None:
+            return cached
+
+    set_statement_timeout(db, settings.REPORT_STATEMENT_TIMEOUT_MS)
+    student_ids, day_offsets, present = fetch_attendance_arrays(
+        db, school_id, start_date, end_date, class_id, section_id, student_id
+    )
+    report = compute_attendance_stats(student_ids, day_offsets, present, start_date, threshold)
+    report["start_date"] = start_date
+    report["end_date"] = end_date
+
+    if is_closed:
+        _report_cache.set(key, report)
+    return report
+
+
+def invalidate_attendance_reports(school_id: str, on_date: date) -> None:
+    """Drop cached reports for `school_id` whose range covers `on_date` (back-dated edits)."""
+    _report_cache.pop_where(lambda key: key[0] == school_id and key[1] <= on_date <= key[2])
@@ -0,0 +1,55 @@
+from typing import Optional
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.school import ExamAttemptCounter, StudentExamData
+
+
+def allocate_attempt(db: Session, student_id: int, exam_id: str, max_repeat: Optional[int]) -> Optional[int]:
+    """
+    Atomically reserve the next attempt number for (student_id, exam_id) in one
+    statement; returns None when `max_repeat` attempts have already been used.
+
+    INSERT ... SELECT seeds a missing counter row from the highest stored
+    attempt (HAVING rejects it if that is already at the limit);
+    ON CONFLICT DO UPDATE ... WHERE attempts < max_repeat increments an existing
+    row under its row lock, so concurrent submits get distinct numbers and never
+    exceed the limit. The reservation commits or rolls back with the caller's
+    transaction.
+    """
+    limit = max_repeat if max_repeat and max_repeat > 0 else None
+    stored = func.coalesce(func.max(StudentExamData.attempt_no), 0)
+    seed = select(literal(student_id), literal(exam_id), stored + 1).where(
+        StudentExamData.student_id == student_id,
+        StudentExamData.exam_id == exam_id,
+    )
+    if limit is not None:
+        seed = seed.having(stored < limit)
+
+    stmt = pg_insert(ExamAttemptCounter).from_select(["student_id", "exam_id", "attempts"], seed)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["student_id", "exam_id"],
+        set_={"attempts": ExamAttemptCounter.attempts + 1},
+        where=(ExamAttemptCounter.attempts < limit) if limit is not None else None,
+    )
+    return db.execute(stmt.returning(ExamAttemptCounter.attempts)).scalar()
+
+
+def release_attempt(db: Session, student_id: int, exam_id: str, attempt_no: int) -> bool:
+    """
+    Give back a committed reservation whose submission was never accepted (in the
+    caller's transaction). Only the latest reservation is released; if another
+    attempt was reserved since, the number is left as a gap rather than reused.
+    """
+    released = db.execute(
+        update(ExamAttemptCounter)
+        .where(
+            ExamAttemptCounter.student_id == student_id,
+            ExamAttemptCounter.exam_id == exam_id,
+            ExamAttemptCounter.attempts == attempt_no,
+        )
+        .values(attempts=ExamAttemptCounter.attempts - 1)
+    )
+    return released.rowcount == 1
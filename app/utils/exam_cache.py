@@ -0,0 +1,81 @@
+"""
+Per-worker caches of exam content.
+
+Entries are keyed by (exam_id, Exam.content_version). Every MCQ or exam edit
+goes through touch_exam(), which bumps the version in the database and drops the
+local entries, so other workers stop using their stale copy as soon as they
+read the exam row again.
+
+Generated exams draw from other exams' questions, so touching an exam also bumps
+the pending and active generated exams of the same school and class.
+"""
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.school import Exam, ExamStatusEnum
+from app.utils.cache import LRUCache
+from app.utils.exam_paper import CompiledPaper, load_paper
+from app.utils.exam_scoring import AnswerKey, load_answer_key
+from app.utils.question_pool import QuestionPool, load_pool
+
+_answer_keys = LRUCache(maxsize=settings.ANSWER_KEY_CACHE_SIZE)
+_papers = LRUCache(maxsize=settings.PAPER_CACHE_SIZE)
+_pools = LRUCache(maxsize=settings.PAPER_CACHE_SIZE)
+
+
+def get_answer_key(db: Session, exam: Exam) -> AnswerKey:
+    """Compiled answer key for `exam`; a miss costs one SELECT id, correct_option."""
+    cache_key = (exam.id, exam.content_version)
+    answer_key = _answer_keys.get(cache_key)
+    if answer_key is None:
+        answer_key = load_answer_key(db, exam)
+        _answer_keys.set(cache_key, answer_key)
+    return answer_key
+
+
+def get_paper(db: Session, exam: Exam) -> CompiledPaper:
+    """Compiled student paper for `exam`; concurrent misses share a single load."""
+    return _papers.get_or_load(
+        (exam.id, exam.content_version),
+        lambda: load_paper(db, exam),
+    )
+
+
+def get_pool(db: Session, exam: Exam) -> QuestionPool:
+    """Question pool of a generated exam, as id / stratum arrays for sampling."""
+    return _pools.get_or_load((exam.id, exam.content_version), lambda: load_pool(db, exam))
+
+
+def invalidate_exam_caches(exam_id: str) -> None:
+    _answer_keys.pop_where(lambda key: key[0] == exam_id)
+    _papers.pop_where(lambda key: key[0] == exam_id)
+    _pools.pop_where(lambda key: key[0] == exam_id)
+
+
+def touch_exam(db: Session, exam_id: str) -> None:
+    """Bump the exam's content version (in the caller's transaction) and drop local cache entries."""
+    db.execute(
+        update(Exam)
+        .where(Exam.id == exam_id)
+        .values(content_version=Exam.content_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_exam_caches(exam_id)
+
+    source = aliased(Exam)
+    generated = db.execute(
+        update(Exam)
+        .where(
+            Exam.is_generated.is_(True),
+            Exam.id != exam_id,
+            Exam.status.in_([ExamStatusEnum.PENDING, ExamStatusEnum.ACTIVE]),
+            Exam.school_id == select(source.school_id).where(source.id == exam_id).scalar_subquery(),
+            Exam.class_id == select(source.class_id).where(source.id == exam_id).scalar_subquery(),
+        )
+        .values(content_version=Exam.content_version + 1)
+        .returning(Exam.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for generated_id in generated:
+        invalidate_exam_caches(generated_id)
@@ -0,0 +1,132 @@
+"""
+Exam participation counters.
+
+Exam.no_students_appeared, total_attempts, pass_count, fail_count and
+score_total are bumped with UPDATE ... SET x = x + n in the same transaction
+that inserts the submissions, using only the rows the INSERT actually wrote
+(RETURNING), so WAL replays never double count. Row locks taken by the UPDATE
+serialize concurrent submitters per exam; batches touch exams in id order so
+two flushers cannot deadlock.
+
+A student is counted as appeared on their first attempt. reconcile_exam_counters
+recomputes everything from student_exam_data to repair any drift.
+"""
+from collections import defaultdict
+from typing import Iterable, List
+
+from sqlalchemy import Integer, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal, set_statement_timeout
+from app.models.school import Exam, ExamStatus, StudentExamData
+
+exams = Exam.__table__
+RECONCILE_BATCH_SIZE = 200
+COUNTER_COLUMNS = ("no_students_appeared", "total_attempts", "pass_count", "fail_count", "score_total")
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, ExamStatus) else str(status)
+
+
+def apply_participation(db: Session, inserted: Iterable) -> int:
+    """
+    Increment counters for newly inserted submissions, given rows with
+    exam_id, attempt_no, status and result. Returns the number of exams updated.
+    """
+    deltas = defaultdict(lambda: {"students": 0, "attempts": 0, "passed": 0, "failed": 0, "score": 0})
+    for row in inserted:
+        delta = deltas[row.exam_id]
+        delta["attempts"] += 1
+        delta["students"] += 1 if row.attempt_no == 1 else 0
+        delta["passed"] += 1 if _status_value(row.status) == ExamStatus.pass_.value else 0
+        delta["failed"] += 1 if _status_value(row.status) == ExamStatus.fail.value else 0
+        delta["score"] += row.result or 0
+    if not deltas:
+        return 0
+
+    stmt = (
+        update(exams)
+        .where(exams.c.id == bindparam("b_exam_id"))
+        .values(
+            no_students_appeared=func.coalesce(exams.c.no_students_appeared, 0) + bindparam("b_students"),
+            total_attempts=exams.c.total_attempts + bindparam("b_attempts"),
+            pass_count=exams.c.pass_count + bindparam("b_passed"),
+            fail_count=exams.c.fail_count + bindparam("b_failed"),
+            score_total=exams.c.score_total + bindparam("b_score"),
+        )
+    )
+    db.execute(stmt, [
+        {"b_exam_id": exam_id, **{f"b_{name}": value for name, value in deltas[exam_id].items()}}
+        for exam_id in sorted(deltas)
+    ])
+    return len(deltas)
+
+
+def reconcile_exam_counters(db: Session, exam_ids: List[str]) -> int:
+    """
+    Recompute the counters of `exam_ids` from student_exam_data; returns the
+    number of exams corrected. The exam rows are locked first (in the same order
+    as apply_participation), so in-flight submissions either commit before the
+    recount sees them or wait until it is done; no increment is lost.
+    """
+    if not exam_ids:
+        return 0
+    exam_ids = sorted(exam_ids)
+    db.execute(select(exams.c.id).where(exams.c.id.in_(exam_ids)).order_by(exams.c.id).with_for_update())
+
+    totals = (
+        select(
+            StudentExamData.exam_id,
+            func.count(StudentExamData.student_id.distinct()).label("no_students_appeared"),
+            func.count().label("total_attempts"),
+            func.count().filter(StudentExamData.status == ExamStatus.pass_).label("pass_count"),
+            func.count().filter(StudentExamData.status == ExamStatus.fail).label("fail_count"),
+            func.coalesce(func.sum(StudentExamData.result), 0).cast(Integer).label("score_total"),
+        )
+        .where(StudentExamData.exam_id.in_(exam_ids))
+        .group_by(StudentExamData.exam_id)
+        .subquery()
+    )
+    drifted = or_(*[exams.c[column].is_distinct_from(totals.c[column]) for column in COUNTER_COLUMNS])
+    corrected = db.execute(
+        update(exams)
+        .where(exams.c.id == totals.c.exam_id, drifted)
+        .values(**{column: totals.c[column] for column in COUNTER_COLUMNS})
+    ).rowcount
+
+    # Exams without any submissions
+    has_submissions = select(StudentExamData.exam_id).where(StudentExamData.exam_id == exams.c.id).exists()
+    corrected += db.execute(
+        update(exams)
+        .where(
+            exams.c.id.in_(exam_ids),
+            or_(*[func.coalesce(exams.c[column], 0) != 0 for column in COUNTER_COLUMNS]),
+            ~has_submissions,
+        )
+        .values(**{column: 0 for column in COUNTER_COLUMNS})
+    ).rowcount
+    return corrected
+
+
+def run_counter_reconciliation():
+    """Scheduled job: reconcile all exams in small batches, one short transaction each."""
+    db = SessionLocal()
+    corrected = 0
+    try:
+        exam_ids = db.execute(select(exams.c.id).order_by(exams.c.id)).scalars().all()
+        db.commit()
+        for start in range(0, len(exam_ids), RECONCILE_BATCH_SIZE):
+            try:
+                set_statement_timeout(db, settings.EXAM_COUNTER_RECONCILE_TIMEOUT_MS)
+                corrected += reconcile_exam_counters(db, exam_ids[start:start + RECONCILE_BATCH_SIZE])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Participation counter reconciliation batch failed: {str(e)}")
+        if corrected:
+            print(f"Reconciled participation counters for {corrected} exams")
+        return {"corrected": corrected}
+    finally:
+        db.close()
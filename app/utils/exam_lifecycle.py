@@ -0,0 +1,86 @@
+"""
+Time-based exam status transitions.
+
+Approved exams are activated once exam_activation_date has passed and active
+exams are expired once inactive_date has passed. Both run as scheduled jobs on
+the leader worker, in set-based UPDATE batches, so request handlers only ever
+check Exam.status and never evaluate time windows themselves.
+
+Every transition also bumps Exam.content_version, which is what keys the
+answer-key and paper caches (app/utils/exam_cache.py): every worker drops its
+stale copy the next time it reads the exam row.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.school import Exam, ExamStatusEnum
+from app.utils.exam_cache import invalidate_exam_caches
+
+exams = Exam.__table__
+
+
+def _transition(db: Session, from_status: ExamStatusEnum, to_status: ExamStatusEnum, due, batch_size: int) -> List[str]:
+    """Move up to `batch_size` due exams from one status to another; returns their ids."""
+    batch = (
+        select(exams.c.id)
+        .where(exams.c.status == from_status, due)
+        .order_by(exams.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return db.execute(
+        update(exams)
+        .where(exams.c.id.in_(batch))
+        .values(status=to_status, content_version=exams.c.content_version + 1)
+        .returning(exams.c.id)
+    ).scalars().all()
+
+
+def activate_due_exams(db: Session, now: datetime, batch_size: int) -> List[str]:
+    due = and_(
+        exams.c.is_approved == True,
+        exams.c.exam_activation_date <= now,
+        or_(exams.c.inactive_date.is_(None), exams.c.inactive_date > now),
+    )
+    return _transition(db, ExamStatusEnum.PENDING, ExamStatusEnum.ACTIVE, due, batch_size)
+
+
+def expire_due_exams(db: Session, now: datetime, batch_size: int) -> List[str]:
+    due = exams.c.inactive_date <= now
+    expired = _transition(db, ExamStatusEnum.ACTIVE, ExamStatusEnum.EXPIRED, due, batch_size)
+    # Approved exams whose whole window passed before they were ever activated
+    missed = and_(exams.c.is_approved == True, due)
+    return expired + _transition(db, ExamStatusEnum.PENDING, ExamStatusEnum.EXPIRED, missed, batch_size)
+
+
+def run_exam_lifecycle(now: Optional[datetime] = None):
+    """Scheduled job: apply all due activations and expiries, committing each batch."""
+    # Exam dates are stored as naive UTC (see publish_exam / update_exam_status)
+    now = now or datetime.utcnow()
+    batch_size = settings.EXAM_LIFECYCLE_BATCH_SIZE
+    counts = {"activated": 0, "expired": 0}
+    db = SessionLocal()
+    try:
+        for name, transition in (("activated", activate_due_exams), ("expired", expire_due_exams)):
+            while True:
+                exam_ids = transition(db, now, batch_size)
+                db.commit()
+                for exam_id in exam_ids:
+                    invalidate_exam_caches(exam_id)
+                counts[name] += len(exam_ids)
+                if len(exam_ids) < batch_size:
+                    break
+        if counts["activated"] or counts["expired"]:
+            print(f"Exam lifecycle: {counts['activated']} activated, {counts['expired']} expired")
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
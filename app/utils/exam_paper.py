@@ -0,0 +1,115 @@
+"""
+Student-facing question paper, serialized once per exam version.
+
+The paper is compiled into pre-encoded JSON fragments: one per question (every
+field except `options`) and one per option. Serving a student is then a
+permutation and a bytes join: the question order and each question's option
+order are drawn from a seed derived from (exam_id, content_version, student_id),
+so a student sees the same paper on every fetch and on every worker, and no
+per-request JSON encoding or DB access is needed.
+
+Options keep their original letter in `key`; students submit that letter, so
+scoring is unaffected by the shuffle. The flat option_a..option_d fields that
+older clients read are only included when the paper is served unshuffled, since
+they would reveal the canonical option order next to the shuffled `options`.
+
+For generated exams the compiled paper is the whole question pool, and each
+student is served only the questions assigned to them.
+"""
+import hashlib
+import json
+import random
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.school import McqBank
+from app.utils.question_pool import pool_filter
+
+OPTION_COLUMNS = (("A", "option_a"), ("B", "option_b"), ("C", "option_c"), ("D", "option_d"))
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class CompiledPaper:
+    def __init__(self, exam_id: str, version: int, question_ids: List[int],
+                 questions: List[Tuple[bytes, Tuple[bytes, ...], bytes]]):
+        self.exam_id = exam_id
+        self.version = version
+        self.positions = {question_id: index for index, question_id in enumerate(question_ids)}
+        # (question JSON without the closing brace, option fragments in A-D order,
+        #  ',"option_a":...,"option_d":...' for unshuffled papers)
+        self.questions = questions
+
+    @classmethod
+    def compile(cls, exam_id: str, version: int, rows: Sequence) -> "CompiledPaper":
+        question_ids, questions = [], []
+        for row in rows:
+            question_ids.append(row.id)
+            head = _encode({
+                "id": row.id,
+                "exam_id": row.exam_id,
+                "question": row.question,
+                "mcq_type": row.mcq_type,
+                "image": row.image,
+            })[:-1]
+            options = tuple(
+                _encode({"key": letter, "text": getattr(row, column)}) for letter, column in OPTION_COLUMNS
+            )
+            flat = b"," + _encode({column: getattr(row, column) for _, column in OPTION_COLUMNS})[1:-1]
+            questions.append((head, options, flat))
+        return cls(exam_id, version, question_ids, questions)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def seed_for(self, student_id: int) -> int:
+        digest = hashlib.blake2b(f"{self.exam_id}:{self.version}:{student_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def render(self, student_id=None, shuffle: bool = True, question_ids: Optional[Iterable[int]] = None) -> bytes:
+        """
+        JSON array of questions (only `question_ids` when given); shuffled
+        deterministically per student when `student_id` is given.
+        """
+        if question_ids is None:
+            order = list(range(len(self.questions)))
+        else:
+            order = [self.positions[qid] for qid in question_ids if qid in self.positions]
+        rng = random.Random(self.seed_for(student_id)) if shuffle and student_id is not None else None
+        if rng:
+            rng.shuffle(order)
+
+        parts = []
+        for index in order:
+            head, options, flat = self.questions[index]
+            options = list(options)
+            if rng:
+                rng.shuffle(options)
+            else:
+                head += flat
+            parts.append(head + b',"options":[' + b",".join(options) + b"]}")
+        return b"[" + b",".join(parts) + b"]"
+
+
+def load_paper(db: Session, exam) -> CompiledPaper:
+    """One narrow read of the student-visible MCQ columns (no answers)."""
+    rows = db.execute(
+        select(
+            McqBank.id,
+            McqBank.exam_id,
+            McqBank.question,
+            McqBank.mcq_type,
+            McqBank.image,
+            McqBank.option_a,
+            McqBank.option_b,
+            McqBank.option_c,
+            McqBank.option_d,
+        )
+        .where(*pool_filter(exam))
+        .order_by(McqBank.id)
+    ).all()
+    return CompiledPaper.compile(exam.id, exam.content_version, rows)
@@ -0,0 +1,242 @@
+"""
+Vectorized MCQ scoring.
+
+An exam's answer key is compiled into parallel NumPy arrays: sorted question ids
+and one option bitmask per question (A=1, B=2, C=4, D=8). Submissions are
+encoded the same way into a (students x questions) uint8 matrix, so scoring one
+submission or re-scoring an entire exam is a handful of array operations.
+
+A question whose correct_option holds no valid letter compiles to mask 0. Such
+a question is unanswerable: a blank answer would otherwise equal the key, so it
+never counts as correct (nor as a penalized wrong answer).
+"""
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.school import McqBank, StudentExamData
+from app.utils.question_pool import paper_assignments, pool_filter
+
+OPTION_BITS = {"A": 1, "B": 2, "C": 4, "D": 8}
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def option_mask(options: Union[str, Sequence[str], None]) -> int:
+    """Bitmask for "A", "A,C", "AC" or ["A", "C"]; unknown letters are ignored."""
+    if not options:
+        return 0
+    if isinstance(options, str):
+        options = options.replace(",", "").replace(" ", "")
+    mask = 0
+    for option in options:
+        mask |= OPTION_BITS.get(str(option).strip().upper(), 0)
+    return mask
+
+
+def mask_options(mask: int) -> List[str]:
+    return [option for option, bit in OPTION_BITS.items() if mask & bit]
+
+
+class ScoringPolicy:
+    """
+    partial_credit: a multi-correct answer that selects only correct options
+        earns (selected / correct) of a mark instead of zero.
+    negative_marking: marks deducted for a wrong (non-empty) answer.
+    """
+
+    def __init__(self, partial_credit: bool = False, negative_marking: float = 0.0):
+        self.partial_credit = partial_credit
+        self.negative_marking = negative_marking
+
+    @classmethod
+    def for_exam(cls, exam) -> "ScoringPolicy":
+        return cls(
+            partial_credit=bool(getattr(exam, "partial_marking", False)),
+            negative_marking=float(getattr(exam, "negative_marking", 0) or 0),
+        )
+
+
+class AnswerKey:
+    def __init__(self, question_ids: np.ndarray, correct_masks: np.ndarray):
+        order = np.argsort(question_ids)
+        self.question_ids = question_ids[order]
+        self.correct_masks = correct_masks[order]
+
+    @classmethod
+    def compile(cls, rows: Iterable) -> "AnswerKey":
+        """Build a key from (question_id, correct_option) rows."""
+        rows = list(rows)
+        question_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        correct_masks = np.fromiter((option_mask(row[1]) for row in rows), dtype=np.uint8, count=len(rows))
+        return cls(question_ids, correct_masks)
+
+    def __len__(self) -> int:
+        return int(self.question_ids.size)
+
+    @property
+    def answerable(self) -> np.ndarray:
+        """Questions with at least one valid correct option."""
+        return self.correct_masks != 0
+
+    def encode(self, answers: Iterable) -> np.ndarray:
+        """Encode one submission into a row of option masks aligned with the key."""
+        return self.encode_many([answers])[0]
+
+    def encode_many(self, submissions: Iterable[Iterable]) -> np.ndarray:
+        """
+        Encode submissions (lists of dicts or objects with question_id and
+        selected_option) into a (submissions x questions) mask matrix. All answers
+        are flattened first so the key lookup is a single searchsorted; answers to
+        questions outside the key are dropped.
+        """
+        row_indices, question_ids, masks = [], [], []
+        add_row, add_question, add_mask = row_indices.append, question_ids.append, masks.append
+        mask_cache = {}
+        count = 0
+        for row_index, answers in enumerate(submissions):
+            count += 1
+            for answer in answers:
+                if isinstance(answer, dict):
+                    question_id, selected = answer.get("question_id"), answer.get("selected_option")
+                else:
+                    question_id, selected = answer.question_id, answer.selected_option
+                if question_id is None:
+                    continue
+                if isinstance(selected, list):
+                    selected = tuple(selected)
+                mask = mask_cache.get(selected)
+                if mask is None:
+                    mask = mask_cache[selected] = option_mask(selected)
+                add_row(row_index)
+                add_question(question_id)
+                add_mask(mask)
+
+        matrix = np.zeros((count, len(self)), dtype=np.uint8)
+        if not question_ids or not len(self):
+            return matrix
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.question_ids, question_ids), len(self) - 1)
+        known = self.question_ids[positions] == question_ids
+        matrix[np.asarray(row_indices)[known], positions[known]] = np.asarray(masks, dtype=np.uint8)[known]
+        return matrix
+
+
+def paper_mask(key: AnswerKey, papers: Iterable[Optional[Iterable[int]]]) -> np.ndarray:
+    """
+    (papers x questions) bool matrix of which key questions each paper holds;
+    a None paper holds every question (a fixed exam, or no recorded draw).
+    """
+    papers = list(papers)
+    mask = np.ones((len(papers), len(key)), dtype=bool)
+    drawn = [index for index, paper in enumerate(papers) if paper is not None]
+    if not drawn or not len(key):
+        return mask
+    mask[drawn] = False
+    rows, question_ids = [], []
+    for index in drawn:
+        paper = list(papers[index])
+        rows.extend([index] * len(paper))
+        question_ids.extend(paper)
+    if not question_ids:
+        return mask
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(key.question_ids, question_ids), len(key) - 1)
+    known = key.question_ids[positions] == question_ids
+    mask[np.asarray(rows)[known], positions[known]] = True
+    return mask
+
+
+def score_matrix(key: AnswerKey, selections: np.ndarray, policy: Optional[ScoringPolicy] = None):
+    """
+    Score a (submissions x questions) matrix of option masks.
+
+    Returns (marks, correct_counts): marks per submission under `policy` and the
+    number of exactly-correct answers per submission.
+    """
+    policy = policy or ScoringPolicy()
+    selections = np.atleast_2d(selections)
+    correct = key.correct_masks[np.newaxis, :]
+    answerable = key.answerable[np.newaxis, :]
+
+    answered = (selections != 0) & answerable
+    exact = (selections == correct) & answerable
+    credit = exact.astype(np.float64)
+
+    if policy.partial_credit:
+        subset = answered & ~exact & ((selections & ~correct) == 0)
+        correct_bits = np.maximum(POPCOUNT[correct], 1)
+        credit = np.where(subset, POPCOUNT[selections] / correct_bits, credit)
+    else:
+        subset = np.zeros_like(exact)
+
+    if policy.negative_marking:
+        wrong = answered & ~exact & ~subset
+        credit = credit - wrong * policy.negative_marking
+
+    return credit.sum(axis=1), exact.sum(axis=1)
+
+
+def result_for(marks: float, no_of_questions: int, pass_percentage: float):
+    """Percentage (floored at 0) over the exam's question count and the pass/fail status."""
+    percentage = max(marks, 0.0) / no_of_questions * 100 if no_of_questions else 0.0
+    return round(percentage, 2), "pass" if percentage >= pass_percentage else "fail"
+
+
+def load_answer_key(db: Session, exam) -> AnswerKey:
+    """Narrow read of just (id, correct_option) for an exam's questions (its whole pool if generated)."""
+    rows = db.execute(
+        select(McqBank.id, McqBank.correct_option).where(*pool_filter(exam))
+    ).all()
+    return AnswerKey.compile(rows)
+
+
+def score_submission(key: AnswerKey, answers: Iterable, exam, paper_size: Optional[int] = None) -> dict:
+    """
+    Score a single submission against `key` using the exam's policy and pass mark.
+    `paper_size` is the number of questions the student was served when that
+    differs from no_of_questions (a generated paper cut short by a small pool).
+    """
+    marks, correct = score_matrix(key, key.encode(answers), ScoringPolicy.for_exam(exam))
+    no_of_questions = paper_size or exam.no_of_questions or len(key)
+    percentage, status = result_for(float(marks[0]), no_of_questions, exam.pass_percentage)
+    return {
+        "total": no_of_questions,
+        "correct": int(correct[0]),
+        "marks": round(float(marks[0]), 2),
+        "percentage": percentage,
+        "status": status,
+    }
+
+
+def rescore_exam(db: Session, exam) -> int:
+    """
+    Re-score every stored submission of `exam` in one vectorized pass (e.g. after
+    the answer key changed) and write results back with a bulk UPDATE by primary key.
+    Generated papers are scored only on, and out of, the questions each student drew.
+    """
+    key = load_answer_key(db, exam)
+    submissions = db.execute(
+        select(StudentExamData.id, StudentExamData.student_id, StudentExamData.submitted_at, StudentExamData.answers)
+        .where(StudentExamData.exam_id == exam.id)
+    ).all()
+    if not submissions:
+        return 0
+
+    selections = key.encode_many(row.answers or [] for row in submissions)
+    no_of_questions = exam.no_of_questions or len(key)
+    totals = [no_of_questions] * len(submissions)
+    if exam.is_generated:
+        papers = paper_assignments(db, exam.id)
+        drawn = [papers.get(row.student_id) for row in submissions]
+        selections = np.where(paper_mask(key, drawn), selections, 0).astype(np.uint8)
+        totals = [len(paper) if paper else no_of_questions for paper in drawn]
+    marks, _ = score_matrix(key, selections, ScoringPolicy.for_exam(exam))
+
+    updates = []
+    for row, submission_marks, total in zip(submissions, marks.tolist(), totals):
+        percentage, status = result_for(submission_marks, total, exam.pass_percentage)
+        updates.append({"id": row.id, "submitted_at": row.submitted_at, "result": round(percentage), "status": status})
+    db.execute(update(StudentExamData), updates)
+    return len(updates)
@@ -0,0 +1,240 @@
+"""
+Server-side exam sessions with buffered autosave.
+
+Starting (or resuming) a session writes its `exam_sessions` row once. After that,
+autosaves and heartbeats only touch a per-worker in-memory buffer. The buffer
+keeps one entry per (exam, student) and coalesces every keystroke into it: the
+answers changed since the last flush, the highest client `seq`, and the last
+seen time. A background thread flushes the buffer every
+EXAM_AUTOSAVE_FLUSH_INTERVAL_SECONDS as a single
+UPDATE ... FROM jsonb_to_recordset(...) per batch, so Postgres sees one
+statement per interval rather than one per autosave.
+
+Answers are stored as an object {question_id: selected_option} and merged with
+`||`. A buffered change with a higher `seq` than the stored row wins on
+conflicting questions, and an older one (from a slower worker) loses. Flushes
+for sessions that have already been submitted are dropped.
+
+Autosaves are best effort: a reload that lands on another worker, or a worker
+crash, can miss up to one flush interval of keystrokes. The session as stored
+(plus this worker's buffer) is therefore only the base of a submission. The
+client sends its complete answer set to submit, which overrides the session on
+every question it contains, so answers still sitting in another worker's buffer
+are never what decides the result. The session is closed with the merged set.
+"""
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.school import ExamSession
+
+ACTIVE = "active"
+SUBMITTED = "submitted"
+
+_FLUSH_SQL = text("""
+    UPDATE exam_sessions AS s SET
+        answers = CASE WHEN v.seq >= s.seq THEN s.answers || v.delta ELSE v.delta || s.answers END,
+        seq = GREATEST(s.seq, v.seq),
+        last_seen_at = GREATEST(s.last_seen_at, v.seen)
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb))
+        AS v(exam_id text, student_id integer, seq integer, delta jsonb, seen timestamptz)
+    WHERE s.exam_id = v.exam_id AND s.student_id = v.student_id AND s.status = 'active'
+""")
+
+
+def answers_map(answers: Iterable) -> Dict[str, object]:
+    """[{question_id, selected_option}] (dicts or schema objects) -> {"question_id": selected_option}."""
+    mapping = {}
+    for answer in answers:
+        if isinstance(answer, dict):
+            mapping[str(answer["question_id"])] = answer.get("selected_option")
+        else:
+            mapping[str(answer.question_id)] = answer.selected_option
+    return mapping
+
+
+def answers_list(mapping: Dict[str, object]) -> List[dict]:
+    """{"question_id": selected_option} -> submission answers, dropping cleared questions."""
+    return [
+        {"question_id": int(question_id), "selected_option": selected}
+        for question_id, selected in sorted(mapping.items(), key=lambda item: int(item[0]))
+        if selected not in (None, "", [])
+    ]
+
+
+def merge_answers(stored: Dict, stored_seq: int, delta: Dict, delta_seq: int) -> Dict:
+    """The newer side (by seq) wins on questions both sides answered."""
+    return {**stored, **delta} if delta_seq >= stored_seq else {**delta, **stored}
+
+
+class AutosaveBuffer:
+    def __init__(self, flush_interval: float = 2.0, batch_size: int = 1000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[Tuple[str, int], dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="autosave-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    # Buffering
+
+    def _merge(self, key, seq: int, delta: Dict, seen: datetime):
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = {"seq": seq, "delta": dict(delta), "seen": seen}
+            return
+        entry["delta"] = merge_answers(entry["delta"], entry["seq"], delta, seq)
+        entry["seq"] = max(entry["seq"], seq)
+        entry["seen"] = max(entry["seen"], seen)
+
+    def save(self, exam_id: str, student_id: int, seq: int, answers: Dict):
+        with self._lock:
+            self._merge((exam_id, student_id), seq, answers, datetime.now(timezone.utc))
+
+    def heartbeat(self, exam_id: str, student_id: int):
+        with self._lock:
+            self._merge((exam_id, student_id), 0, {}, datetime.now(timezone.utc))
+
+    def pending(self, exam_id: str, student_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._pending.get((exam_id, student_id))
+            return {**entry, "delta": dict(entry["delta"])} if entry else None
+
+    def discard(self, exam_id: str, student_id: int):
+        with self._lock:
+            self._pending.pop((exam_id, student_id), None)
+
+    @property
+    def size(self) -> int:
+        return len(self._pending)
+
+    # Flushing
+
+    def flush(self) -> int:
+        """Write every buffered entry; entries that fail are merged back for the next flush."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        items = list(batch.items())
+        written = 0
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            if self._write(chunk):
+                written += len(chunk)
+            else:
+                with self._lock:
+                    for key, entry in chunk:
+                        self._merge(key, entry["seq"], entry["delta"], entry["seen"])
+        return written
+
+    def _write(self, chunk) -> bool:
+        rows = [
+            {
+                "exam_id": exam_id,
+                "student_id": student_id,
+                "seq": entry["seq"],
+                "delta": entry["delta"],
+                "seen": entry["seen"].isoformat(),
+            }
+            for (exam_id, student_id), entry in chunk
+        ]
+        db = SessionLocal()
+        try:
+            db.execute(_FLUSH_SQL, {"rows": json.dumps(rows, separators=(",", ":"))})
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            print(f"Autosave flush of {len(rows)} sessions failed, will retry: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+
+autosave_buffer = AutosaveBuffer(
+    flush_interval=settings.EXAM_AUTOSAVE_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.EXAM_AUTOSAVE_BATCH_SIZE,
+)
+
+
+def start_session(db: Session, exam_id: str, student_id: int, school_id: str) -> None:
+    """Create the session, or restart it after a submitted attempt; an active session is resumed as is."""
+    stmt = pg_insert(ExamSession).values(
+        exam_id=exam_id, student_id=student_id, school_id=school_id, status=ACTIVE, answers={}, seq=0,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["exam_id", "student_id"],
+        set_={
+            "status": ACTIVE,
+            "answers": {},
+            "seq": 0,
+            "started_at": stmt.excluded.started_at,
+            "last_seen_at": stmt.excluded.last_seen_at,
+            "submitted_at": None,
+        },
+        where=ExamSession.status != ACTIVE,
+    ))
+
+
+def load_session(db: Session, exam_id: str, student_id: int, for_update: bool = False) -> Optional[dict]:
+    """The session as stored, with this worker's unflushed autosaves applied."""
+    stmt = select(ExamSession).where(ExamSession.exam_id == exam_id, ExamSession.student_id == student_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    row = db.execute(stmt).scalar()
+    if row is None:
+        return None
+
+    answers, seq, last_seen_at = dict(row.answers or {}), row.seq, row.last_seen_at
+    entry = autosave_buffer.pending(exam_id, student_id) if row.status == ACTIVE else None
+    if entry:
+        answers = merge_answers(answers, seq, entry["delta"], entry["seq"])
+        seq = max(seq, entry["seq"])
+        last_seen_at = max(last_seen_at, entry["seen"]) if last_seen_at else entry["seen"]
+    return {
+        "exam_id": exam_id,
+        "status": row.status,
+        "started_at": row.started_at,
+        "last_seen_at": last_seen_at,
+        "submitted_at": row.submitted_at,
+        "seq": seq,
+        "answers": answers,
+    }
+
+
+def close_session(db: Session, exam_id: str, student_id: int, answers: Dict) -> None:
+    """Mark the session submitted with its final answers (in the caller's transaction)."""
+    db.execute(
+        update(ExamSession)
+        .where(ExamSession.exam_id == exam_id, ExamSession.student_id == student_id)
+        .values(status=SUBMITTED, answers=answers, submitted_at=datetime.now(timezone.utc))
+    )
+    autosave_buffer.discard(exam_id, student_id)
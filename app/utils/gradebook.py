@@ -0,0 +1,213 @@
+"""
+Student gradebook: results per (student, subject, academic year).
+
+apply_gradebook runs in the same transaction that inserts submissions
+(persist_submissions), using only the rows the INSERT actually wrote. Rows are
+pre-aggregated per gradebook key and upserted with one
+INSERT ... ON CONFLICT DO UPDATE, which adds the counts and keeps the best and
+latest score. Keys are written in sorted order so concurrent flushers cannot
+deadlock. Profile and report endpoints then read a handful of rows by primary
+key (or by school and year) and no longer scan student_exam_data.
+
+rebuild_gradebook recomputes students' rows from student_exam_data, e.g. after
+a rescore or an exam deletion. It locks the students' rows first, so a
+concurrent submission either commits before the recount sees it or waits and
+then applies its increment on top.
+"""
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.school import Exam, ExamStatus, StudentExamData, StudentGradebook, Subject
+
+NO_SUBJECT = 0
+KEY_COLUMNS = ("student_id", "subject_id", "academic_year")
+
+
+def academic_year(moment: datetime) -> int:
+    """Calendar year in which the academic year containing `moment` (UTC) started."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.year if moment.month >= settings.ACADEMIC_YEAR_START_MONTH else moment.year - 1
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, ExamStatus) else str(status)
+
+
+def apply_gradebook(db: Session, inserted: Iterable) -> int:
+    """
+    Fold newly inserted submissions (rows with student_id, school_id, exam_id,
+    attempt_no, status, result, submitted_at) into the gradebook. Returns the
+    number of gradebook rows written.
+    """
+    inserted = list(inserted)
+    if not inserted:
+        return 0
+    exam_ids = sorted({row.exam_id for row in inserted})
+    subjects = dict(db.execute(select(Exam.id, Exam.subject_id).where(Exam.id.in_(exam_ids))).all())
+
+    entries = {}
+    for row in sorted(inserted, key=lambda r: r.submitted_at):
+        key = (row.student_id, subjects.get(row.exam_id) or NO_SUBJECT, academic_year(row.submitted_at))
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {
+                "student_id": key[0], "subject_id": key[1], "academic_year": key[2],
+                "school_id": row.school_id, "exams_taken": 0, "attempts": 0, "pass_count": 0,
+                "fail_count": 0, "score_total": 0, "best_score": None,
+            }
+        score = row.result or 0
+        entry["exams_taken"] += 1 if row.attempt_no == 1 else 0
+        entry["attempts"] += 1
+        entry["pass_count"] += 1 if _status_value(row.status) == ExamStatus.pass_.value else 0
+        entry["fail_count"] += 1 if _status_value(row.status) == ExamStatus.fail.value else 0
+        entry["score_total"] += score
+        entry["best_score"] = score if entry["best_score"] is None else max(entry["best_score"], score)
+        # Rows are in submission order, so the last one wins
+        entry["last_score"] = score
+        entry["last_exam_id"] = row.exam_id
+        entry["last_submitted_at"] = row.submitted_at
+
+    stmt = pg_insert(StudentGradebook).values([entries[key] for key in sorted(entries)])
+    current, new = StudentGradebook, stmt.excluded
+    newer = func.coalesce(new.last_submitted_at >= current.last_submitted_at, True)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            "exams_taken": current.exams_taken + new.exams_taken,
+            "attempts": current.attempts + new.attempts,
+            "pass_count": current.pass_count + new.pass_count,
+            "fail_count": current.fail_count + new.fail_count,
+            "score_total": current.score_total + new.score_total,
+            "best_score": func.greatest(current.best_score, new.best_score),
+            "last_score": case((newer, new.last_score), else_=current.last_score),
+            "last_exam_id": case((newer, new.last_exam_id), else_=current.last_exam_id),
+            "last_submitted_at": func.greatest(current.last_submitted_at, new.last_submitted_at),
+        },
+    )
+    db.execute(stmt)
+    return len(entries)
+
+
+_REBUILD_SQL = text("""
+    SELECT sed.student_id,
+           coalesce(e.subject_id, 0) AS subject_id,
+           (extract(year FROM sed.submitted_at AT TIME ZONE 'UTC')
+            - CASE WHEN extract(month FROM sed.submitted_at AT TIME ZONE 'UTC') < :start_month THEN 1 ELSE 0 END
+           )::int AS academic_year,
+           min(sed.school_id) AS school_id,
+           count(*) FILTER (WHERE sed.attempt_no = 1) AS exams_taken,
+           count(*) AS attempts,
+           count(*) FILTER (WHERE sed.status = 'pass_') AS pass_count,
+           count(*) FILTER (WHERE sed.status = 'fail') AS fail_count,
+           coalesce(sum(sed.result), 0)::int AS score_total,
+           max(coalesce(sed.result, 0)) AS best_score,
+           (array_agg(coalesce(sed.result, 0) ORDER BY sed.submitted_at DESC))[1] AS last_score,
+           (array_agg(sed.exam_id ORDER BY sed.submitted_at DESC))[1] AS last_exam_id,
+           max(sed.submitted_at) AS last_submitted_at
+    FROM student_exam_data sed
+    JOIN exams e ON e.id = sed.exam_id
+    WHERE sed.student_id = ANY(:student_ids)
+    GROUP BY 1, 2, 3
+""")
+
+
+def rebuild_gradebook(db: Session, student_ids: List[int]) -> int:
+    """Recompute the gradebook rows of `student_ids` from stored submissions (caller commits)."""
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return 0
+    db.execute(
+        select(StudentGradebook.student_id)
+        .where(StudentGradebook.student_id.in_(student_ids))
+        .order_by(StudentGradebook.student_id, StudentGradebook.subject_id, StudentGradebook.academic_year)
+        .with_for_update()
+    )
+    rows = [
+        dict(row._mapping)
+        for row in db.execute(_REBUILD_SQL, {
+            "student_ids": student_ids,
+            "start_month": settings.ACADEMIC_YEAR_START_MONTH,
+        })
+    ]
+
+    keys = [(row["student_id"], row["subject_id"], row["academic_year"]) for row in rows]
+    stale = delete(StudentGradebook).where(StudentGradebook.student_id.in_(student_ids))
+    if keys:
+        stale = stale.where(
+            tuple_(StudentGradebook.student_id, StudentGradebook.subject_id, StudentGradebook.academic_year)
+            .not_in(keys)
+        )
+    db.execute(stale)
+    if rows:
+        stmt = pg_insert(StudentGradebook).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={column: stmt.excluded[column] for column in rows[0] if column not in KEY_COLUMNS},
+        ))
+    return len(rows)
+
+
+def exam_student_ids(db: Session, exam_id: str) -> List[int]:
+    return db.execute(
+        select(StudentExamData.student_id).where(StudentExamData.exam_id == exam_id).distinct()
+    ).scalars().all()
+
+
+def gradebook_rows(db: Session, student_id: int, year: Optional[int] = None):
+    """A student's gradebook rows (one indexed read), with subject names and the last exam's type."""
+    stmt = (
+        select(StudentGradebook, Subject.name.label("subject_name"), Exam.exam_type.label("last_exam_type"))
+        .outerjoin(Subject, Subject.id == StudentGradebook.subject_id)
+        .outerjoin(Exam, Exam.id == StudentGradebook.last_exam_id)
+        .where(StudentGradebook.student_id == student_id)
+        .order_by(StudentGradebook.academic_year.desc(), StudentGradebook.subject_id)
+    )
+    if year is not None:
+        stmt = stmt.where(StudentGradebook.academic_year == year)
+    return db.execute(stmt).all()
+
+
+def gradebook_entry(book: StudentGradebook, subject_name=None) -> dict:
+    return {
+        "subject_id": book.subject_id or None,
+        "subject_name": subject_name,
+        "academic_year": book.academic_year,
+        "exams_taken": book.exams_taken,
+        "attempts": book.attempts,
+        "pass_count": book.pass_count,
+        "fail_count": book.fail_count,
+        "best_score": book.best_score,
+        "last_score": book.last_score,
+        "average_score": round(book.score_total / book.attempts, 2) if book.attempts else None,
+        "last_exam_id": book.last_exam_id,
+        "last_submitted_at": book.last_submitted_at,
+    }
+
+
+def summarize(rows) -> dict:
+    """Totals across gradebook rows for the profile endpoints."""
+    summary = {"total_exams": 0, "total_attempts": 0, "average_score": None, "best_score": None,
+               "last_appeared_exam": None, "last_exam_id": None, "exam_type": None, "exam_result": None}
+    score_total = 0
+    for book, _, last_exam_type in rows:
+        summary["total_exams"] += book.exams_taken
+        summary["total_attempts"] += book.attempts
+        score_total += book.score_total
+        if book.best_score is not None:
+            summary["best_score"] = max(summary["best_score"] or 0, book.best_score)
+        if book.last_submitted_at and (
+            summary["last_appeared_exam"] is None or book.last_submitted_at > summary["last_appeared_exam"]
+        ):
+            summary["last_appeared_exam"] = book.last_submitted_at
+            summary["last_exam_id"] = book.last_exam_id
+            summary["exam_type"] = last_exam_type
+            summary["exam_result"] = book.last_score
+    if summary["total_attempts"]:
+        summary["average_score"] = round(score_total / summary["total_attempts"], 2)
+    return summary
@@ -0,0 +1,205 @@
+"""
+Item analysis over stored exam answers.
+
+For each exam the job streams every student's first attempt into a
+(students x questions) option-mask matrix (see app/utils/exam_scoring.py) and
+computes, per question:
+
+- difficulty: share of students answering exactly right (p-value)
+- discrimination: difficulty in the top 27% of students by total score minus
+  difficulty in the bottom 27%
+- distractor frequency: how often each option (and blank) was selected
+
+For generated exams each student only drew part of the pool, so a cell is
+counted only when the question was on that student's paper
+(exam_paper_assignments): responses, difficulty and blanks are per-question
+over the students who were served it, and students are ranked for
+discrimination by the share of their own paper they got right.
+
+Results are upserted into `question_stats`. `item_analysis_runs` remembers what
+each exam looked like when last analyzed, so the scheduled job only re-runs an
+exam when its content changed, it has new submissions, or it has closed since
+the last run; a closed exam is analyzed one final time and then skipped.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal, set_statement_timeout
+from app.models.school import Exam, ExamStatusEnum, ItemAnalysisRun, QuestionStats, StudentExamData
+from app.utils.exam_scoring import OPTION_BITS, AnswerKey, load_answer_key, paper_mask
+from app.utils.question_pool import paper_assignments
+
+GROUP_FRACTION = 0.27
+STREAM_CHUNK_SIZE = 2000
+
+
+def load_selection_matrix(db: Session, key: AnswerKey, exam: Exam):
+    """
+    Stream first-attempt answers and encode them chunk by chunk into one mask
+    matrix. Returns (selections, served): `served` marks the questions on each
+    student's paper for generated exams and is None otherwise.
+    """
+    result = db.execute(
+        select(StudentExamData.student_id, StudentExamData.answers)
+        .where(StudentExamData.exam_id == exam.id, StudentExamData.attempt_no == 1)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    papers = paper_assignments(db, exam.id) if exam.is_generated else None
+    chunks, served = [], []
+    for partition in result.partitions():
+        chunks.append(key.encode_many(row.answers or [] for row in partition))
+        if papers is not None:
+            served.append(paper_mask(key, (papers.get(row.student_id) for row in partition)))
+    if not chunks:
+        return np.zeros((0, len(key)), dtype=np.uint8), None
+    return np.vstack(chunks), (np.vstack(served) if served else None)
+
+
+def compute_item_stats(key: AnswerKey, selections: np.ndarray, served: Optional[np.ndarray] = None) -> dict:
+    """
+    Vectorized item statistics for a (students x questions) mask matrix; cells
+    outside `served` (questions not on a student's paper) are left out.
+    """
+    if served is None:
+        served = np.ones(selections.shape, dtype=bool)
+    selections = np.where(served, selections, 0)
+    exact = (selections == key.correct_masks[np.newaxis, :]) & served & key.answerable[np.newaxis, :]
+    responses = served.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = exact.sum(axis=0) / responses
+
+        discrimination = np.full(len(key), np.nan)
+        students = selections.shape[0]
+        group = int(students * GROUP_FRACTION)
+        if group >= 1:
+            score = exact.sum(axis=1) / np.maximum(served.sum(axis=1), 1)
+            order = np.argsort(score, kind="stable")
+            lower, upper = order[:group], order[-group:]
+            discrimination = (
+                exact[upper].sum(axis=0) / served[upper].sum(axis=0)
+                - exact[lower].sum(axis=0) / served[lower].sum(axis=0)
+            )
+
+    option_counts = {
+        option: np.count_nonzero(selections & bit, axis=0) for option, bit in OPTION_BITS.items()
+    }
+    blank = np.count_nonzero((selections == 0) & served, axis=0)
+    return {
+        "responses": responses,
+        "students": students,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "option_counts": option_counts,
+        "blank": blank,
+    }
+
+
+def _nullable(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def analyze_exam(db: Session, exam: Exam) -> int:
+    """Recompute and store item statistics for one exam; returns the number of questions."""
+    key = load_answer_key(db, exam)
+    selections, served = load_selection_matrix(db, key, exam)
+    stats = compute_item_stats(key, selections, served)
+
+    rows = [
+        {
+            "exam_id": exam.id,
+            "question_id": int(question_id),
+            "responses": int(stats["responses"][i]),
+            "difficulty": _nullable(stats["difficulty"][i]),
+            "discrimination": _nullable(stats["discrimination"][i]),
+            "count_a": int(stats["option_counts"]["A"][i]),
+            "count_b": int(stats["option_counts"]["B"][i]),
+            "count_c": int(stats["option_counts"]["C"][i]),
+            "count_d": int(stats["option_counts"]["D"][i]),
+            "count_blank": int(stats["blank"][i]),
+        }
+        for i, question_id in enumerate(key.question_ids.tolist())
+    ]
+
+    # Questions removed since the last run
+    db.execute(
+        delete(QuestionStats).where(
+            QuestionStats.exam_id == exam.id,
+            QuestionStats.question_id.notin_(key.question_ids.tolist()),
+        )
+    )
+    if rows:
+        stmt = pg_insert(QuestionStats).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["exam_id", "question_id"],
+            set_={
+                **{column: stmt.excluded[column] for column in rows[0] if column not in ("exam_id", "question_id")},
+                "computed_at": datetime.now(timezone.utc),
+            },
+        ))
+
+    run = {
+        "exam_id": exam.id,
+        "content_version": exam.content_version,
+        "exam_status": exam.status,
+        "submissions": stats["students"],
+        "analyzed_at": datetime.now(timezone.utc),
+    }
+    stmt = pg_insert(ItemAnalysisRun).values(run)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["exam_id"],
+        set_={column: stmt.excluded[column] for column in run if column != "exam_id"},
+    ))
+    return len(rows)
+
+
+def stale_exams(db: Session) -> List[Exam]:
+    """Active or closed exams whose stored analysis is missing or out of date."""
+    # Compared by count rather than by submitted_at: write-behind rows can land
+    # after a run with a submitted_at older than it
+    first_attempts = (
+        select(func.count())
+        .where(StudentExamData.exam_id == Exam.id, StudentExamData.attempt_no == 1)
+        .correlate(Exam)
+        .scalar_subquery()
+    )
+    return (
+        db.query(Exam)
+        .outerjoin(ItemAnalysisRun, ItemAnalysisRun.exam_id == Exam.id)
+        .filter(
+            Exam.status.in_([ExamStatusEnum.ACTIVE, ExamStatusEnum.EXPIRED]),
+            or_(
+                ItemAnalysisRun.exam_id.is_(None),
+                ItemAnalysisRun.content_version != Exam.content_version,
+                ItemAnalysisRun.exam_status != Exam.status,
+                and_(Exam.status == ExamStatusEnum.ACTIVE, first_attempts != ItemAnalysisRun.submissions),
+            ),
+        )
+        .all()
+    )
+
+
+def run_item_analysis():
+    """Scheduled job: refresh item statistics for every stale exam, one commit per exam."""
+    db = SessionLocal()
+    analyzed = 0
+    try:
+        for exam_id in [exam.id for exam in stale_exams(db)]:
+            try:
+                # The timeout is transaction-local, so it is set again for each exam
+                set_statement_timeout(db, settings.ITEM_ANALYSIS_STATEMENT_TIMEOUT_MS)
+                analyze_exam(db, db.get(Exam, exam_id))
+                db.commit()
+                analyzed += 1
+            except Exception as e:
+                db.rollback()
+                print(f"Item analysis for exam {exam_id} failed: {str(e)}")
+        return {"analyzed": analyzed}
+    finally:
+        db.close()
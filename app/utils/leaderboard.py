@@ -0,0 +1,230 @@
+"""
+Leaderboards for RANK exams.
+
+Each board keeps every student's best result in a list sorted by
+(-score, first time the score was reached, student_id), so rank and percentile
+are a bisect (O(log n)) and top-N is a slice. Updating a student moves one entry
+(insort/del on the list, O(n) memmove, which is fast at class and school sizes).
+Boards are kept per exam and per (exam, school) and (exam, section).
+
+A board is built from `student_exam_data` the first time an exam is read (or
+warmed at startup) and updated in place on every submission handled by this
+worker. Once a board is older than LEADERBOARD_REFRESH_SECONDS it is rebuilt
+from the table and swapped in whole, so lowered scores after a rescore or
+removed submissions reach every worker, not only the one that served the
+rescore. Submissions this worker recorded during the last refresh window are
+re-applied to the new board, because write-behind rows may not have reached the
+table yet; keeping a student's better score makes that harmless.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.school import Exam, ExamStatusEnum, ExamTypeEnum, StudentExamData
+from app.models.students import Student
+
+SCOPES = ("exam", "school", "section")
+
+
+class Leaderboard:
+    def __init__(self):
+        self._keys: List[Tuple[float, float, int]] = []
+        self._best: Dict[int, Tuple[float, float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def from_best(cls, best: Dict[int, Tuple[float, float, int]]) -> "Leaderboard":
+        """Board from {student_id: key}, sorted once rather than inserted one by one."""
+        board = cls()
+        board._best = best
+        board._keys = sorted(best.values())
+        return board
+
+    def update(self, student_id: int, score: float, achieved_at: float) -> bool:
+        """Keep `score` if it beats the student's best so far; returns True if the board changed."""
+        key = (-score, achieved_at, student_id)
+        current = self._best.get(student_id)
+        if current is not None:
+            if current <= key:
+                return False
+            del self._keys[bisect_left(self._keys, current)]
+        insort(self._keys, key)
+        self._best[student_id] = key
+        return True
+
+    def remove(self, student_id: int):
+        current = self._best.pop(student_id, None)
+        if current is not None:
+            del self._keys[bisect_left(self._keys, current)]
+
+    def rank(self, student_id: int) -> Optional[dict]:
+        """Competition rank (ties share a rank) and percentile of students scoring strictly lower."""
+        current = self._best.get(student_id)
+        if current is None:
+            return None
+        score = current[0]
+        total = len(self._keys)
+        above = bisect_left(self._keys, (score,))
+        below = total - bisect_right(self._keys, (score, float("inf")))
+        return {
+            "student_id": student_id,
+            "score": -score,
+            "rank": above + 1,
+            "percentile": round(below / total * 100, 2),
+            "participants": total,
+        }
+
+    def top(self, limit: int) -> List[dict]:
+        entries, rank, previous = [], 0, None
+        for position, (score, _, student_id) in enumerate(self._keys[:limit], start=1):
+            if score != previous:
+                rank, previous = position, score
+            entries.append({"student_id": student_id, "score": -score, "rank": rank})
+        return entries
+
+
+class LeaderboardService:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._boards: Dict[Tuple[str, str, object], Leaderboard] = {}
+        self._built_at: Dict[str, float] = {}
+        # exam_id -> (recorded_at, submission) recorded here during the last refresh window
+        self._recent: Dict[str, deque] = {}
+        self._lock = threading.RLock()
+
+    # Writes
+
+    def record(self, exam_id: str, student_id: int, school_id: str, section_id: Optional[int],
+               score: float, submitted_at: datetime):
+        """Apply one submission to the exam, school and section boards."""
+        submission = (exam_id, student_id, school_id, section_id, score, submitted_at.timestamp())
+        now = time.monotonic()
+        with self._lock:
+            recent = self._recent.setdefault(exam_id, deque())
+            recent.append((now, submission))
+            while recent[0][0] < now - self.refresh_seconds:
+                recent.popleft()
+            self._apply(submission)
+
+    def _apply(self, submission):
+        exam_id, student_id, school_id, section_id, score, achieved_at = submission
+        for board_key in self._board_keys(exam_id, school_id, section_id):
+            board = self._boards.get(board_key)
+            if board is None:
+                board = self._boards[board_key] = Leaderboard()
+            board.update(student_id, score, achieved_at)
+
+    def invalidate(self, exam_id: str):
+        """Drop an exam's boards; they are rebuilt from the table on next read."""
+        with self._lock:
+            for board_key in [key for key in self._boards if key[0] == exam_id]:
+                del self._boards[board_key]
+            self._built_at.pop(exam_id, None)
+            self._recent.pop(exam_id, None)
+
+    def rebuild(self, db: Session, exam_id: str) -> int:
+        """Repair: discard in-memory state for `exam_id` and reload it from the table."""
+        self.invalidate(exam_id)
+        return self.load(db, [exam_id])
+
+    def load(self, db: Session, exam_ids: Iterable[str]) -> int:
+        """Rebuild the boards of `exam_ids` from every student's best stored result."""
+        exam_ids = list(exam_ids)
+        if not exam_ids:
+            return 0
+        # DISTINCT ON keeps one row per (exam, student): the best result, earliest first
+        rows = db.execute(
+            select(
+                StudentExamData.exam_id,
+                StudentExamData.student_id,
+                StudentExamData.school_id,
+                Student.section_id,
+                StudentExamData.result,
+                StudentExamData.submitted_at,
+            )
+            .join(Student, Student.id == StudentExamData.student_id)
+            .where(StudentExamData.exam_id.in_(exam_ids), StudentExamData.result.isnot(None))
+            .distinct(StudentExamData.exam_id, StudentExamData.student_id)
+            .order_by(
+                StudentExamData.exam_id,
+                StudentExamData.student_id,
+                StudentExamData.result.desc(),
+                StudentExamData.submitted_at,
+            )
+        ).all()
+
+        best: Dict[Tuple[str, str, object], Dict[int, Tuple[float, float, int]]] = {}
+
+        def fold(exam_id, student_id, school_id, section_id, score, achieved_at):
+            key = (-score, achieved_at, student_id)
+            for board_key in self._board_keys(exam_id, school_id, section_id):
+                students = best.setdefault(board_key, {})
+                if student_id not in students or key < students[student_id]:
+                    students[student_id] = key
+
+        for row in rows:
+            fold(row.exam_id, row.student_id, row.school_id, row.section_id, row.result, row.submitted_at.timestamp())
+
+        built_at = time.monotonic()
+        with self._lock:
+            for exam_id in exam_ids:
+                for recorded_at, submission in self._recent.get(exam_id, ()):
+                    if recorded_at >= built_at - self.refresh_seconds:
+                        fold(*submission)
+            reloaded = set(exam_ids)
+            for board_key in [key for key in self._boards if key[0] in reloaded]:
+                del self._boards[board_key]
+            for board_key, students in best.items():
+                self._boards[board_key] = Leaderboard.from_best(students)
+            for exam_id in exam_ids:
+                self._built_at[exam_id] = built_at
+        return len(rows)
+
+    def warm(self, db: Session) -> int:
+        """Build boards for all active RANK exams, e.g. at startup."""
+        exam_ids = db.execute(
+            select(Exam.id).where(Exam.exam_type == ExamTypeEnum.RANK, Exam.status == ExamStatusEnum.ACTIVE)
+        ).scalars().all()
+        return self.load(db, exam_ids)
+
+    # Reads
+
+    def board(self, db: Session, exam_id: str, scope: str = "exam", scope_id=None) -> Leaderboard:
+        self._ensure_fresh(db, exam_id)
+        key = (exam_id, scope, None if scope == "exam" else scope_id)
+        with self._lock:
+            return self._boards.get(key) or Leaderboard()
+
+    def top(self, db: Session, exam_id: str, limit: int = 10, scope: str = "exam", scope_id=None) -> List[dict]:
+        board = self.board(db, exam_id, scope, scope_id)
+        with self._lock:
+            return board.top(limit)
+
+    def rank(self, db: Session, exam_id: str, student_id: int, scope: str = "exam", scope_id=None) -> Optional[dict]:
+        board = self.board(db, exam_id, scope, scope_id)
+        with self._lock:
+            return board.rank(student_id)
+
+    def _ensure_fresh(self, db: Session, exam_id: str):
+        built_at = self._built_at.get(exam_id)
+        if built_at is None or time.monotonic() - built_at >= self.refresh_seconds:
+            self.load(db, [exam_id])
+
+    @staticmethod
+    def _board_keys(exam_id: str, school_id: str, section_id: Optional[int]):
+        keys = [(exam_id, "exam", None), (exam_id, "school", school_id)]
+        if section_id is not None:
+            keys.append((exam_id, "section", section_id))
+        return keys
+
+
+leaderboards = LeaderboardService(refresh_seconds=settings.LEADERBOARD_REFRESH_SECONDS)
@@ -0,0 +1,209 @@
+"""
+Streaming MCQ import from CSV or XLSX question banks.
+
+Rows are read one at a time (csv over the upload stream, openpyxl in read-only
+mode), validated, and inserted in batches of MCQ_IMPORT_BATCH_SIZE with a
+multi-row INSERT ... RETURNING id, so memory stays flat and a bank of thousands
+of questions costs a handful of statements. Invalid rows are skipped and
+reported with their spreadsheet row number: lengths and subject_id are checked
+while parsing, and anything the database still rejects (a batch INSERT failing
+with a data or integrity error) rolls back to a savepoint and is retried row by
+row, so only the offending rows are reported and the rest are imported. Imported questions are indexed for
+near-duplicate detection and likely duplicates are reported too.
+
+Expected header (case-insensitive, any order):
+    question, mcq_type, image, option_a, option_b, option_c, option_d, correct_option
+correct_option is "A", "A,C" or "AC". Optional: image, and the question pool
+tags subject_id, chapter and difficulty (1 easy, 2 medium, 3 hard).
+"""
+import codecs
+import csv
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.school import Exam, McqBank, Subject
+from app.schemas.school import McqCreate
+from app.utils.exam_cache import touch_exam
+from app.utils.question_dedupe import find_duplicates, index_questions
+
+REQUIRED_COLUMNS = ("question", "mcq_type", "option_a", "option_b", "option_c", "option_d", "correct_option")
+VALID_OPTIONS = {"A", "B", "C", "D"}
+MAX_REPORTED_ERRORS = 200
+
+
+def validate_mcq_type(mcq_type: str, correct_option: List[str]) -> None:
+    """Single-correct (1) MCQs need exactly one option; multiple-correct (2) at least two."""
+    if mcq_type == "1" and len(correct_option) != 1:
+        raise ValueError("Single correct MCQ can only have one correct option")
+    if mcq_type == "2" and len(correct_option) < 2:
+        raise ValueError("Multiple correct MCQ must have at least two correct options")
+
+
+def parse_correct_option(value) -> List[str]:
+    options = [option.strip().upper() for option in str(value or "").replace(",", " ").split()]
+    if len(options) == 1 and len(options[0]) > 1:
+        options = list(options[0])
+    unknown = set(options) - VALID_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown correct option(s): {', '.join(sorted(unknown))}")
+    return sorted(set(options))
+
+
+def _normalize_header(header) -> List[str]:
+    columns = [str(name or "").strip().lower() for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict]]:
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    columns = _normalize_header(next(reader, []))
+    for row_no, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield row_no, dict(zip(columns, values))
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import requires openpyxl; upload a CSV instead")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = _normalize_header(next(rows, []))
+        for row_no, values in enumerate(rows, start=2):
+            if any(value not in (None, "") for value in values):
+                yield row_no, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(filename: str, stream: BinaryIO) -> Iterator[Tuple[int, Dict]]:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv_rows(stream)
+    if name.endswith(".xlsx"):
+        return iter_xlsx_rows(stream)
+    raise ValueError("Only .csv and .xlsx files are supported")
+
+
+def parse_row(row: Dict) -> Dict:
+    """Validate one spreadsheet row into McqBank column values."""
+    def cell(name):
+        value = row.get(name)
+        return "" if value is None else str(value).strip()
+
+    def number(name):
+        value = cell(name)
+        if value.endswith(".0"):  # numeric cells come back from XLSX as floats
+            value = value[:-2]
+        return value
+
+    mcq_type = number("mcq_type")
+    mcq = McqCreate(
+        question=cell("question"),
+        mcq_type=mcq_type,
+        image=cell("image") or None,
+        option_a=cell("option_a"),
+        option_b=cell("option_b"),
+        option_c=cell("option_c"),
+        option_d=cell("option_d"),
+        correct_option=parse_correct_option(row.get("correct_option")),
+        subject_id=number("subject_id") or None,
+        chapter=number("chapter") or None,
+        difficulty=number("difficulty") or None,
+    )
+    if not mcq.question:
+        raise ValueError("Question is empty")
+    validate_mcq_type(mcq.mcq_type, mcq.correct_option)
+    return mcq.model_dump()
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def import_mcqs(db: Session, exam_id: str, rows: Iterator[Tuple[int, Dict]], batch_size: int = None) -> dict:
+    """
+    Insert valid rows in batches within the caller's transaction and collect
+    per-row errors. The caller commits (or rolls back) when the stream ends.
+    """
+    batch_size = batch_size or settings.MCQ_IMPORT_BATCH_SIZE
+    school_id = db.execute(select(Exam.school_id).where(Exam.id == exam_id)).scalar()
+    subject_ids = set(db.execute(select(Subject.id).where(Subject.school_id == school_id)).scalars())
+    batch, batch_row_nos, errors, imported_ids = [], [], [], []
+    error_count = 0
+
+    def report(row_no: int, message: str):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_no, "error": message})
+
+    def insert_rows(rows):
+        with db.begin_nested():
+            return db.execute(
+                insert(McqBank).returning(McqBank.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+    def flush():
+        if not batch:
+            return
+        try:
+            inserted = list(zip(insert_rows(batch), batch))
+        except (DataError, IntegrityError):
+            # Find the rows the database rejects; each gets its own savepoint
+            inserted = []
+            for row_no, row in zip(batch_row_nos, batch):
+                try:
+                    inserted.extend(zip(insert_rows([row]), [row]))
+                except (DataError, IntegrityError) as e:
+                    report(row_no, str(e.orig).strip().splitlines()[0])
+        # MinHash/LSH index for near-duplicate detection, from the rows already in hand
+        index_questions(db, school_id, [
+            (question_id, row["question"], row["option_a"], row["option_b"], row["option_c"], row["option_d"])
+            for question_id, row in inserted
+        ])
+        imported_ids.extend(question_id for question_id, _ in inserted)
+        batch.clear()
+        batch_row_nos.clear()
+
+    for row_no, row in rows:
+        try:
+            mcq = parse_row(row)
+            if mcq["subject_id"] is not None and mcq["subject_id"] not in subject_ids:
+                raise ValueError(f"Unknown subject_id {mcq['subject_id']} for this school")
+        except (ValueError, ValidationError) as e:
+            report(row_no, _error_message(e))
+            continue
+        batch.append({"exam_id": exam_id, **mcq})
+        batch_row_nos.append(row_no)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    duplicates = []
+    if imported_ids:
+        touch_exam(db, exam_id)
+        # Pairs are (older id, newer id), so the imported question is always the second
+        duplicates = [
+            {"question_id": newer, "duplicate_of": older, "similarity": similarity}
+            for older, newer, similarity in find_duplicates(db, school_id, imported_ids)[:MAX_REPORTED_ERRORS]
+        ]
+    return {
+        "imported": len(imported_ids),
+        "failed": error_count,
+        "errors": errors,
+        "possible_duplicates": duplicates,
+    }
@@ -0,0 +1,81 @@
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.school import PeriodAttendance
+from app.models.students import Student
+
+UNMARKED = "-"
+
+
+def encode_roster(marks: Iterable) -> str:
+    """Pack (roll_no, status) marks into a status string indexed by roll number."""
+    by_roll = {mark.roll_no: mark.status.upper() for mark in marks}
+    if not by_roll:
+        return ""
+    vector = [UNMARKED] * max(by_roll)
+    for roll_no, status in by_roll.items():
+        vector[roll_no - 1] = status
+    return "".join(vector)
+
+
+def decode_roster(statuses: str) -> Dict[int, str]:
+    """Unpack a status string back into {roll_no: status}, skipping unmarked slots."""
+    return {index + 1: status for index, status in enumerate(statuses) if status != UNMARKED}
+
+
+def save_period_attendance(
+    db: Session,
+    school_id: str,
+    class_id: int,
+    section_id: int,
+    period_id: int,
+    attendance_date: date,
+    marks: Iterable,
+    marked_by: Optional[str] = None,
+) -> int:
+    """Write the whole roster for a period in one upsert; re-submitting replaces it."""
+    stmt = pg_insert(PeriodAttendance).values(
+        school_id=school_id,
+        class_id=class_id,
+        section_id=section_id,
+        period_id=period_id,
+        date=attendance_date,
+        statuses=encode_roster(marks),
+        marked_by=marked_by,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["section_id", "date", "period_id"],
+        set_={
+            "statuses": stmt.excluded.statuses,
+            "marked_by": stmt.excluded.marked_by,
+            "updated_at": func.now(),
+        },
+    )
+    return db.execute(stmt.returning(PeriodAttendance.id)).scalar()
+
+
+def get_student_period_attendance(db: Session, student: Student, start_date: date, end_date: date):
+    """
+    Per-student view decoded in SQL: one substr() per period row of the student's
+    class and section, so no roster is shipped to Python. Section rows are shared
+    by every class through class_section, so both columns are needed to pick the
+    rows whose roll numbers belong to this student's roster.
+    """
+    status = func.substr(PeriodAttendance.statuses, student.roll_no, 1)
+    rows = db.execute(
+        select(PeriodAttendance.date, PeriodAttendance.period_id, status)
+        .where(
+            PeriodAttendance.class_id == student.class_id,
+            PeriodAttendance.section_id == student.section_id,
+            PeriodAttendance.date.between(start_date, end_date),
+        )
+        .order_by(PeriodAttendance.date, PeriodAttendance.period_id)
+    ).all()
+    return [
+        {"date": day, "period_id": period_id, "status": mark if mark and mark != UNMARKED else None}
+        for day, period_id, mark in rows
+    ]
@@ -0,0 +1,212 @@
+"""
+Near-duplicate MCQ detection with MinHash and LSH.
+
+Each question (question text plus its four options, normalized) is cut into
+character shingles and summarised as a MinHash signature of DEDUPE_NUM_PERM
+32-bit values, stored in McqBank.minhash. The fraction of equal positions in
+two signatures estimates the Jaccard similarity of their shingle sets.
+
+The signature is split into DEDUPE_BANDS bands; each band is hashed into an
+`mcq_lsh_buckets` row scoped to the school. Questions that share any bucket are
+candidates, so finding duplicates is an indexed self-join on buckets rather
+than an all-pairs comparison; candidates are then confirmed against
+DEDUPE_SIMILARITY_THRESHOLD using the stored signatures.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.school import Exam, McqBank, McqLshBucket
+
+NUM_PERM = settings.DEDUPE_NUM_PERM
+BANDS = settings.DEDUPE_BANDS
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = settings.DEDUPE_SHINGLE_SIZE
+CHUNK_SIZE = 1000
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures must be identical across workers and restarts
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def question_text(question: str, *options: str) -> str:
+    return normalize(" ".join([question or "", *[option or "" for option in options]]))
+
+
+def shingles(text: str) -> set:
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of the text's character shingles."""
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)), dtype=np.uint64
+    )
+    with np.errstate(over="ignore"):
+        permuted = (hashes[:, np.newaxis] * _PERM_A + _PERM_B) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket id per band."""
+    bands = signature.reshape(BANDS, ROWS_PER_BAND)
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big", signed=True)
+        for band in bands
+    ]
+
+
+def estimated_similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Row-wise estimated Jaccard similarity of two (n x NUM_PERM) signature matrices."""
+    return (left == right).mean(axis=1)
+
+
+def index_questions(db: Session, school_id: str, rows: Iterable[Sequence]) -> List[int]:
+    """
+    Compute and store signatures and LSH buckets for (id, question, a, b, c, d)
+    rows, replacing any previous buckets. Returns the indexed question ids.
+    """
+    signatures, buckets = [], []
+    for row in rows:
+        signature = minhash(question_text(*row[1:6]))
+        signatures.append({"id": row[0], "minhash": signature.tobytes()})
+        buckets.extend(
+            {"question_id": row[0], "band": band, "school_id": school_id, "bucket": bucket}
+            for band, bucket in enumerate(band_buckets(signature))
+        )
+    if not signatures:
+        return []
+
+    question_ids = [signature["id"] for signature in signatures]
+    db.execute(update(McqBank), signatures)
+    db.execute(delete(McqLshBucket).where(McqLshBucket.question_id.in_(question_ids)))
+    db.execute(insert(McqLshBucket), buckets)
+    return question_ids
+
+
+def index_question_ids(db: Session, question_ids: List[int]) -> List[int]:
+    """Index questions by id (e.g. after insert or edit), grouped by their school."""
+    indexed = []
+    for start in range(0, len(question_ids), CHUNK_SIZE):
+        rows = db.execute(
+            select(
+                McqBank.id, McqBank.question, McqBank.option_a, McqBank.option_b,
+                McqBank.option_c, McqBank.option_d, Exam.school_id,
+            )
+            .join(Exam, Exam.id == McqBank.exam_id)
+            .where(McqBank.id.in_(question_ids[start:start + CHUNK_SIZE]))
+            .order_by(Exam.school_id)
+        ).all()
+        by_school: Dict[str, list] = {}
+        for row in rows:
+            by_school.setdefault(row.school_id, []).append(row)
+        for school_id, school_rows in by_school.items():
+            indexed += index_questions(db, school_id, school_rows)
+    return indexed
+
+
+def backfill_signatures(db: Session, school_id: str) -> int:
+    """Index the school's questions that have no signature yet."""
+    missing = db.execute(
+        select(McqBank.id)
+        .join(Exam, Exam.id == McqBank.exam_id)
+        .where(Exam.school_id == school_id, McqBank.minhash.is_(None))
+    ).scalars().all()
+    return len(index_question_ids(db, list(missing)))
+
+
+def candidate_pairs(db: Session, school_id: str, question_ids: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+    """Pairs of questions sharing at least one LSH bucket, optionally involving `question_ids`."""
+    left, right = aliased(McqLshBucket), aliased(McqLshBucket)
+    stmt = (
+        select(left.question_id, right.question_id)
+        .join(right, and_(
+            right.school_id == left.school_id,
+            right.band == left.band,
+            right.bucket == left.bucket,
+            right.question_id != left.question_id,
+        ))
+        .where(left.school_id == school_id)
+        .distinct()
+    )
+    if question_ids is None:
+        return db.execute(stmt.where(left.question_id < right.question_id)).all()
+
+    pairs = set()
+    for start in range(0, len(question_ids), CHUNK_SIZE):
+        chunk = question_ids[start:start + CHUNK_SIZE]
+        for a, b in db.execute(stmt.where(left.question_id.in_(chunk))).all():
+            pairs.add((min(a, b), max(a, b)))
+    return sorted(pairs)
+
+
+def confirm_pairs(db: Session, pairs: List[Tuple[int, int]], threshold: float) -> List[Tuple[int, int, float]]:
+    """Keep candidate pairs whose estimated similarity reaches `threshold`."""
+    if not pairs:
+        return []
+    ids = sorted({question_id for pair in pairs for question_id in pair})
+    signatures = {}
+    for start in range(0, len(ids), CHUNK_SIZE):
+        for question_id, blob in db.execute(
+            select(McqBank.id, McqBank.minhash).where(McqBank.id.in_(ids[start:start + CHUNK_SIZE]))
+        ).all():
+            if blob:
+                signatures[question_id] = np.frombuffer(blob, dtype=np.uint32)
+
+    pairs = [(a, b) for a, b in pairs if a in signatures and b in signatures]
+    if not pairs:
+        return []
+    left = np.vstack([signatures[a] for a, _ in pairs])
+    right = np.vstack([signatures[b] for _, b in pairs])
+    similarity = estimated_similarity(left, right)
+    return [
+        (a, b, round(float(score), 3))
+        for (a, b), score in zip(pairs, similarity.tolist())
+        if score >= threshold
+    ]
+
+
+def find_duplicates(db: Session, school_id: str, question_ids: Optional[List[int]] = None,
+                    threshold: Optional[float] = None) -> List[Tuple[int, int, float]]:
+    """Confirmed near-duplicate pairs (a, b, similarity) in a school's bank."""
+    threshold = settings.DEDUPE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    return confirm_pairs(db, candidate_pairs(db, school_id, question_ids), threshold)
+
+
+def cluster_pairs(pairs: Iterable[Tuple[int, int, float]]) -> List[List[int]]:
+    """Group duplicate pairs into clusters (union-find); each cluster sorted, largest first."""
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for question_id in parent:
+        clusters.setdefault(find(question_id), []).append(question_id)
+    return sorted((sorted(members) for members in clusters.values()), key=lambda c: (-len(c), c[0]))
@@ -0,0 +1,192 @@
+"""
+Generated exam papers drawn from a chapter-tagged question pool.
+
+An exam with `is_generated` does not use the questions attached to it. Its pool
+is every question of the school's exams for the same class that is tagged with
+one of the exam's chapters (and with its subject, when the exam has one). The
+pool is loaded once per exam version into NumPy arrays: question ids and, for
+each (chapter, difficulty) stratum, the positions of its questions.
+
+Papers for a batch of students are drawn together. A (students x pool) matrix
+of random keys is built, and in each stratum the quota's smallest keys
+(argpartition) are that student's picks. Each student gets an independent
+sample without replacement, and no ORDER BY random() runs in the database.
+
+Quotas split no_of_questions evenly across chapters. Within a chapter they
+follow PAPER_DIFFICULTY_MIX, and untagged questions count as medium. If a
+stratum has too few questions, its shortfall is drawn from the rest of the pool.
+
+Draws are stored in exam_paper_assignments. A student's paper never changes
+once drawn, and a submission is scored only on the questions assigned to it.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.school import Exam, ExamPaperAssignment, McqBank, exam_sections
+from app.models.students import Student
+
+MEDIUM = 2
+
+
+def pool_filter(exam) -> list:
+    """WHERE clauses selecting the questions an exam is scored and served from."""
+    if not getattr(exam, "is_generated", False):
+        return [McqBank.exam_id == exam.id]
+    source_exams = select(Exam.id).where(Exam.school_id == exam.school_id, Exam.class_id == exam.class_id)
+    filters = [McqBank.exam_id.in_(source_exams), McqBank.chapter.in_(exam.chapters or [])]
+    if exam.subject_id is not None:
+        filters.append(McqBank.subject_id == exam.subject_id)
+    return filters
+
+
+def _largest_remainder(total: int, weights: np.ndarray) -> np.ndarray:
+    """Split `total` into integers proportional to `weights`."""
+    if total <= 0 or not weights.sum():
+        return np.zeros(weights.size, dtype=np.int64)
+    raw = weights / weights.sum() * total
+    quotas = np.floor(raw).astype(np.int64)
+    remainder = total - int(quotas.sum())
+    if remainder:
+        quotas[np.argsort(-(raw - quotas), kind="stable")[:remainder]] += 1
+    return quotas
+
+
+class QuestionPool:
+    def __init__(self, question_ids: np.ndarray, chapters: np.ndarray, difficulties: np.ndarray):
+        self.question_ids = question_ids
+        strata: Dict[tuple, List[int]] = {}
+        for position, stratum in enumerate(zip(chapters.tolist(), difficulties.tolist())):
+            strata.setdefault(stratum, []).append(position)
+        self.strata = sorted(strata)
+        self.members = [np.asarray(strata[stratum], dtype=np.int64) for stratum in self.strata]
+
+    @classmethod
+    def compile(cls, rows: Iterable[Sequence]) -> "QuestionPool":
+        """Build a pool from (question_id, chapter, difficulty) rows."""
+        rows = sorted(rows, key=lambda row: row[0])
+        question_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        chapters = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        difficulties = np.fromiter((row[2] or MEDIUM for row in rows), dtype=np.int64, count=len(rows))
+        return cls(question_ids, chapters, difficulties)
+
+    def __len__(self) -> int:
+        return int(self.question_ids.size)
+
+    def quotas(self, size: int, mix: Optional[Sequence[float]] = None) -> np.ndarray:
+        """Questions to take from each stratum: even across chapters, `mix` across difficulties."""
+        mix = list(mix or settings.PAPER_DIFFICULTY_MIX)
+        chapters = sorted({chapter for chapter, _ in self.strata})
+        per_chapter = dict(zip(chapters, _largest_remainder(size, np.ones(len(chapters))).tolist()))
+
+        quotas = np.zeros(len(self.strata), dtype=np.int64)
+        for chapter in chapters:
+            indices = [i for i, (c, _) in enumerate(self.strata) if c == chapter]
+            weights = np.array([
+                float(mix[self.strata[i][1] - 1]) if 0 < self.strata[i][1] <= len(mix) else 0.0
+                for i in indices
+            ])
+            if not weights.sum():
+                weights = np.ones(len(indices))
+            quotas[indices] = _largest_remainder(per_chapter[chapter], weights)
+        sizes = np.array([members.size for members in self.members], dtype=np.int64)
+        return np.minimum(quotas, sizes)
+
+    def draw(self, count: int, size: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """A (count x size) array of question ids: one balanced sample per row, sorted."""
+        size = min(size, len(self))
+        if not count or not size:
+            return np.zeros((count, 0), dtype=np.int64)
+        rng = rng or np.random.default_rng()
+        keys = rng.random((count, len(self)))
+
+        picks = []
+        for members, quota in zip(self.members, self.quotas(size).tolist()):
+            if quota:
+                chosen = np.argpartition(keys[:, members], quota - 1, axis=1)[:, :quota]
+                picks.append(members[chosen])
+        chosen = np.concatenate(picks, axis=1) if picks else np.zeros((count, 0), dtype=np.int64)
+
+        shortfall = size - chosen.shape[1]
+        if shortfall > 0:
+            # Strata too small for their quota: top up from whatever is left
+            np.put_along_axis(keys, chosen, np.inf, axis=1)
+            extra = np.argpartition(keys, shortfall - 1, axis=1)[:, :shortfall]
+            chosen = np.concatenate([chosen, extra], axis=1)
+        return np.sort(self.question_ids[chosen], axis=1)
+
+
+def load_pool(db: Session, exam) -> QuestionPool:
+    rows = db.execute(
+        select(McqBank.id, McqBank.chapter, McqBank.difficulty).where(*pool_filter(exam))
+    ).all()
+    return QuestionPool.compile(rows)
+
+
+def exam_student_ids(db: Session, exam) -> List[int]:
+    """Students of the exam's class in its sections."""
+    return db.execute(
+        select(Student.id)
+        .join(exam_sections, exam_sections.c.section_id == Student.section_id)
+        .where(exam_sections.c.exam_id == exam.id, Student.class_id == exam.class_id)
+    ).scalars().all()
+
+
+def generate_papers(db: Session, exam, pool: QuestionPool, student_ids: List[int],
+                    batch_size: Optional[int] = None) -> int:
+    """
+    Draw and store papers for the students that do not have one yet, in the
+    caller's transaction. Returns the number of papers created.
+    """
+    batch_size = batch_size or settings.PAPER_GENERATION_BATCH_SIZE
+    created = 0
+    rng = np.random.default_rng()
+    for start in range(0, len(student_ids), batch_size):
+        chunk = student_ids[start:start + batch_size]
+        existing = set(db.execute(
+            select(ExamPaperAssignment.student_id).where(
+                ExamPaperAssignment.exam_id == exam.id,
+                ExamPaperAssignment.student_id.in_(chunk),
+            )
+        ).scalars().all())
+        missing = [student_id for student_id in chunk if student_id not in existing]
+        if not missing:
+            continue
+        papers = pool.draw(len(missing), exam.no_of_questions, rng)
+        created += len(db.execute(
+            pg_insert(ExamPaperAssignment)
+            .on_conflict_do_nothing(index_elements=["exam_id", "student_id"])
+            .returning(ExamPaperAssignment.student_id),
+            [
+                {"exam_id": exam.id, "student_id": student_id, "question_ids": paper}
+                for student_id, paper in zip(missing, papers.tolist())
+            ],
+        ).all())
+    return created
+
+
+def assigned_question_ids(db: Session, exam, pool: QuestionPool, student_id: int) -> List[int]:
+    """The student's paper, drawn on first access (concurrent first accesses keep one draw)."""
+    stmt = select(ExamPaperAssignment.question_ids).where(
+        ExamPaperAssignment.exam_id == exam.id, ExamPaperAssignment.student_id == student_id
+    )
+    question_ids = db.execute(stmt).scalar()
+    if question_ids is None:
+        generate_papers(db, exam, pool, [student_id])
+        question_ids = db.execute(stmt).scalar()
+    return list(question_ids or [])
+
+
+def paper_assignments(db: Session, exam_id: str) -> Dict[int, List[int]]:
+    """{student_id: assigned question ids} for every paper drawn for the exam."""
+    return {
+        row.student_id: list(row.question_ids)
+        for row in db.execute(
+            select(ExamPaperAssignment.student_id, ExamPaperAssignment.question_ids)
+            .where(ExamPaperAssignment.exam_id == exam_id)
+        )
+    }
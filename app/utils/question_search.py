@@ -0,0 +1,119 @@
+"""
+School-scoped question bank search.
+
+Matches come from two indexes on mcq_bank: the GIN index on the generated
+`search_vector` (question + option text, 'simple' config so Hindi and bilingual
+banks are not mangled by English stemming) and the trigram GIN index on
+`question` for fuzzy / misspelled queries. Results are ordered by
+ts_rank + similarity and paginated with an opaque keyset cursor of
+(score, id), so a page never skips or repeats rows when questions are added
+between requests. The score is computed per match, so every page still scores
+and sorts all matches before taking its slice.
+
+The score is rounded to a fixed-scale numeric in SQL and the cursor carries
+that exact decimal: ts_rank and similarity are float4, whose values do not
+survive a round trip through a Python float, so rows tied with the cursor row
+would otherwise be skipped.
+"""
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Numeric, and_, cast, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.school import Exam, McqBank
+
+TS_CONFIG = "simple"
+SCORE_SCALE = 6
+
+
+def encode_cursor(score: Decimal, question_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([str(score), question_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Decimal, int]:
+    try:
+        score, question_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return Decimal(str(score)), int(question_id)
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError("Invalid cursor")
+
+
+def search_question_bank(
+    db: Session,
+    school_id: str,
+    query: Optional[str] = None,
+    class_id: Optional[int] = None,
+    chapter: Optional[int] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    subject_id: Optional[int] = None,
+) -> dict:
+    """Return one page of matching questions and the cursor for the next page (None at the end)."""
+    query = (query or "").strip()
+    filters = [Exam.school_id == school_id]
+    if class_id is not None:
+        filters.append(Exam.class_id == class_id)
+    # Chapter and subject are tagged on each question (see app/utils/question_pool.py)
+    if chapter is not None:
+        filters.append(McqBank.chapter == chapter)
+    if subject_id is not None:
+        filters.append(McqBank.subject_id == subject_id)
+
+    if query:
+        ts_query = func.websearch_to_tsquery(TS_CONFIG, query)
+        filters.append(or_(McqBank.search_vector.op("@@")(ts_query), McqBank.question.op("%")(query)))
+        raw_score = func.ts_rank(McqBank.search_vector, ts_query) + func.similarity(McqBank.question, query)
+    else:
+        # Browsing without a query: newest first
+        raw_score = literal(0)
+    score = func.round(cast(raw_score, Numeric), SCORE_SCALE).label("score")
+
+    if cursor:
+        after_score, after_id = decode_cursor(cursor)
+        after_score = cast(literal(after_score), Numeric)
+        filters.append(or_(score < after_score, and_(score == after_score, McqBank.id < after_id)))
+
+    rows = db.execute(
+        select(
+            McqBank.id,
+            McqBank.exam_id,
+            McqBank.question,
+            McqBank.mcq_type,
+            McqBank.image,
+            McqBank.option_a,
+            McqBank.option_b,
+            McqBank.option_c,
+            McqBank.option_d,
+            McqBank.correct_option,
+            score,
+        )
+        .join(Exam, Exam.id == McqBank.exam_id)
+        .where(*filters)
+        .order_by(score.desc(), McqBank.id.desc())
+        .limit(limit + 1)
+    ).all()
+
+    items: List[dict] = [
+        {
+            "id": row.id,
+            "exam_id": row.exam_id,
+            "question": row.question,
+            "mcq_type": row.mcq_type,
+            "image": row.image,
+            "option_a": row.option_a,
+            "option_b": row.option_b,
+            "option_c": row.option_c,
+            "option_d": row.option_d,
+            "correct_option": row.correct_option,
+            "score": round(float(row.score), 4),
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.score, last.id)
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,151 @@
+"""
+Streaming exam result export (CSV / XLSX).
+
+Rows come from a single joined Core select (results, students, classes,
+sections, exams) executed with `yield_per`, which on psycopg2 opens a
+server-side cursor: only EXPORT_CHUNK_SIZE rows are in memory at a time and no
+ORM objects are built. CSV chunks are yielded straight into a
+StreamingResponse. XLSX uses openpyxl's write-only workbook (rows go to a temp
+file as they are appended) and the finished file is streamed back in blocks.
+
+The generators open their own session, because they run after the request
+handler (and its get_db session) has returned.
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.school import Class, Exam, Section, StudentExamData
+from app.models.students import Student
+
+EXPORT_CHUNK_SIZE = 2000
+FILE_BLOCK_SIZE = 64 * 1024
+
+COLUMNS = (
+    "exam_id", "exam_type", "student_id", "roll_no", "first_name", "last_name",
+    "class", "section", "attempt_no", "result", "status", "submitted_at",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def results_query(school_id: str, exam_id: Optional[str] = None, class_id: Optional[int] = None,
+                  start_date: Optional[date] = None, end_date: Optional[date] = None):
+    stmt = (
+        select(
+            StudentExamData.exam_id,
+            Exam.exam_type,
+            StudentExamData.student_id,
+            Student.roll_no,
+            Student.first_name,
+            Student.last_name,
+            Class.name.label("class_name"),
+            Section.name.label("section_name"),
+            StudentExamData.attempt_no,
+            StudentExamData.result,
+            StudentExamData.status,
+            StudentExamData.submitted_at,
+        )
+        .join(Exam, Exam.id == StudentExamData.exam_id)
+        .join(Student, Student.id == StudentExamData.student_id)
+        .outerjoin(Class, Class.id == Student.class_id)
+        .outerjoin(Section, Section.id == Student.section_id)
+        .where(StudentExamData.school_id == school_id)
+        .order_by(StudentExamData.exam_id, Class.name, Section.name, Student.roll_no, StudentExamData.attempt_no)
+    )
+    if exam_id:
+        stmt = stmt.where(StudentExamData.exam_id == exam_id)
+    if class_id is not None:
+        stmt = stmt.where(Exam.class_id == class_id)
+    # Bounds on the partition key let Postgres prune months outside the term
+    if start_date:
+        stmt = stmt.where(StudentExamData.submitted_at >= datetime.combine(start_date, time.min))
+    if end_date:
+        stmt = stmt.where(StudentExamData.submitted_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    return stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+def _values(row) -> tuple:
+    return (
+        row.exam_id,
+        row.exam_type.value if row.exam_type else None,
+        row.student_id,
+        row.roll_no,
+        row.first_name,
+        row.last_name,
+        row.class_name,
+        row.section_name,
+        row.attempt_no,
+        row.result,
+        row.status.value if row.status else None,
+        row.submitted_at.isoformat() if row.submitted_at else None,
+    )
+
+
+def iter_result_rows(db: Session, stmt) -> Iterator[tuple]:
+    for partition in db.execute(stmt).partitions():
+        for row in partition:
+            yield _values(row)
+
+
+def stream_csv(stmt) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")  # BOM so Excel opens UTF-8 names correctly
+        writer.writerow(COLUMNS)
+        for count, values in enumerate(iter_result_rows(db, stmt), start=1):
+            writer.writerow(values)
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+    finally:
+        db.close()
+
+
+def stream_xlsx(stmt) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    db = SessionLocal()
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Results")
+        sheet.append(COLUMNS)
+        for values in iter_result_rows(db, stmt):
+            sheet.append(values)
+        db.close()
+
+        with tempfile.TemporaryFile() as handle:
+            workbook.save(handle)
+            handle.seek(0)
+            while True:
+                block = handle.read(FILE_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+    finally:
+        db.close()
+
+
+def export_results(fmt: str, school_id: str, **filters) -> Iterator[bytes]:
+    """Byte stream of the school's results in `fmt` ("csv" or "xlsx")."""
+    stmt = results_query(school_id, **filters)
+    if fmt == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ValueError("XLSX export requires openpyxl; use format=csv instead")
+        return stream_xlsx(stmt)
+    return stream_csv(stmt)
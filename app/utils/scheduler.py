@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+
+# Non-leaders retry the leader lock at this interval rather than every tick.
+LEADER_RETRY_SECONDS = 30
+
+
+class ScheduledJob:
+    def __init__(self, func: Callable, interval_seconds: float, name: str, run_immediately: bool):
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.name = name
+        self.next_run = time.monotonic() if run_immediately else time.monotonic() + interval_seconds
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class Scheduler:
+    """
+    Minimal in-process interval scheduler.
+
+    Every API worker starts one, but only the worker holding the Postgres
+    advisory lock `lock_key` runs jobs. The lock lives on a dedicated autocommit
+    connection, so it is released automatically if that worker dies and another
+    worker takes over on its next retry.
+    """
+
+    def __init__(self, lock_key: int, tick_seconds: float = 1.0):
+        self.lock_key = lock_key
+        self.tick_seconds = tick_seconds
+        self.jobs: List[ScheduledJob] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_conn = None
+        self._next_leader_attempt = 0.0
+
+    def add_job(self, func: Callable, interval_seconds: float, name: Optional[str] = None, run_immediately: bool = False):
+        self.jobs.append(ScheduledJob(func, interval_seconds, name or func.__name__, run_immediately))
+        return func
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self._release_leadership()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_conn is not None
+
+    def _acquire_leadership(self) -> bool:
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                self._release_leadership()
+
+        now = time.monotonic()
+        if now < self._next_leader_attempt:
+            return False
+        self._next_leader_attempt = now + LEADER_RETRY_SECONDS
+
+        conn = None
+        try:
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+            ).scalar()
+        except Exception as e:
+            print(f"Scheduler could not reach the database: {str(e)}")
+            acquired = False
+        if acquired:
+            self._lock_conn = conn
+        elif conn is not None:
+            conn.close()
+        return bool(acquired)
+
+    def _release_leadership(self):
+        if self._lock_conn is None:
+            return
+        try:
+            self._lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+        except Exception:
+            pass
+        finally:
+            self._lock_conn.close()
+            self._lock_conn = None
+
+    def run_job(self, job: ScheduledJob):
+        started = time.perf_counter()
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.last_error = str(e)
+            print(f"Scheduled job '{job.name}' failed: {str(e)}")
+        finally:
+            job.last_duration = round(time.perf_counter() - started, 4)
+            job.next_run = time.monotonic() + job.interval_seconds
+
+    def _run(self):
+        while not self._stop.wait(self.tick_seconds):
+            if not self._acquire_leadership():
+                continue
+            for job in self.jobs:
+                if self._stop.is_set():
+                    break
+                if job.next_run <= time.monotonic():
+                    self.run_job(job)
+
+
+scheduler = Scheduler(lock_key=settings.SCHEDULER_LOCK_KEY)
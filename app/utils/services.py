@@ -1,41 +1,71 @@
-from datetime import time
+from datetime import time, date
+from typing import Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from app.models.school import McqBank
-from app.schemas.school import McqBulkCreate
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.school import McqBank, Attendance, Exam
+from app.utils.exam_scoring import score_submission
+from app.utils.exam_cache import get_answer_key, touch_exam
+from app.schemas.school import McqBulkCreate, McqResponse
+from app.utils.mcq_import import validate_mcq_type
+from app.utils.question_dedupe import index_question_ids
 def is_time_overlap(start1: time, end1: time, start2: time, end2: time) -> bool:
     return max(start1, start2) < min(end1, end2)
 
 
 
-def create_mcq(db: Session, exam_id: str, mcq_bulk: McqBulkCreate):
-    created_mcqs = []
-
-    for mcq in mcq_bulk.mcqs:  # Loop through each question
-        # validation based on mcq_type
-        if mcq.mcq_type == "1" and len(mcq.correct_option) > 1:
-            raise ValueError("Single correct MCQ can only have one correct option")
-        if mcq.mcq_type == "2" and len(mcq.correct_option) < 2:
-            raise ValueError("Multiple correct MCQ must have at least two correct options")
+def upsert_attendance(
+    db: Session,
+    attendance_date: date,
+    status: str,
+    is_verified: bool,
+    student_id: Optional[int] = None,
+    teachers_id: Optional[str] = None,
+    overwrite: bool = False,
+):
+    """
+    Record attendance with a single INSERT ... ON CONFLICT on (student_id, date)
+    or (teachers_id, date).
 
-        new_mcq = McqBank(
-            exam_id=exam_id,
-            question=mcq.question,
-            mcq_type=mcq.mcq_type,
-            image=mcq.image,
-            option_a=mcq.option_a,
-            option_b=mcq.option_b,
-            option_c=mcq.option_c,
-            option_d=mcq.option_d,
-            correct_option=mcq.correct_option,
+    With `overwrite` an existing row takes the new status; otherwise the insert is
+    skipped. Returns the row id, or None when a row exists and was not overwritten.
+    """
+    conflict_columns = ["student_id", "date"] if student_id is not None else ["teachers_id", "date"]
+    stmt = pg_insert(Attendance).values(
+        student_id=student_id,
+        teachers_id=teachers_id,
+        date=attendance_date,
+        status=status,
+        is_verified=is_verified,
+    )
+    if overwrite:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={"status": stmt.excluded.status, "is_verified": stmt.excluded.is_verified},
         )
-        db.add(new_mcq)
-        created_mcqs.append(new_mcq)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
 
-    db.commit()
-    for mcq in created_mcqs:
-        db.refresh(mcq)
+    return db.execute(stmt.returning(Attendance.id)).scalar()
 
-    return created_mcqs
+
+def create_mcq(db: Session, exam_id: str, mcq_bulk: McqBulkCreate):
+    for mcq in mcq_bulk.mcqs:
+        validate_mcq_type(mcq.mcq_type, mcq.correct_option)
+    if not mcq_bulk.mcqs:
+        return []
+
+    # One multi-row INSERT ... RETURNING; responses are built before commit expires the rows
+    created_mcqs = db.scalars(
+        insert(McqBank).returning(McqBank),
+        [{"exam_id": exam_id, **mcq.model_dump()} for mcq in mcq_bulk.mcqs],
+    ).all()
+    response = [McqResponse.model_validate(mcq) for mcq in created_mcqs]
+    index_question_ids(db, [mcq.id for mcq in response])
+
+    touch_exam(db, exam_id)
+    db.commit()
+    return response
 
 
 def get_mcqs_by_exam(db: Session, exam_id: int):
@@ -46,30 +76,17 @@ def delete_mcq(db: Session, mcq_id: int):
     if not db_mcq:
         return False
     db.delete(db_mcq)
+    if db_mcq.exam_id:
+        touch_exam(db, db_mcq.exam_id)
     db.commit()
     return True
 
 def evaluate_exam(db: Session, exam_id: str, answers: dict):
-    """Check student's answers and return score + pass/fail"""
-    total_questions = db.query(McqBank).filter(McqBank.exam_id == exam_id).count()
-    correct_count = 0
-
-    for qid, selected_option in answers.items():
-        question = db.query(McqBank).filter(
-            McqBank.id == qid,
-            McqBank.exam_id == exam_id
-        ).first()
-
-        if question and question.correct_option == selected_option:
-            correct_count += 1
-
-    # simple rule: pass if 40% or more correct
-    percentage = (correct_count / total_questions) * 100 if total_questions > 0 else 0
-    status = "pass" if percentage >= 40 else "fail"
+    """Check student's answers ({question_id: selected_option}) and return score + pass/fail"""
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        return {"total": 0, "correct": 0, "marks": 0, "percentage": 0, "status": "fail"}
 
-    return {
-        "total": total_questions,
-        "correct": correct_count,
-        "percentage": percentage,
-        "status": status
-    }
+    answer_key = get_answer_key(db, exam)
+    submission = [{"question_id": qid, "selected_option": option} for qid, option in answers.items()]
+    return score_submission(answer_key, submission, exam)
@@ -0,0 +1,294 @@
+"""
+Write-behind ingestion for exam submissions.
+
+submit_exam validates and scores in-request, then hands the finished row to
+this pipeline and returns immediately. Each accepted row is first appended to a
+per-worker write-ahead log (JSON lines, fsync'd) and then queued; a background
+thread drains the queue into `student_exam_data` with multi-row
+INSERT ... ON CONFLICT DO NOTHING on (submission_uid, submitted_at).
+
+Durability: a row is only acknowledged once it is in the WAL. On startup each
+worker replays WAL files left by workers that are no longer running (detected
+with a non-blocking flock); because inserts are idempotent on submission_uid,
+replaying rows that were already flushed is harmless. The WAL is truncated
+whenever everything written to it has been flushed.
+
+Poison rows: a batch that fails with a data or integrity error (e.g. the exam
+or student was deleted meanwhile) is split in halves and retried until the
+failing rows are isolated. Those rows are appended to a per-worker dead-letter
+file next to the WAL (submissions-<pid>.dead, one JSON line with the record and
+the error) and logged, and the rest of the batch is written. Any other error is
+treated as the database being unavailable and the batch is retried as a whole.
+
+Backpressure: at most SUBMISSION_MAX_PENDING rows may be unflushed. When the
+database falls behind, submit() waits up to SUBMISSION_ENQUEUE_TIMEOUT_SECONDS
+for room and then raises PipelineFull, which the route maps to 503.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.school import StudentExamData
+from app.utils.exam_counters import apply_participation
+from app.utils.gradebook import apply_gradebook
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process WAL recovery
+    fcntl = None
+
+RETRY_BACKOFF_SECONDS = 2.0
+# Errors caused by the rows themselves; retrying the same rows cannot succeed
+ROW_ERRORS = (DataError, IntegrityError)
+
+
+class PipelineFull(Exception):
+    pass
+
+
+def persist_submissions(db: Session, records: List[dict]) -> int:
+    """
+    Insert submission rows in one multi-row statement; rows already stored are
+    skipped. Participation counters and the gradebook are bumped for the
+    inserted rows only, in the same transaction.
+    """
+    if not records:
+        return 0
+    rows = [
+        {**record, "submitted_at": datetime.fromisoformat(record["submitted_at"])}
+        for record in records
+    ]
+    stmt = (
+        pg_insert(StudentExamData)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["submission_uid", "submitted_at"])
+        .returning(
+            StudentExamData.student_id,
+            StudentExamData.school_id,
+            StudentExamData.exam_id,
+            StudentExamData.attempt_no,
+            StudentExamData.status,
+            StudentExamData.result,
+            StudentExamData.submitted_at,
+        )
+    )
+    inserted = db.execute(stmt).all()
+    apply_participation(db, inserted)
+    apply_gradebook(db, inserted)
+    return len(inserted)
+
+
+class SubmissionPipeline:
+    def __init__(
+        self,
+        wal_dir: str,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_pending: int = 20000,
+        enqueue_timeout: float = 2.0,
+        fsync: bool = True,
+    ):
+        self.wal_dir = wal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._capacity = threading.BoundedSemaphore(max_pending)
+        self._wal_lock = threading.Lock()
+        self._wal = None
+        self._wal_path = None
+        self._unflushed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        os.makedirs(self.wal_dir, exist_ok=True)
+        self._wal_path = os.path.join(self.wal_dir, f"submissions-{os.getpid()}.wal")
+        self._wal = open(self._wal_path, "a+", encoding="utf-8")
+        if fcntl:
+            fcntl.flock(self._wal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            self.recover()
+        except Exception as e:
+            print(f"Submission WAL recovery failed, will retry on next start: {str(e)}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="submission-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop accepting work, flush what is queued, and close the WAL."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+        if self._wal:
+            self._wal.close()
+            self._wal = None
+            if self._unflushed == 0:
+                os.remove(self._wal_path)
+
+    @property
+    def pending(self) -> int:
+        return self._unflushed
+
+    # Ingestion
+
+    def submit(self, record: dict):
+        """Durably accept a scored submission; raises PipelineFull under sustained backpressure."""
+        if not self._capacity.acquire(timeout=self.enqueue_timeout):
+            raise PipelineFull("Submission queue is full")
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._wal_lock:
+            self._wal.write(line + "\n")
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._unflushed += 1
+        self._queue.put(record)
+
+    # Flushing
+
+    def _take_batch(self) -> List[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_loop(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stop.is_set():
+                    return
+                continue
+            # On shutdown with the database down the rows stay in the WAL for replay
+            if not self._persist(batch):
+                return
+            self._mark_flushed(batch)
+
+    def _persist(self, batch: List[dict], retry: bool = True) -> bool:
+        """
+        Write `batch`, isolating rows that fail on their own and dead-lettering
+        them. Returns False if the database stayed unavailable and we were
+        stopped (or `retry` is off) before everything was written.
+        """
+        while True:
+            error = self._write(batch)
+            if error is None:
+                return True
+            if isinstance(error, ROW_ERRORS):
+                break
+            if not retry or self._stop.wait(RETRY_BACKOFF_SECONDS):
+                return False
+        if len(batch) == 1:
+            self._dead_letter(batch[0], error)
+            return True
+        middle = len(batch) // 2
+        return self._persist(batch[:middle], retry) and self._persist(batch[middle:], retry)
+
+    def _write(self, batch: List[dict]) -> Optional[Exception]:
+        db = SessionLocal()
+        try:
+            persist_submissions(db, batch)
+            db.commit()
+            return None
+        except Exception as e:
+            db.rollback()
+            print(f"Submission flush of {len(batch)} rows failed: {str(e)}")
+            return e
+        finally:
+            db.close()
+
+    def _dead_letter(self, record: dict, error: Exception):
+        path = os.path.join(self.wal_dir, f"submissions-{os.getpid()}.dead")
+        entry = {"record": record, "error": str(error), "failed_at": datetime.now(timezone.utc).isoformat()}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        print(
+            f"Submission {record.get('submission_uid')} for exam {record.get('exam_id')} "
+            f"moved to dead letters ({path}): {str(error)}"
+        )
+
+    def _mark_flushed(self, batch: Iterable[dict]):
+        batch = list(batch)
+        with self._wal_lock:
+            self._unflushed -= len(batch)
+            if self._unflushed == 0 and self._wal:
+                self._wal.truncate(0)
+                self._wal.flush()
+        for _ in batch:
+            self._capacity.release()
+
+    # Recovery
+
+    def recover(self) -> int:
+        """Replay WAL files of dead workers (and any leftover in our own file) into the table."""
+        replayed = 0
+        for name in sorted(os.listdir(self.wal_dir)):
+            path = os.path.join(self.wal_dir, name)
+            if not name.endswith(".wal"):
+                continue
+            if path == self._wal_path:
+                replayed += self._replay_file(self._wal)
+                continue
+            with open(path, "a+", encoding="utf-8") as wal:
+                if fcntl:
+                    try:
+                        fcntl.flock(wal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # a live worker owns it
+                replayed += self._replay_file(wal)
+            os.remove(path)
+        return replayed
+
+    def _replay_file(self, wal) -> int:
+        wal.seek(0)
+        records = []
+        for line in wal:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # torn final line from a crash mid-write; never acknowledged
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            if not self._persist(batch, retry=False):
+                raise RuntimeError("Could not replay submission WAL; database unavailable")
+        wal.truncate(0)
+        return len(records)
+
+
+submission_pipeline = SubmissionPipeline(
+    wal_dir=settings.SUBMISSION_WAL_DIR,
+    batch_size=settings.SUBMISSION_BATCH_SIZE,
+    flush_interval=settings.SUBMISSION_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.SUBMISSION_MAX_PENDING,
+    enqueue_timeout=settings.SUBMISSION_ENQUEUE_TIMEOUT_SECONDS,
+    fsync=settings.SUBMISSION_WAL_FSYNC,
+)
@@ -0,0 +1,30 @@
+import sys
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.school import StudentExamData
+from app.utils.gradebook import rebuild_gradebook
+
+def backfill_gradebook(batch_size: int = 500):
+    """Rebuild every student's gradebook from stored submissions, one short transaction per batch."""
+    db = SessionLocal()
+    try:
+        student_ids = db.execute(select(StudentExamData.student_id).distinct()).scalars().all()
+        db.commit()
+        rows = 0
+        for start in range(0, len(student_ids), batch_size):
+            rows += rebuild_gradebook(db, student_ids[start:start + batch_size])
+            db.commit()
+        print(f"✅ Gradebook rebuilt for {len(student_ids)} students ({rows} rows)")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Gradebook backfill failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python scripts/backfill_gradebook.py [batch_size]")
+        sys.exit(1)
+
+    backfill_gradebook(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,352 @@
+"""
+Exam-day load simulation against a running API server and its Postgres.
+
+Every student of the exam's class (up to `--students`) goes through the exam
+day: log in around the exam opening, fetch /school/exam/{exam_id}, stay idle
+for the rest of the exam, and submit through /school/{exam_id}/submit. Most
+submissions land close to the deadline. Logins follow a normal curve centred
+just after opening, spread over `--login-window` of the exam. Submissions
+arrive an exponentially distributed time before the deadline. `--time-scale`
+compresses the whole day (0.01 turns a 60 minute exam into 36 seconds), so CI
+can keep the arrival shape with a short run.
+
+Requests are sent from a bounded thread pool driven by a time-ordered event
+queue, so thousands of idle students do not each need a thread. Meanwhile a
+sampler polls pg_stat_activity for the server's database. The report has
+p50/p99 latency and error rate per endpoint, plus the peak number of DB
+connections. The thresholds decide the exit code.
+
+Students log in through /auth/login/ when `--password` is given (seeded test
+students sharing one password). Otherwise access tokens are minted locally
+with the server's SECRET_KEY, and the login step only counts arrivals.
+
+    python scripts/bench_exam_day.py <exam_id> --base-url http://localhost:8000 \\
+        --students 2000 --time-scale 0.01 --max-p99-ms 800 --max-error-rate 0.01 --max-connections 80
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import text
+
+from app.core.security import create_access_token
+from app.db.session import SessionLocal
+from app.models.school import Exam
+from app.models.students import Student
+from app.models.users import User
+
+LOGIN, FETCH, SUBMIT = "login", "fetch", "submit"
+OPTIONS = ("A", "B", "C", "D")
+
+_CONNECTIONS_SQL = text("""
+    SELECT count(*) AS total, count(*) FILTER (WHERE state = 'active') AS active
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()
+""")
+
+
+def exam_students(db, exam: Exam, limit: int):
+    """(user_id, email) of up to `limit` students in the exam's class with a login."""
+    return (
+        db.query(User.id, User.email)
+        .join(Student, Student.user_id == User.id)
+        .filter(Student.school_id == exam.school_id, Student.class_id == exam.class_id, User.is_active.is_(True))
+        .order_by(Student.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def arrival_schedule(students: int, duration: float, login_window: float, rng: random.Random):
+    """(login_at, submit_at) offsets in seconds from exam opening, one pair per student."""
+    schedule = []
+    for _ in range(students):
+        login_at = min(max(rng.gauss(login_window / 3, login_window / 6), 0.0), login_window)
+        # Most students use nearly all the time; a few finish early
+        submit_at = duration - min(rng.expovariate(8 / duration), duration - login_at)
+        schedule.append((login_at, max(submit_at, login_at)))
+    return schedule
+
+
+class ConnectionSampler(threading.Thread):
+    """Polls pg_stat_activity and keeps the peak connection counts."""
+
+    def __init__(self, interval: float = 0.5):
+        super().__init__(name="connection-sampler", daemon=True)
+        self.interval = interval
+        self.peak_total = 0
+        self.peak_active = 0
+        self.error = None
+        self._done = threading.Event()
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            while True:
+                row = db.execute(_CONNECTIONS_SQL).one()
+                db.rollback()
+                self.peak_total = max(self.peak_total, row.total)
+                self.peak_active = max(self.peak_active, row.active)
+                if self._done.wait(self.interval):
+                    break
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            db.close()
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=10)
+
+
+class ExamDay:
+    def __init__(self, base_url: str, exam_id: str, students, password, concurrency: int, timeout: float, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.exam_id = exam_id
+        self.students = students
+        self.password = password
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.concurrency = concurrency
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(set)
+        self._tokens = {}
+        self._papers = {}
+        self._events = []
+        self._pending = 0
+        self._order = itertools.count()
+        self._arrived = set()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    # HTTP
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _call(self, step: str, method: str, path: str, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        try:
+            response = self._session().request(
+                method, self.base_url + path, headers=headers, timeout=self.timeout, **kwargs
+            )
+            ok = response.status_code < 400
+            outcome = str(response.status_code)
+        except requests.RequestException as e:
+            response, ok, outcome = None, False, type(e).__name__
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self.latencies[step].append(elapsed)
+            if not ok:
+                self.errors[step] += 1
+                self.error_samples[step].add(outcome)
+        return response if ok else None
+
+    # Steps
+
+    def login(self, index: int):
+        user_id, email = self.students[index]
+        try:
+            if self.password is None:
+                start = time.perf_counter()
+                token = create_access_token(
+                    data={"sub": str(user_id), "role": "student"}, expires_delta=timedelta(hours=12)
+                )
+                with self._cond:
+                    self.latencies[LOGIN].append(time.perf_counter() - start)
+            else:
+                response = self._call(LOGIN, "POST", "/auth/login/", json={"email": email, "password": self.password})
+                token = response.json()["access_token"] if response is not None else None
+            if token:
+                self._tokens[index] = token
+                self.fetch(index)
+        finally:
+            with self._cond:
+                self._arrived.add(index)
+
+    def fetch(self, index: int):
+        response = self._call(FETCH, "GET", f"/school/exam/{self.exam_id}", token=self._tokens[index])
+        if response is not None:
+            self._papers[index] = [question["id"] for question in response.json()]
+
+    def submit(self, index: int):
+        with self._cond:
+            if index not in self._arrived:
+                # Still logging in or fetching; try again shortly
+                self._push(time.monotonic() + 0.05, self.submit, index)
+                return
+        question_ids = self._papers.get(index)
+        if question_ids is None:
+            return  # never got the paper; already counted as a login or fetch error
+        with self._cond:
+            answers = [
+                {"question_id": question_id, "selected_option": self.rng.choice(OPTIONS)}
+                for question_id in question_ids
+            ]
+        self._call(SUBMIT, "POST", f"/school/{self.exam_id}/submit", token=self._tokens[index],
+                   json={"answers": answers})
+
+    # Scheduling
+
+    def _push(self, at: float, step, index: int):
+        # Caller holds self._cond; the counter keeps heap entries comparable
+        heapq.heappush(self._events, (at, next(self._order), index, step))
+        self._pending += 1
+        self._cond.notify()
+
+    def _run_event(self, step, index: int):
+        try:
+            step(index)
+        except Exception as e:
+            print(f"❌ Student {index} {step.__name__} crashed: {str(e)}")
+        finally:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+
+    def run(self, schedule):
+        """Dispatch every event at its (compressed) time; returns the wall-clock duration."""
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            with self._cond:
+                for index, (login_at, submit_at) in enumerate(schedule):
+                    self._push(started + login_at, self.login, index)
+                    self._push(started + submit_at, self.submit, index)
+                while self._pending:
+                    if not self._events:
+                        self._cond.wait()
+                        continue
+                    at, _, index, step = self._events[0]
+                    delay = at - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._events)
+                    pool.submit(self._run_event, step, index)
+        return time.monotonic() - started
+
+
+def percentile_ms(values, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def bench_exam_day(exam_id: str, base_url: str = "http://localhost:8000", students: int = 500,
+                   time_scale: float = 0.01, login_window: float = 0.1, concurrency: int = 200,
+                   password=None, timeout: float = 30.0, seed: int = 42, max_p99_ms=None,
+                   max_error_rate: float = 0.01, max_connections=None, report=None) -> bool:
+    db = SessionLocal()
+    try:
+        exam = db.get(Exam, exam_id)
+        if not exam:
+            print(f"❌ Exam {exam_id} not found")
+            return False
+        roster = exam_students(db, exam, students)
+        exam_seconds = (exam.no_of_questions or 0) * (exam.question_time or 0) or 3600
+    finally:
+        db.close()
+    if not roster:
+        print(f"❌ No students with a login found for exam {exam_id}")
+        return False
+
+    duration = exam_seconds * time_scale
+    schedule = arrival_schedule(len(roster), duration, duration * login_window, random.Random(seed))
+    print(f"Exam day for {exam_id}: {len(roster)} students, {exam_seconds}s exam "
+          f"compressed to {duration:.1f}s, {concurrency} client threads")
+
+    day = ExamDay(base_url, exam_id, roster, password, concurrency, timeout, seed)
+    sampler = ConnectionSampler()
+    sampler.start()
+    try:
+        elapsed = day.run(schedule)
+    finally:
+        sampler.stop()
+
+    results = {"exam_id": exam_id, "students": len(roster), "elapsed_seconds": round(elapsed, 2), "steps": {}}
+    print(f"{'step':<8}{'requests':>10}{'errors':>8}{'error %':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for step in (LOGIN, FETCH, SUBMIT):
+        values = day.latencies[step]
+        errors = day.errors[step]
+        stats = {
+            "requests": len(values),
+            "errors": errors,
+            "error_rate": errors / len(values) if values else 0.0,
+            "p50_ms": round(percentile_ms(values, 50), 1),
+            "p99_ms": round(percentile_ms(values, 99), 1),
+            "error_codes": sorted(day.error_samples[step]),
+        }
+        results["steps"][step] = stats
+        print(f"{step:<8}{stats['requests']:>10}{errors:>8}{stats['error_rate'] * 100:>8.2f}%"
+              f"{stats['p50_ms']:>9}{stats['p99_ms']:>9}")
+        if stats["error_codes"]:
+            print(f"        error responses: {', '.join(stats['error_codes'])}")
+
+    results["db_connections"] = {"peak": sampler.peak_total, "peak_active": sampler.peak_active}
+    if sampler.error:
+        print(f"❌ Connection sampling failed: {sampler.error}")
+    print(f"DB connections: peak {sampler.peak_total} ({sampler.peak_active} active)")
+
+    # Login is only measured when it goes through the API
+    measured = (FETCH, SUBMIT) if password is None else (LOGIN, FETCH, SUBMIT)
+    failures = []
+    for step in measured:
+        stats = results["steps"][step]
+        if stats["error_rate"] > max_error_rate:
+            failures.append(f"{step} error rate {stats['error_rate'] * 100:.2f}% > {max_error_rate * 100:.2f}%")
+        if max_p99_ms is not None and stats["p99_ms"] > max_p99_ms:
+            failures.append(f"{step} p99 {stats['p99_ms']}ms > {max_p99_ms}ms")
+    if max_connections is not None and sampler.peak_total > max_connections:
+        failures.append(f"peak DB connections {sampler.peak_total} > {max_connections}")
+    if sampler.error:
+        failures.append("DB connections were not sampled")
+    results["failures"] = failures
+
+    if report:
+        with open(report, "w") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Exam day within thresholds")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate an exam day against a running server and check latency, errors and DB connections."
+    )
+    parser.add_argument("exam_id", help="an ACTIVE exam whose class has student logins")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--time-scale", type=float, default=0.01, help="fraction of real exam time to simulate")
+    parser.add_argument("--login-window", type=float, default=0.1, help="share of the exam over which students log in")
+    parser.add_argument("--concurrency", type=int, default=200, help="client threads")
+    parser.add_argument("--password", help="log in through /auth/login/ with this password instead of minting tokens")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any endpoint's p99 latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="fail if any endpoint's error rate exceeds this")
+    parser.add_argument("--max-connections", type=int, help="fail if peak DB connections exceed this")
+    parser.add_argument("--report", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    sys.exit(0 if bench_exam_day(**vars(args)) else 1)
@@ -0,0 +1,65 @@
+import sys
+import time
+import numpy as np
+from app.utils.exam_scoring import AnswerKey, ScoringPolicy, score_matrix, mask_options
+
+def naive_score(key_map, submissions):
+    """Reference per-answer Python loop, equivalent to the old submit_exam scoring."""
+    scores = []
+    for answers in submissions:
+        correct = 0
+        for answer in answers:
+            expected = key_map.get(answer["question_id"])
+            if expected is not None and sorted(answer["selected_option"]) == expected:
+                correct += 1
+        scores.append(correct)
+    return scores
+
+def bench(submissions: int = 100_000, questions: int = 50, repeat: int = 5):
+    rng = np.random.default_rng(42)
+    question_ids = np.arange(1000, 1000 + questions, dtype=np.int64)
+    correct_masks = rng.integers(1, 16, size=questions, dtype=np.uint8)
+    key = AnswerKey(question_ids, correct_masks)
+    selections = rng.integers(0, 16, size=(submissions, questions), dtype=np.uint8)
+
+    policies = {
+        "exact": ScoringPolicy(),
+        "partial": ScoringPolicy(partial_credit=True),
+        "partial+negative": ScoringPolicy(partial_credit=True, negative_marking=0.25),
+    }
+    print(f"Scoring {submissions:,} submissions x {questions} questions (best of {repeat})")
+    for name, policy in policies.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            score_matrix(key, selections, policy)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(f"  vectorized {name:<18} {best * 1000:8.1f} ms  ({submissions / best:,.0f} submissions/s)")
+
+    sample = min(submissions, 10_000)
+    raw = [
+        [{"question_id": int(qid), "selected_option": mask_options(int(mask))} for qid, mask in zip(question_ids, row)]
+        for row in selections[:sample]
+    ]
+    started = time.perf_counter()
+    encoded = key.encode_many(raw)
+    encode_time = time.perf_counter() - started
+    print(f"  encode JSON answers          {encode_time / sample * submissions * 1000:8.1f} ms  (extrapolated from {sample:,})")
+
+    key_map = {int(qid): mask_options(int(mask)) for qid, mask in zip(question_ids, correct_masks)}
+    started = time.perf_counter()
+    expected = naive_score(key_map, raw)
+    naive_time = time.perf_counter() - started
+    print(f"  python loop (reference)      {naive_time / sample * submissions * 1000:8.1f} ms  (extrapolated from {sample:,})")
+
+    _, correct = score_matrix(key, encoded)
+    assert correct.tolist() == expected, "vectorized scoring disagrees with the reference loop"
+    print("✅ Vectorized results match the reference loop")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    if len(args) > 3:
+        print("Usage: python scripts/bench_exam_scoring.py [submissions] [questions] [repeat]")
+        sys.exit(1)
+    bench(*args)
@@ -0,0 +1,20 @@
+import sys
+from app.db.partitions import ensure_partitioned_tables, create_future_partitions, archive_old_partitions
+
+def manage_partitions(months_ahead=None, retention_months=None):
+    try:
+        ensure_partitioned_tables()
+        created = create_future_partitions(months_ahead)
+        archived = archive_old_partitions(retention_months)
+        print(f"✅ Partitions created: {created}, archived: {', '.join(archived) or 'none'}")
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print("Usage: python scripts/manage_partitions.py [months_ahead] [retention_months]")
+        sys.exit(1)
+
+    args = [int(arg) for arg in sys.argv[1:]]
+    manage_partitions(*args)
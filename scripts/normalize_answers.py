@@ -0,0 +1,23 @@
+import sys
+from app.db.session import SessionLocal
+from app.utils.answer_queries import normalize_stored_answers
+
+def normalize_answers(batch_size: int = 1000):
+    """Rewrite stored submissions in the normalized selection shapes, one short transaction per batch."""
+    db = SessionLocal()
+    try:
+        scanned, rewritten = normalize_stored_answers(db, batch_size)
+        print(f"✅ Normalized answers of {rewritten} of {scanned} submissions")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Answer normalization failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python scripts/normalize_answers.py [batch_size]")
+        sys.exit(1)
+
+    normalize_answers(*[int(arg) for arg in sys.argv[1:]])
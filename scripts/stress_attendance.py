@@ -0,0 +1,80 @@
+import sys
+import threading
+from collections import Counter
+from datetime import date
+from app.db.session import SessionLocal
+from app.models.school import Attendance
+from app.utils.services import upsert_attendance
+
+# Far-future date so the run never collides with real attendance rows
+STRESS_DATE = date(2099, 1, 1)
+
+def hammer(student_id: int, threads: int, overwrite: bool):
+    """Submit attendance for the same (student_id, date) from `threads` threads at once."""
+    barrier = threading.Barrier(threads)
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker(index: int):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            attendance_id = upsert_attendance(
+                db,
+                attendance_date=STRESS_DATE,
+                status="P" if index % 2 else "A",
+                is_verified=True,
+                student_id=student_id,
+                overwrite=overwrite,
+            )
+            db.commit()
+            outcome = "written" if attendance_id else "conflict"
+        except Exception as e:
+            db.rollback()
+            outcome = f"error: {type(e).__name__}"
+        finally:
+            db.close()
+        with lock:
+            outcomes[outcome] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return outcomes
+
+def stress_attendance(student_id: int, threads: int = 50):
+    db = SessionLocal()
+    try:
+        db.query(Attendance).filter_by(student_id=student_id, date=STRESS_DATE).delete()
+        db.commit()
+
+        reject = hammer(student_id, threads, overwrite=False)
+        overwrite = hammer(student_id, threads, overwrite=True)
+        rows = db.query(Attendance).filter_by(student_id=student_id, date=STRESS_DATE).count()
+
+        print(f"reject mode:    {dict(reject)}")
+        print(f"overwrite mode: {dict(overwrite)}")
+        print(f"rows stored:    {rows}")
+
+        ok = (
+            reject == Counter({"written": 1, "conflict": threads - 1})
+            and overwrite == Counter({"written": threads})
+            and rows == 1
+        )
+        print("✅ Attendance upsert is race-free" if ok else "❌ Unexpected outcome under concurrency")
+        return ok
+    finally:
+        db.query(Attendance).filter_by(student_id=student_id, date=STRESS_DATE).delete()
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python scripts/stress_attendance.py <student_id> [threads]")
+        sys.exit(1)
+
+    student_id = int(sys.argv[1])
+    threads = int(sys.argv[2]) if len(sys.argv) == 3 else 50
+    sys.exit(0 if stress_attendance(student_id, threads) else 1)
@@ -0,0 +1,96 @@
+import sys
+import threading
+from collections import Counter
+from app.db.session import SessionLocal
+from app.models.school import Exam, ExamAttemptCounter
+from app.utils.exam_attempts import allocate_attempt, release_attempt
+
+def hammer(student_id: int, exam_id: str, max_repeat: int, threads: int):
+    """Allocate attempts for the same (student_id, exam_id) from `threads` threads at once."""
+    barrier = threading.Barrier(threads)
+    allocated = []
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            attempt_no = allocate_attempt(db, student_id, exam_id, max_repeat)
+            db.commit()
+            outcome = "allocated" if attempt_no else "rejected"
+        except Exception as e:
+            db.rollback()
+            attempt_no = None
+            outcome = f"error: {type(e).__name__}"
+        finally:
+            db.close()
+        with lock:
+            outcomes[outcome] += 1
+            if attempt_no:
+                allocated.append(attempt_no)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return outcomes, sorted(allocated)
+
+def stress_exam_attempts(student_id: int, exam_id: str, threads: int = 50):
+    db = SessionLocal()
+    counter = db.get(ExamAttemptCounter, (student_id, exam_id))
+    original = counter.attempts if counter else None
+    try:
+        exam = db.get(Exam, exam_id)
+        if not exam:
+            print(f"❌ Exam {exam_id} not found")
+            return False
+
+        # Start from a clean counter; it is re-seeded from stored submissions
+        db.query(ExamAttemptCounter).filter_by(student_id=student_id, exam_id=exam_id).delete()
+        db.commit()
+
+        start = allocate_attempt(db, student_id, exam_id, None)
+        db.rollback()
+        if start is None:
+            print("❌ Could not seed the attempt counter")
+            return False
+        max_repeat = start - 1 + max(exam.max_repeat or 1, 3)
+
+        outcomes, allocated = hammer(student_id, exam_id, max_repeat, threads)
+        expected = list(range(start, max_repeat + 1))
+
+        print(f"max_repeat used: {max_repeat} (stored attempts so far: {start - 1})")
+        print(f"outcomes:        {dict(outcomes)}")
+        print(f"attempt numbers: {allocated}")
+
+        ok = allocated == expected and outcomes["rejected"] == threads - len(expected)
+        print("✅ Attempt allocation is race-free" if ok else "❌ Duplicate or excess attempts under concurrency")
+
+        # A submission the pipeline refused hands its (latest) attempt back exactly once
+        stale = release_attempt(db, student_id, exam_id, max_repeat - 1)
+        released = release_attempt(db, student_id, exam_id, max_repeat)
+        db.commit()
+        again = allocate_attempt(db, student_id, exam_id, max_repeat)
+        db.commit()
+        released_ok = not stale and released and again == max_repeat
+        print("✅ Released attempt is reused once" if released_ok else "❌ Attempt release is inconsistent")
+        return ok and released_ok
+    finally:
+        db.rollback()
+        db.query(ExamAttemptCounter).filter_by(student_id=student_id, exam_id=exam_id).delete()
+        if original is not None:
+            db.add(ExamAttemptCounter(student_id=student_id, exam_id=exam_id, attempts=original))
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python scripts/stress_exam_attempts.py <student_id> <exam_id> [threads]")
+        sys.exit(1)
+
+    student_id = int(sys.argv[1])
+    exam_id = sys.argv[2]
+    threads = int(sys.argv[3]) if len(sys.argv) == 4 else 50
+    sys.exit(0 if stress_exam_attempts(student_id, exam_id, threads) else 1)